@@ -6,53 +6,103 @@ import os
 import re
 import json
 import hashlib
+import functools
+import time
+import uuid
+import asyncio
+import threading
+import importlib.util
+from contextlib import asynccontextmanager
 from datetime import datetime
-from io import BytesIO
+from typing import Callable, Optional
 
 # FastAPI
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Form, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import uvicorn
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
-# Imports conditionnels
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
+# Télémétrie
+from lib import metrics, profiling, slowlog, patterns
+from lib.logs import logger, fields, new_request_context, setup_logging
+from lib.loopmon import loop_monitor, LOOP_MONITOR_ENABLED
+from lib.slowlog import slow_recorder, CAPTURED_ROUTES
+from lib.admin import require_admin
+from lib.debugtools import profile_window, profiled, memory_tracker, ProfilerBusy
+from lib.warmup import warmup_state, run_warmup, WARMUP_ENABLED
+from lib.memguard import memory_guard
+from lib import sandbox, pdfbackends, sniff, ocr
+from lib.sandbox import ExtractionTimeout
+from lib.ocr import ImageOnlyDocument
+from lib import admission, idempotency, deadline, compression
+from lib.deadline import DeadlineExceeded, DeadlineMiddleware
+from lib.advanced_cv_parser import AdvancedCVParser
+from lib.fieldgraph import ExtractorGraph
+from lib.idempotency import idempotency_store
 
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-try:
-    from supabase import create_client
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
+# Imports conditionnels : on vérifie la présence des modules sans les charger,
+# l'import réel est différé au premier usage (démarrage à froid)
+PDF_AVAILABLE = importlib.util.find_spec("PyPDF2") is not None
+SUPABASE_AVAILABLE = importlib.util.find_spec("supabase") is not None
 
 # ========== CONFIGURATION ==========
 SUPABASE_URL = os.getenv("SUPABASE_URL", "https://cpdokjsyxmohubgvxift.supabase.co")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 
-# ========== APPLICATION ==========
-app = FastAPI(
-    title="TruthTalent CV Parser",
-    description="API d'extraction avancée de CV",
-    version="3.0.0"
-)
+# Vercel (ou TT_SERVERLESS=1) : pas de threads d'arrière-plan ni de pools de processus
+SERVERLESS = os.getenv("TT_SERVERLESS", os.getenv("VERCEL", "")) not in ("", "0")
+
+# Modes d'analyse : fast (coordonnées, premières pages, sans repli PDF),
+# standard (pipeline complet), deep (+ parser NLP spaCy), auto (fast, puis
+# niveaux suivants tant que la confiance reste sous le seuil du niveau)
+ANALYSIS_MODES = ("fast", "standard", "deep", "auto")
+AUTO_TIERS = ("fast", "standard", "deep")
+FAST_MAX_PAGES = int(os.getenv("TT_FAST_MAX_PAGES", "2"))
+FAST_MAX_CHARS = int(os.getenv("TT_FAST_MAX_CHARS", "6000"))
+AUTO_CONFIDENCE = float(os.getenv("TT_AUTO_CONFIDENCE", "0.5"))
+# Score fast ramené à son maximum atteignable (coordonnées seules) : 0.9 exige
+# email, téléphone et nom, sinon auto passe au niveau standard
+AUTO_FAST_CONFIDENCE = float(os.getenv("TT_AUTO_FAST_CONFIDENCE", "0.9"))
+# En dessous, le texte est jugé insuffisant pour l'analyse
+MIN_TEXT_CHARS = 50
 
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Longueurs bornées (64/253, RFC 5321) : sinon chaque position d'une longue
+# suite de caractères sans @ relance un balayage jusqu'à la fin (quadratique)
+EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,}\b'
+PHONE_PATTERN = r'(?:(?:\+|00)33\s?|0)[1-9](?:[\s.-]?\d{2}){4}'
+# Mode fast : lecture du PDF arrêtée à la page où email et téléphone sont vus
+CONTACT_STOP_PATTERNS = (EMAIL_PATTERN, PHONE_PATTERN)
+
+# ========== CHAMPS D'ANALYSE ==========
+# Champ de `extracted` -> (extracteur qui le produit, lecture de sa valeur)
+EXTRACTED_FIELDS = {
+    "name": ("personal_info", lambda info: info.get("name", "Candidat")),
+    "first_name": ("name_parts", lambda parts: parts[0]),
+    "last_name": ("name_parts", lambda parts: parts[1]),
+    "email": ("personal_info", lambda info: info.get("email", "")),
+    "phone": ("personal_info", lambda info: info.get("phone", "")),
+    "location": ("personal_info", lambda info: info.get("location", "")),
+    "linkedin": ("personal_info", lambda info: info.get("linkedin", "")),
+    "skills": ("skills", lambda skills: skills),
+    "skills_by_category": ("skills_by_category", lambda categories: categories),
+    "languages": ("languages", lambda languages: languages),
+    "experience_years": ("experience", lambda experience: experience.get("years", 0)),
+    "experience_level": ("experience", lambda experience: experience.get("level", "")),
+    "experience_details": ("experience", lambda experience: experience.get("positions", [])),
+    "education_degree": ("education", lambda education: education.get("degree", "")),
+    "education_institution": ("education", lambda education: education.get("institution", "")),
+    "education_details": ("education", lambda education: education.get("details", [])),
+    "summary": ("summary", lambda summary: summary),
+    "metiers": ("metiers", lambda metiers: metiers),
+}
+CONTACT_FIELDS = ("name", "first_name", "last_name", "email", "phone", "location", "linkedin")
+# Mode deep : champs du parser NLP, et coordonnées qu'il peut compléter
+DEEP_FIELDS = ("entities", "key_sentences", "skills_advanced")
+DEEP_FILLED_FIELDS = ("email", "phone", "location", "linkedin")
+SELECTABLE_FIELDS = tuple(EXTRACTED_FIELDS) + ("confidence_score", "original_text_preview") + DEEP_FIELDS
+
+setup_logging(asynchronous=not SERVERLESS)
 
 # ========== CV EXTRACTOR AVANCÉ ==========
 class AdvancedCVExtractor:
@@ -81,6 +131,28 @@ class AdvancedCVExtractor:
             "phd": "PhD",
             "ingénieur": "Diplôme d'ingénieur"
         }
+        self._taxonomy = None
+        self.graph = self._build_graph()
+    
+    @property
+    def taxonomy(self) -> dict:
+        """Motifs compilés des référentiels, construits au premier usage puis réutilisés"""
+        if self._taxonomy is None:
+            def word(term):
+                return patterns.compile(r'\b' + re.escape(term) + r'\b', re.IGNORECASE)
+            
+            skills = {}
+            for category_skills in self.skills_list.values():
+                for skill in category_skills:
+                    if skill not in skills:
+                        skills[skill] = word(skill)
+            self._taxonomy = {
+                "skills": list(skills.items()),
+                "cities": [(city, word(city)) for city in self.french_cities],
+                "languages": [(lang, word(lang)) for lang in self.languages],
+                "degrees": [(keyword, degree, word(keyword)) for keyword, degree in self.degree_keywords.items()]
+            }
+        return self._taxonomy
     
     def _load_skills_database(self):
         """Base de données complète de compétences"""
@@ -97,130 +169,251 @@ class AdvancedCVExtractor:
             "testing": ["Jest", "Mocha", "Cypress", "Selenium", "JUnit", "TestNG"]
         }
     
-    def extract_text(self, file_content: bytes, filename: str) -> str:
-        """Extrait le texte du fichier"""
-        filename_lower = filename.lower()
+    def extract_text(self, file_content: bytes, filename: str, mode: str = "standard",
+                     doc_format: Optional[str] = None) -> str:
+        """Extrait le texte du fichier (premières pages seulement en mode fast)
+
+        L'extracteur suit le format détecté dans le contenu (`sniff`), pas
+        l'extension : `doc_format` évite une seconde détection quand la
+        route l'a déjà faite.
+        """
+        if doc_format is None:
+            doc_format = sniff.sniff(file_content, filename)
+        metrics.DOCUMENTS.inc(format=doc_format)
+        metrics.DOCUMENT_BYTES.inc(len(file_content), format=doc_format)
+        slowlog.annotate(format=doc_format, size=len(file_content))
         
         try:
-            if filename_lower.endswith('.pdf') and PDF_AVAILABLE:
-                return self._extract_pdf_text(file_content)
-            elif filename_lower.endswith(('.doc', '.docx')) and DOCX_AVAILABLE:
-                return self._extract_docx_text(file_content)
-            elif filename_lower.endswith(('.txt', '.rtf')):
-                return file_content.decode('utf-8', errors='ignore')
-            else:
-                return f"[Fichier: {filename}]"
+            with profiling.stage(f"extract_{doc_format}"):
+                if doc_format == "pdf" and PDF_AVAILABLE:
+                    return self._extract_pdf_text(file_content, mode)
+                elif doc_format == "docx":
+                    return self._extract_docx_text(file_content, mode)
+                elif doc_format == "rtf":
+                    return self._extract_rtf_text(file_content, mode)
+                elif doc_format == "txt":
+                    return file_content.decode('utf-8', errors='ignore')[:self._limits(mode)[1]]
+                else:
+                    # Format non pris en charge (rejeté en amont par les routes)
+                    return ""
                 
+        except (ExtractionTimeout, DeadlineExceeded, ImageOnlyDocument):
+            raise
         except Exception as e:
-            print(f"⚠️ Erreur extraction texte: {e}")
+            metrics.FAILURES.inc(stage=f"extract_{doc_format}")
+            logger.warning("Erreur extraction texte", extra=fields(format=doc_format, error=str(e)))
             return ""
     
-    def _extract_pdf_text(self, file_content: bytes) -> str:
-        """Extrait le texte d'un PDF"""
+    def _limits(self, mode: str) -> tuple:
+        """Plafonds (pages, caractères) de l'extraction selon le mode"""
+        if mode == "fast":
+            return FAST_MAX_PAGES, FAST_MAX_CHARS
+        return sandbox.MAX_PAGES, sandbox.MAX_TEXT_CHARS
+    
+    def _extract_pdf_text(self, file_content: bytes, mode: str = "standard") -> str:
+        """Extrait le texte d'un PDF (processus isolé, délais et plafonds)"""
+        max_pages, max_chars = self._limits(mode)
         try:
-            pdf_reader = PyPDF2.PdfReader(BytesIO(file_content))
-            text_parts = []
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-            return "\n".join(text_parts)
+            # En fast : sans repli sur le moteur de mise en page, et arrêt
+            # dès la page où les coordonnées ont été trouvées
+            fast = mode == "fast"
+            extraction = sandbox.extract("pdf", file_content, isolated=not SERVERLESS,
+                                         max_pages=max_pages, max_chars=max_chars,
+                                         fallback=not fast,
+                                         stop_patterns=CONTACT_STOP_PATTERNS if fast else ())
+            pdfbackends.record(extraction)
+            metrics.DOCUMENT_PAGES.inc(extraction["pages"], format="pdf")
+            profiling.set_page_count(extraction["pages"])
+            slowlog.annotate(pages=extraction["pages"], pages_read=extraction["pages_read"],
+                             truncated=extraction["truncated"])
+            if extraction["image_only"]:
+                # Scan : pas de texte à analyser ici, l'OCR s'en charge
+                raise ImageOnlyDocument(extraction["pages"])
+            return extraction["text"]
+        except (ExtractionTimeout, DeadlineExceeded, ImageOnlyDocument):
+            raise
         except Exception as e:
-            print(f"❌ PDF extraction error: {e}")
+            metrics.FAILURES.inc(stage="extract_pdf")
+            logger.error("Erreur extraction PDF", extra=fields(error=str(e)))
             return ""
     
-    def _extract_docx_text(self, file_content: bytes) -> str:
-        """Extrait le texte d'un document Word"""
+    def _extract_docx_text(self, file_content: bytes, mode: str = "standard") -> str:
+        """Extrait le texte d'un document Word en flux (processus isolé, lib.docxstream)"""
+        max_pages, max_chars = self._limits(mode)
         try:
-            doc = Document(BytesIO(file_content))
-            return "\n".join([para.text for para in doc.paragraphs])
+            extraction = sandbox.extract("docx", file_content, isolated=not SERVERLESS,
+                                         max_pages=max_pages, max_chars=max_chars)
+            slowlog.annotate(truncated=extraction["truncated"])
+            return extraction["text"]
+        except (ExtractionTimeout, DeadlineExceeded):
+            raise
         except Exception as e:
-            print(f"❌ DOCX extraction error: {e}")
+            metrics.FAILURES.inc(stage="extract_docx")
+            logger.error("Erreur extraction DOCX", extra=fields(error=str(e)))
             return ""
     
-    def analyze_cv(self, text: str, filename: str = "") -> dict:
-        """Analyse complète d'un CV"""
-        print(f"🔍 Analyse du CV: {filename}")
-        
-        # Nettoyer et normaliser le texte
-        clean_text = self._clean_text(text)
-        print(f"   Texte nettoyé: {len(clean_text)} caractères")
-        
-        # Extraire toutes les informations
-        personal_info = self._extract_personal_info(clean_text)
-        print(f"   Infos perso: {personal_info.get('name')}, {personal_info.get('email')}")
-        
-        skills = self._extract_skills_comprehensive(clean_text)
-        print(f"   Compétences trouvées: {len(skills)}")
-        
-        experience = self._extract_experience_details(clean_text)
-        print(f"   Expérience: {experience.get('years', 0)} ans, {experience.get('level')}")
-        
-        education = self._extract_education_details(clean_text)
-        print(f"   Éducation: {education.get('degree')}")
-        
-        languages = self._extract_languages_details(clean_text)
-        print(f"   Langues: {len(languages)}")
-        
-        # Calculer le score de confiance
-        confidence = self._calculate_confidence(personal_info, skills, experience)
-        print(f"   Score confiance: {confidence}")
-        
-        # Séparer prénom/nom
-        full_name = personal_info.get("name", "Candidat")
-        first_name, last_name = self._split_name(full_name)
-        
-        # Préparer les métiers (basé sur les compétences principales)
-        metiers = self._extract_metiers(skills)
-        
-        return {
-            "success": True,
-            "analysis": {
-                "confidence_score": confidence,
-                "processing_date": datetime.now().isoformat(),
-                "char_count": len(text),
-                "word_count": len(text.split()),
-                "parser_version": "3.0"
-            },
-            "extracted": {
-                "name": full_name,
-                "first_name": first_name,
-                "last_name": last_name,
-                "email": personal_info.get("email", ""),
-                "phone": personal_info.get("phone", ""),
-                "location": personal_info.get("location", ""),
-                "linkedin": personal_info.get("linkedin", ""),
-                "skills": skills,
-                "skills_by_category": self._categorize_skills(skills),
-                "languages": languages,
-                "experience_years": experience.get("years", 0),
-                "experience_level": experience.get("level", ""),
-                "experience_details": experience.get("positions", []),
-                "education_degree": education.get("degree", ""),
-                "education_institution": education.get("institution", ""),
-                "education_details": education.get("details", []),
-                "summary": self._extract_summary(clean_text),
-                "metiers": metiers
-            },
-            "metadata": {
-                "filename": filename,
-                "original_text_preview": text[:1000] if len(text) > 1000 else text,
+    def _extract_rtf_text(self, file_content: bytes, mode: str = "standard") -> str:
+        """Extrait le texte visible d'un RTF (processus isolé, lib.rtf)"""
+        max_pages, max_chars = self._limits(mode)
+        try:
+            extraction = sandbox.extract("rtf", file_content, isolated=not SERVERLESS,
+                                         max_pages=max_pages, max_chars=max_chars)
+            slowlog.annotate(truncated=extraction["truncated"])
+            return extraction["text"]
+        except (ExtractionTimeout, DeadlineExceeded):
+            raise
+        except Exception as e:
+            metrics.FAILURES.inc(stage="extract_rtf")
+            logger.error("Erreur extraction RTF", extra=fields(error=str(e)))
+            return ""
+    
+    def _build_graph(self) -> ExtractorGraph:
+        """Extracteurs de l'analyse et leurs dépendances"""
+        graph = ExtractorGraph(inputs=("text",))
+        graph.add("clean", self._clean_text, ["text"])
+        graph.add("personal_info", self._extract_personal_info, ["clean"])
+        graph.add("name_parts", lambda info: self._split_name(info.get("name", "Candidat")),
+                  ["personal_info"], timed=False)
+        graph.add("skills", self._extract_skills_comprehensive, ["clean"])
+        graph.add("skills_by_category", self._categorize_skills, ["skills"], timed=False)
+        graph.add("metiers", self._extract_metiers, ["skills"], timed=False)
+        graph.add("experience", self._extract_experience_details, ["clean"])
+        graph.add("education", self._extract_education_details, ["clean"])
+        # Étapes optionnelles : sautées s'il reste trop peu de temps à la requête
+        graph.add("languages", self._extract_languages_details, ["clean"], optional=True, default=list)
+        graph.add("summary", self._extract_summary, ["clean"], optional=True, default=str)
+        graph.add("confidence", self._calculate_confidence,
+                  ["personal_info", "skills", "experience"], timed=False)
+        # Niveau fast : sans compétences ni expérience, le score plafonne aux
+        # points des coordonnées ; il est ramené sur 1 pour rester lisible
+        contact_max = self._calculate_confidence(
+            {"email": True, "phone": True, "name": "Nom", "location": True}, [], {}
+        )
+        graph.add("contact_confidence",
+                  lambda info: self._calculate_confidence(info, [], {}) / contact_max,
+                  ["personal_info"], timed=False)
+        return graph
+    
+    def analyze_cv(self, text: str, filename: str = "", field_names: Optional[list] = None) -> dict:
+        """Analyse complète d'un CV, ou des seuls champs demandés"""
+        logger.debug("Analyse du CV", extra=fields(filename=filename, requested=field_names))
+        return self._analyze(text, filename, field_names, "confidence")
+    
+    def analyze_contacts(self, text: str, filename: str = "", field_names: Optional[list] = None) -> dict:
+        """Analyse rapide : coordonnées seules (les autres champs demandés sont ignorés)"""
+        selected = [field for field in (field_names or CONTACT_FIELDS + ("confidence_score",))
+                    if field in CONTACT_FIELDS + ("confidence_score", "original_text_preview")]
+        return self._analyze(text, filename, selected, "contact_confidence")
+    
+    def _analyze(self, text: str, filename: str, field_names: Optional[list], confidence: str) -> dict:
+        """Exécute les extracteurs nécessaires aux champs et construit la réponse
+
+        Sans sélection (`field_names` à None), la réponse complète habituelle.
+        """
+        selected = list(EXTRACTED_FIELDS) if field_names is None else [f for f in field_names if f in EXTRACTED_FIELDS]
+        targets = {EXTRACTED_FIELDS[field][0] for field in selected}
+        with_confidence = field_names is None or "confidence_score" in field_names
+        if with_confidence:
+            targets.add(confidence)
+        if field_names is None:
+            targets.update(("personal_info", "skills", "experience"))
+        
+        values = self.graph.run(targets, {"text": text}, parallel=not SERVERLESS)
+        
+        extracted = {}
+        for field in selected:
+            source, getter = EXTRACTED_FIELDS[field]
+            extracted[field] = getter(values[source])
+        
+        analysis = {}
+        if with_confidence:
+            analysis["confidence_score"] = values[confidence]
+        analysis.update({
+            "processing_date": datetime.now().isoformat(),
+            "char_count": len(text),
+            "word_count": len(text.split()),
+            "parser_version": "3.0",
+            "degraded": deadline.degraded()
+        })
+        
+        metadata = {"filename": filename}
+        if field_names is None or "original_text_preview" in field_names:
+            metadata["original_text_preview"] = text[:1000] if len(text) > 1000 else text
+        if field_names is None:
+            personal_info, skills, experience = values["personal_info"], values["skills"], values["experience"]
+            metadata.update({
                 "has_email": bool(personal_info.get("email")),
                 "has_phone": bool(personal_info.get("phone")),
                 "has_name": bool(personal_info.get("name")),
                 "has_skills": bool(skills),
                 "has_experience": bool(experience.get("years", 0) > 0)
-            }
+            })
+        
+        logger.debug("Analyse terminée", extra=fields(
+            chars=len(values.get("clean", "")),
+            extractors=sorted(name for name in values if name != "text"),
+            confidence=analysis.get("confidence_score")
+        ))
+        return {"success": True, "analysis": analysis, "extracted": extracted, "metadata": metadata}
+    
+    def analyze(self, text: str, filename: str = "", mode: str = "standard",
+                field_names: Optional[list] = None) -> dict:
+        """Analyse au niveau demandé (fast, standard ou deep)"""
+        analyzers = {
+            "fast": self.analyze_contacts,
+            "standard": self.analyze_cv,
+            "deep": self.analyze_deep,
         }
+        result = analyzers[mode](text, filename, field_names)
+        result["analysis"]["mode"] = mode
+        return result
+    
+    def analyze_deep(self, text: str, filename: str = "", field_names: Optional[list] = None) -> dict:
+        """Analyse complète enrichie par le parser NLP (entités, phrases clés)"""
+        result = self.analyze_cv(text, filename, field_names)
+        extracted = result["extracted"]
+        wanted = set(DEEP_FIELDS + DEEP_FILLED_FIELDS) if field_names is None else set(field_names)
+        if not wanted & set(DEEP_FIELDS + DEEP_FILLED_FIELDS):
+            return result
+        
+        with profiling.stage("advanced"):
+            advanced = advanced_parser.parse_cv_advanced(text, filename)
+        
+        # Le parser avancé complète les coordonnées manquantes
+        for field in DEEP_FILLED_FIELDS:
+            if field in extracted and not extracted[field] and advanced.get(field):
+                extracted[field] = advanced[field]
+        deep_values = {
+            "entities": advanced.get("entities", {}),
+            "key_sentences": advanced.get("key_sentences", []),
+            "skills_advanced": advanced.get("skills", {}),
+        }
+        for field in DEEP_FIELDS:
+            if field in wanted:
+                extracted[field] = deep_values[field]
+        result["analysis"]["degraded"] = deadline.degraded()
+        return result
+    
+    def _findall(self, pattern: str, text: str, flags: int = 0) -> list:
+        """findall borné dans le temps, avec comptage des correspondances pour le profil"""
+        matches = patterns.findall(pattern, text, flags)
+        profiling.count_matches(len(matches))
+        return matches
+    
+    def _search(self, pattern: str, text: str, flags: int = 0):
+        """search borné dans le temps, avec comptage des correspondances pour le profil"""
+        match = patterns.search(pattern, text, flags)
+        profiling.count_matches(1 if match else 0)
+        return match
     
     def _clean_text(self, text: str) -> str:
         """Nettoie et normalise le texte"""
         # Supprimer les caractères de contrôle
-        text = re.sub(r'[\x00-\x1F\x7F-\x9F]', ' ', text)
+        text = patterns.sub(r'[\x00-\x1F\x7F-\x9F]', ' ', text)
         # Normaliser les espaces
-        text = re.sub(r'\s+', ' ', text)
+        text = patterns.sub(r'\s+', ' ', text)
         # Normaliser les retours à la ligne
-        text = re.sub(r'\n+', '\n', text)
+        text = patterns.sub(r'\n+', '\n', text)
         return text.strip()
     
     def _extract_personal_info(self, text: str) -> dict:
@@ -233,15 +426,15 @@ class AdvancedCVExtractor:
             "linkedin": ""
         }
         
-        # 1. EMAIL - Recherche approfondie
+        # 1. EMAIL - Recherche approfondie (longueurs bornées, cf. EMAIL_PATTERN)
         email_patterns = [
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            r'[Ee]-?[Mm][Aa][Ii][Ll]\s*[:]\s*([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,})',
-            r'[Cc]ontact\s*[:]\s*([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,})'
+            EMAIL_PATTERN,
+            r'[Ee]-?[Mm][Aa][Ii][Ll]\s*[:]\s*([A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,})',
+            r'[Cc]ontact\s*[:]\s*([A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,})'
         ]
         
         for pattern in email_patterns:
-            matches = re.findall(pattern, text)
+            matches = self._findall(pattern, text)
             if matches:
                 if isinstance(matches[0], tuple):
                     info["email"] = matches[0][0]
@@ -251,7 +444,7 @@ class AdvancedCVExtractor:
         
         # 2. TÉLÉPHONE - Formats français/internationaux
         phone_patterns = [
-            r'(?:(?:\+|00)33\s?|0)[1-9](?:[\s.-]?\d{2}){4}',
+            PHONE_PATTERN,
             r'\b0[1-9](?:[\s.-]?\d{2}){4}\b',
             r'\b\d{2}[.\s]?\d{2}[.\s]?\d{2}[.\s]?\d{2}[.\s]?\d{2}\b',
             r'T[ée]l[\.]?\s*[:]?\s*(\+?\d[\d\s.-]{8,}\d)',
@@ -259,11 +452,11 @@ class AdvancedCVExtractor:
         ]
         
         for pattern in phone_patterns:
-            matches = re.findall(pattern, text)
+            matches = self._findall(pattern, text)
             if matches:
                 phone = matches[0] if isinstance(matches[0], str) else matches[0][0]
                 # Nettoyer le numéro
-                phone = re.sub(r'[^\d+]', '', phone)
+                phone = patterns.sub(r'[^\d+]', '', phone)
                 if len(phone) >= 10:
                     info["phone"] = phone
                     break
@@ -272,11 +465,12 @@ class AdvancedCVExtractor:
         linkedin_patterns = [
             r'(?:linkedin\.com/(?:in|company)/[a-zA-Z0-9-]+)',
             r'[Ll]inked[Ii]n\s*[:]\s*(?:linkedin\.com/(?:in|company)/[a-zA-Z0-9-]+)',
-            r'[Pp]rofil\s+[Ll]inked[Ii]n\s*[:].*?(linkedin\.com/(?:in|company)/[a-zA-Z0-9-]+)'
+            # L'URL doit suivre de près : `.*?` non borné est quadratique sans URL
+            r'[Pp]rofil\s+[Ll]inked[Ii]n\s*[:].{0,200}?(linkedin\.com/(?:in|company)/[a-zA-Z0-9-]+)'
         ]
         
         for pattern in linkedin_patterns:
-            matches = re.findall(pattern, text)
+            matches = self._findall(pattern, text)
             if matches:
                 linkedin = matches[0]
                 if not linkedin.startswith('http'):
@@ -285,8 +479,8 @@ class AdvancedCVExtractor:
                 break
         
         # 4. LOCALISATION
-        for city in self.french_cities:
-            if re.search(r'\b' + re.escape(city) + r'\b', text, re.IGNORECASE):
+        for city, city_pattern in self.taxonomy["cities"]:
+            if self._search(city_pattern, text):
                 info["location"] = city
                 break
         
@@ -304,7 +498,7 @@ class AdvancedCVExtractor:
                     'compétences', 'skills', 'contact', 'coordonnées'
                 ]):
                     # Vérifier qu'il n'y a pas d'email ou téléphone
-                    if not re.search(r'@|\d{10}', line):
+                    if not self._search(r'@|\d{10}', line):
                         info["name"] = line
                         break
         
@@ -317,7 +511,7 @@ class AdvancedCVExtractor:
             ]
             
             for pattern in name_patterns:
-                matches = re.findall(pattern, text)
+                matches = self._findall(pattern, text)
                 if matches:
                     info["name"] = matches[0].strip()
                     break
@@ -327,7 +521,7 @@ class AdvancedCVExtractor:
             for line in lines[:5]:
                 line = line.strip()
                 if (3 <= len(line) <= 40 and 
-                    not re.search(r'[@\d{10}]', line) and
+                    not self._search(r'[@\d{10}]', line) and
                     not any(word in line.lower() for word in ['email', 'phone', 'tel', 'cv', 'resume'])):
                     info["name"] = line
                     break
@@ -368,16 +562,13 @@ class AdvancedCVExtractor:
         found_skills = []
         text_lower = text.lower()
         
-        # Rechercher toutes les compétences par catégorie
-        for category, skills in self.skills_list.items():
-            for skill in skills:
-                # Recherche insensible à la casse
-                if skill.lower() in text_lower:
-                    # Vérifier que ce n'est pas un faux positif
-                    skill_pattern = r'\b' + re.escape(skill) + r'\b'
-                    if re.search(skill_pattern, text, re.IGNORECASE):
-                        if skill not in found_skills:
-                            found_skills.append(skill)
+        # Rechercher toutes les compétences (ordre des catégories)
+        for skill, skill_pattern in self.taxonomy["skills"]:
+            # Recherche insensible à la casse
+            if skill.lower() in text_lower:
+                # Vérifier que ce n'est pas un faux positif
+                if self._search(skill_pattern, text):
+                    found_skills.append(skill)
         
         # Rechercher des compétences par motifs
         skill_patterns = [
@@ -387,7 +578,7 @@ class AdvancedCVExtractor:
         ]
         
         for pattern in skill_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = self._findall(pattern, text, re.IGNORECASE)
             if matches:
                 skills_text = matches[0].lower()
                 # Chercher des mots-clés techniques
@@ -425,7 +616,7 @@ class AdvancedCVExtractor:
         
         lang_section = ""
         for pattern in lang_section_patterns:
-            matches = re.findall(pattern, text)
+            matches = self._findall(pattern, text)
             if matches:
                 lang_section = matches[0]
                 break
@@ -450,9 +641,8 @@ class AdvancedCVExtractor:
             'bilingual': 'Bilingue'
         }
         
-        for lang in self.languages:
-            lang_pattern = r'\b' + re.escape(lang) + r'\b'
-            if re.search(lang_pattern, lang_section, re.IGNORECASE):
+        for lang, lang_pattern in self.taxonomy["languages"]:
+            if self._search(lang_pattern, lang_section):
                 # Chercher le niveau associé
                 lang_with_level = lang.capitalize()
                 
@@ -480,15 +670,17 @@ class AdvancedCVExtractor:
         }
         
         # 1. Extraire les années d'expérience
+        # (?<!\d)\d{1,2} : un nombre ne commence qu'une fois par suite de chiffres
+        # (\d+ rebalayait toute la suite depuis chaque chiffre, quadratique)
         year_patterns = [
-            r'(\d+)\s*(?:ans|années|years|yr)s?\s*(?:d\'?expérience|experience)',
-            r'expérience\s*(?:professionnelle)?\s*[:=]\s*(\d+)\s*(?:ans|années|years)',
-            r'(\d+)\+?\s*(?:ans|années)',
-            r'(\d+)\s*ans?\s*d\'?exp'
+            r'(?<!\d)(\d{1,2})\s*(?:ans|années|years|yr)s?\s*(?:d\'?expérience|experience)',
+            r'expérience\s*(?:professionnelle)?\s*[:=]\s*(\d{1,2})\s*(?:ans|années|years)',
+            r'(?<!\d)(\d{1,2})\+?\s*(?:ans|années)',
+            r'(?<!\d)(\d{1,2})\s*ans?\s*d\'?exp'
         ]
         
         for pattern in year_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = self._findall(pattern, text, re.IGNORECASE)
             if matches:
                 try:
                     years = int(matches[0])
@@ -535,9 +727,9 @@ class AdvancedCVExtractor:
         lines = text.split('\n')
         for i, line in enumerate(lines):
             for pattern in position_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
+                if self._search(pattern, line, re.IGNORECASE):
                     position_info = {
-                        "period": re.search(pattern, line, re.IGNORECASE).group(),
+                        "period": self._search(pattern, line, re.IGNORECASE).group(),
                         "title": self._extract_job_title(line),
                         "company": self._extract_company(line)
                     }
@@ -549,8 +741,8 @@ class AdvancedCVExtractor:
     def _extract_job_title(self, line: str) -> str:
         """Extrait le titre du poste"""
         # Retirer les dates
-        line = re.sub(r'\b(?:20\d{2}|19\d{2})\s*[-–].*', '', line)
-        line = re.sub(r'\b(?:jan|feb|mar)[a-z]*\s+\d{4}\s*[-–].*', '', line, flags=re.IGNORECASE)
+        line = patterns.sub(r'\b(?:20\d{2}|19\d{2})\s*[-–].*', '', line)
+        line = patterns.sub(r'\b(?:jan|feb|mar)[a-z]*\s+\d{4}\s*[-–].*', '', line, re.IGNORECASE)
         
         # Retirer les indicateurs
         indicators = ["chez", "at", "|", "-", "•", "·", ":", ";"]
@@ -589,7 +781,7 @@ class AdvancedCVExtractor:
         
         edu_section = ""
         for pattern in edu_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = self._findall(pattern, text, re.IGNORECASE)
             if matches:
                 edu_section = matches[0]
                 break
@@ -599,8 +791,8 @@ class AdvancedCVExtractor:
             edu_section = text
         
         # Chercher les diplômes
-        for keyword, degree in self.degree_keywords.items():
-            if re.search(r'\b' + re.escape(keyword) + r'\b', edu_section, re.IGNORECASE):
+        for keyword, degree, degree_pattern in self.taxonomy["degrees"]:
+            if self._search(degree_pattern, edu_section):
                 result["degree"] = degree
                 break
         
@@ -653,12 +845,12 @@ class AdvancedCVExtractor:
         ]
         
         for pattern in summary_patterns:
-            matches = re.findall(pattern, text)
+            matches = self._findall(pattern, text)
             if matches:
                 return matches[0].strip()[:500]
         
         # Sinon, prendre les premières phrases significatives
-        sentences = re.split(r'[.!?]+', text)
+        sentences = patterns.split(r'[.!?]+', text)
         for sentence in sentences:
             sentence = sentence.strip()
             if 10 <= len(sentence.split()) <= 30:
@@ -695,8 +887,9 @@ class AdvancedCVExtractor:
         
         return min(score, 1.0)
 
-# Instance globale
+# Instances globales
 cv_extractor = AdvancedCVExtractor()
+advanced_parser = AdvancedCVParser()
 
 # ========== SUPABASE MANAGER AMÉLIORÉ ==========
 class SupabaseManager:
@@ -705,37 +898,82 @@ class SupabaseManager:
     def __init__(self):
         self.supabase_url = SUPABASE_URL
         self.supabase_key = SUPABASE_KEY
+        self._client = None
+        self._client_attempted = False
+        self._client_lock = threading.Lock()
         
-        if SUPABASE_AVAILABLE and self.supabase_key:
-            try:
-                self.client = create_client(self.supabase_url, self.supabase_key)
-                print("✅ Supabase connecté avec succès")
-            except Exception as e:
-                print(f"❌ Erreur connexion Supabase: {e}")
-                self.client = None
-        else:
-            self.client = None
-            print("⚠️ Supabase non configuré")
+        if not self.configured:
+            logger.warning("Supabase non configuré")
+    
+    @property
+    def configured(self) -> bool:
+        return SUPABASE_AVAILABLE and bool(self.supabase_key)
+    
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+    
+    @property
+    def client(self):
+        """Client Supabase, créé au premier usage"""
+        if self._client is None and not self._client_attempted and self.configured:
+            with self._client_lock:
+                if not self._client_attempted:
+                    self._client_attempted = True
+                    try:
+                        from supabase import create_client
+                        self._client = create_client(self.supabase_url, self.supabase_key)
+                        logger.info("Supabase connecté")
+                    except Exception as e:
+                        logger.error("Erreur connexion Supabase", extra=fields(error=str(e)))
+        return self._client
+    
+    def warm(self) -> bool:
+        """Crée le client et ouvre la connexion (pool httpx) avant le premier upload"""
+        if not self.client:
+            return False
+        with profiling.stage("supabase_warmup"):
+            self.client.table("candidats").select("id").limit(1).execute()
+        return True
+    
+    def find_candidate(self, file_hash: str, wp_user_id: int = 0, wp_offer_id: int = 0):
+        """Id d'un candidat déjà inséré pour ce fichier, ce candidat et cette offre"""
+        with profiling.stage("supabase_lookup"):
+            response = (
+                self.client.table("candidats").select("id")
+                .eq("file_hash", file_hash)
+                .eq("wp_user_id", wp_user_id or "")
+                .eq("wp_offer_id", wp_offer_id or "")
+                .limit(1).execute()
+            )
+        return response.data[0].get("id") if response.data else None
     
     def save_candidate(self, cv_data: dict, file_hash: str, filename: str, 
-                      wp_user_id: int = 0, wp_offer_id: int = 0, message: str = "") -> dict:
-        """Sauvegarde un candidat avec toutes les données extraites"""
+                      wp_user_id: int = 0, wp_offer_id: int = 0, message: str = "",
+                      deduplicate: bool = False) -> dict:
+        """Sauvegarde un candidat avec toutes les données extraites
+
+        `deduplicate` : pas de nouvelle ligne si ce fichier a déjà été inséré
+        pour le même candidat et la même offre (retry traité par un autre worker).
+        """
         if not self.client:
             return {"success": False, "error": "Supabase non disponible"}
         
         try:
+            if deduplicate:
+                existing_id = self.find_candidate(file_hash, wp_user_id, wp_offer_id)
+                if existing_id is not None:
+                    logger.info("Candidat déjà inséré", extra=fields(candidate_id=existing_id))
+                    return {
+                        "success": True,
+                        "candidate_id": existing_id,
+                        "action": "existing"
+                    }
+            
             extracted = cv_data.get("extracted", {})
             analysis = cv_data.get("analysis", {})
             metadata = cv_data.get("metadata", {})
             
-            print(f"📤 Préparation données Supabase pour: {filename}")
-            print(f"   Nom: {extracted.get('name')}")
-            print(f"   Email: {extracted.get('email')}")
-            print(f"   Téléphone: {extracted.get('phone')}")
-            print(f"   Compétences: {len(extracted.get('skills', []))}")
-            print(f"   Langues: {len(extracted.get('languages', []))}")
-            print(f"   Expérience: {extracted.get('experience_years', 0)} ans")
-            
             # Préparer les données EXACTEMENT pour votre table
             candidate_data = {
                 # Informations personnelles
@@ -835,29 +1073,38 @@ class SupabaseManager:
                 elif isinstance(value, str) and value == "":
                     candidate_data[key] = ""
             
-            print(f"📊 Données à insérer dans Supabase:")
-            print(f"   JSON competences: {candidate_data.get('competences', '')[:100]}...")
-            print(f"   JSON experiences: {candidate_data.get('experiences', '')[:100]}...")
-            print(f"   JSON formations: {candidate_data.get('formations', '')[:100]}...")
-            print(f"   JSON langues: {candidate_data.get('langues', '')[:100]}...")
+            logger.debug("Données à insérer dans Supabase", extra=fields(
+                filename=filename,
+                email=candidate_data.get("email"),
+                phone=candidate_data.get("telephone"),
+                competences=candidate_data.get("competences", "")[:100],
+                experiences=candidate_data.get("experiences", "")[:100],
+                formations=candidate_data.get("formations", "")[:100],
+                langues=candidate_data.get("langues", "")[:100]
+            ))
             
-            # Insérer dans Supabase
-            response = self.client.table("candidats").insert(candidate_data).execute()
+            # Insérer dans Supabase (point d'arrêt : rien n'est écrit pour un client parti)
+            with profiling.stage("supabase_insert"):
+                response = self.client.table("candidats").insert(candidate_data).execute()
             
             if response.data:
                 candidate_id = response.data[0].get("id")
-                print(f"✅ Candidat inséré avec succès, ID: {candidate_id}")
+                logger.info("Candidat inséré", extra=fields(candidate_id=candidate_id))
                 
                 # Vérifier l'insertion
-                check = self.client.table("candidats").select("*").eq("id", candidate_id).execute()
+                with profiling.stage("supabase_verify"):
+                    check = self.client.table("candidats").select("*").eq("id", candidate_id).execute()
                 if check.data:
                     inserted_data = check.data[0]
-                    print(f"📋 Données vérifiées dans Supabase:")
-                    print(f"   Nom: {inserted_data.get('nom')} {inserted_data.get('prenom')}")
-                    print(f"   Email: {inserted_data.get('email')}")
-                    print(f"   Téléphone: {inserted_data.get('telephone')}")
-                    print(f"   Compétences: {inserted_data.get('competences', '')[:50]}...")
-                    print(f"   Langues: {inserted_data.get('langues', '')[:50]}...")
+                    logger.debug("Données vérifiées dans Supabase", extra=fields(
+                        candidate_id=candidate_id,
+                        nom=inserted_data.get("nom"),
+                        prenom=inserted_data.get("prenom"),
+                        email=inserted_data.get("email"),
+                        telephone=inserted_data.get("telephone"),
+                        competences=(inserted_data.get("competences") or "")[:50],
+                        langues=(inserted_data.get("langues") or "")[:50]
+                    ))
                 
                 return {
                     "success": True,
@@ -866,20 +1113,161 @@ class SupabaseManager:
                 }
             else:
                 error_msg = "Aucune donnée retournée par Supabase"
-                print(f"❌ {error_msg}")
+                logger.error(error_msg)
                 return {"success": False, "error": error_msg}
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"❌ Erreur sauvegarde Supabase: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            metrics.FAILURES.inc(stage="supabase")
+            logger.exception("Erreur sauvegarde Supabase")
             return {"success": False, "error": str(e)}
 
 # Instance globale
 supabase_manager = SupabaseManager()
 
 # ========== ROUTES API ==========
-@app.get("/")
+router = APIRouter()
+
+def timeout_response(error: ExtractionTimeout) -> JSONResponse:
+    """Résultat structuré d'une extraction interrompue (document pathologique)"""
+    return JSONResponse(
+        {"success": False, "error": "timeout", "timeout": error.to_dict()},
+        status_code=422
+    )
+
+def deadline_response(error: DeadlineExceeded) -> JSONResponse:
+    """Traitement abandonné : échéance dépassée (ou client parti)"""
+    logger.warning("Échéance de la requête dépassée", extra=fields(reason=error.reason, stage=error.stage))
+    return JSONResponse(
+        {"success": False, "error": "deadline_exceeded", "reason": error.reason,
+         "stage": error.stage, "degraded": deadline.degraded()},
+        status_code=504
+    )
+
+def check_mode(mode: str) -> str:
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(400, f"Mode inconnu : {mode} (attendu : {', '.join(ANALYSIS_MODES)})")
+    return mode
+
+def parse_fields(spec: str) -> Optional[list]:
+    """`fields=email,phone,...` -> liste des champs (None : tous les champs)"""
+    field_names = [name.strip() for name in spec.split(",") if name.strip()]
+    if not field_names:
+        return None
+    unknown = [name for name in field_names if name not in SELECTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Champs inconnus : {', '.join(unknown)} "
+                                 f"(disponibles : {', '.join(SELECTABLE_FIELDS)})")
+    return field_names
+
+def check_format(file_content: bytes, filename: str) -> str:
+    """Format détecté du document : 400 s'il est vide, 415 s'il n'est pas pris en charge"""
+    doc_format = sniff.sniff(file_content, filename)
+    if doc_format == "empty":
+        sniff.REJECTED.inc(format=doc_format)
+        raise HTTPException(400, "Fichier vide")
+    if doc_format not in sniff.SUPPORTED or (doc_format == "pdf" and not PDF_AVAILABLE):
+        sniff.REJECTED.inc(format=doc_format)
+        raise HTTPException(415, f"Format non pris en charge : {doc_format} "
+                                 f"(attendu : {', '.join(sniff.SUPPORTED)})")
+    return doc_format
+
+async def analyze_document(file_content: bytes, filename: str, mode: str,
+                           field_names: Optional[list] = None,
+                           doc_format: Optional[str] = None) -> tuple:
+    """Extraction puis analyse au niveau du mode : (texte, résultat ou None)
+
+    En auto, on part du niveau fast et on passe au suivant tant que la
+    confiance reste sous le seuil du niveau (AUTO_FAST_CONFIDENCE pour fast,
+    AUTO_CONFIDENCE ensuite) ou que le texte est insuffisant.
+    Le texte n'est réextrait qu'après le niveau fast : standard et deep
+    partagent la même extraction. Un PDF scanné lève `ImageOnlyDocument`.
+    """
+    tiers = AUTO_TIERS if mode == "auto" else (mode,)
+    if mode == "auto" and field_names is not None and "confidence_score" not in field_names:
+        # L'escalade a besoin du score de confiance
+        field_names = field_names + ["confidence_score"]
+    text, result, previous = "", None, None
+    for tier in tiers:
+        if previous in (None, "fast"):
+            text = await run_in_threadpool(profiled(cv_extractor.extract_text), file_content, filename, tier, doc_format)
+        result = None
+        if text and len(text.strip()) >= MIN_TEXT_CHARS:
+            # Hors de la boucle : une analyse deep longue ne bloque pas les autres requêtes
+            result = await run_in_threadpool(profiled(cv_extractor.analyze), text, filename, tier, field_names)
+        metrics.ANALYSES.inc(mode=mode, tier=tier)
+        threshold = AUTO_FAST_CONFIDENCE if tier == "fast" else AUTO_CONFIDENCE
+        if result is not None and result["analysis"].get("confidence_score", 0.0) >= threshold:
+            break
+        previous = tier
+    if result is not None:
+        result["analysis"]["requested_mode"] = mode
+    return text, result
+
+def analyze_ocr_text(text: str, filename: str, mode: str,
+                     field_names: Optional[list] = None) -> Optional[dict]:
+    """Analyse du texte rendu par l'OCR (thread OCR) : None si le texte reste insuffisant"""
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        return None
+    # En auto, pas d'escalade : l'extraction coûteuse est déjà faite
+    tier = mode if mode in AUTO_TIERS else "standard"
+    result = cv_extractor.analyze(text, filename, tier, field_names)
+    metrics.ANALYSES.inc(mode=mode, tier=tier)
+    result["analysis"]["requested_mode"] = mode
+    result["analysis"]["ocr"] = True
+    return result
+
+def submit_ocr(file_content: bytes, filename: str, on_text: Callable[[str], dict]) -> Optional[dict]:
+    """Tâche OCR d'un PDF scanné : {"job_id", "status", "status_url"} (None sans moteur OCR)
+
+    `on_text` reçoit le texte reconnu dans le thread OCR et renvoie le
+    résultat de la tâche. Lève `ocr.OcrQueueFull` si la file est pleine.
+    """
+    if SERVERLESS or not ocr.available():
+        ocr.OCR_JOBS.inc(status="unavailable")
+        return None
+    job = ocr.ocr_queue.submit(file_content, filename, on_text)
+    return {"job_id": job["job_id"], "status": job["status"], "status_url": f"/jobs/{job['job_id']}"}
+
+def save_extraction(result: dict, file_hash: str, filename: str):
+    """Sauvegarde Supabase d'une analyse de /extract (ajoute `supabase` au résultat)"""
+    if result["analysis"].get("mode") == "fast":
+        # Coordonnées seules : une fiche incomplète bloquerait la sauvegarde suivante
+        result["supabase"] = {"success": False, "skipped": "fast_mode"}
+        return
+    save_result = supabase_manager.save_candidate(
+        cv_data=result,
+        file_hash=file_hash,
+        filename=filename
+    )
+    
+    if save_result["success"]:
+        result["supabase"] = save_result
+    else:
+        result["supabase"] = {"success": False, "error": save_result.get("error")}
+        logger.warning("Erreur sauvegarde Supabase", extra=fields(error=save_result.get("error")))
+
+def extract_ocr_result(text: str, filename: str, file_hash: str, mode: str,
+                       field_names: Optional[list] = None) -> dict:
+    """Résultat d'une tâche OCR lancée par /extract (même forme que la réponse de la route)"""
+    result = analyze_ocr_text(text, filename, mode, field_names)
+    if result is None:
+        return {
+            "success": True,
+            "warning": "Texte insuffisant après OCR",
+            "extracted": {"filename": filename}
+        }
+    if supabase_manager.client and field_names is None:
+        save_extraction(result, file_hash, filename)
+    return result
+
+def ocr_queue_full_response() -> JSONResponse:
+    """File OCR saturée : réessayer plus tard"""
+    return JSONResponse({"success": False, "error": "ocr_queue_full"}, status_code=503,
+                        headers={"Retry-After": "60"})
+
+@router.get("/")
 async def root():
     return {
         "service": "TruthTalent CV Parser Advanced",
@@ -888,187 +1276,357 @@ async def root():
         "features": ["extraction_avancée", "supabase_integration", "wordpress_compatible"]
     }
 
-@app.get("/health")
+@router.get("/health")
 async def health():
     return {
         "healthy": True,
         "timestamp": datetime.now().isoformat(),
-        "extractor": "ready",
-        "supabase": "connected" if supabase_manager.client else "disconnected"
+        "extractor": "retiring" if memory_guard.retiring else "ready" if warmup_state.ready else "warming_up",
+        "supabase": "connected" if supabase_manager.connected else (
+            "configured" if supabase_manager.configured else "disconnected"
+        ),
+        "admission": admission.snapshot()
     }
 
-@app.post("/extract")
-async def extract_cv(file: UploadFile = File(...)):
-    """Analyse avancée d'un CV"""
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Métriques au format texte Prometheus"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@router.get("/ready")
+async def ready():
+    """Readiness : 503 tant que le warm-up n'est pas terminé ou pendant un retrait"""
+    status = warmup_state.to_dict()
+    status["retiring"] = memory_guard.retiring
+    ok = warmup_state.ready and not memory_guard.retiring
+    return JSONResponse(status, status_code=200 if ok else 503)
+
+@router.post("/extract")
+async def extract_cv(request: Request, file: UploadFile = File(...), mode: str = Form("standard"),
+                     field_spec: str = Form("", alias="fields")):
+    """Analyse avancée d'un CV (X-TT-Profile: 1 ajoute le détail `timings`)
+
+    `mode` : fast, standard (défaut), deep ou auto.
+    `fields` : champs voulus, séparés par des virgules (défaut : tous). Seuls
+    les extracteurs nécessaires tournent ; une analyse partielle n'est pas
+    enregistrée dans Supabase.
+    """
+    profile = profiling.start() if profiling.requested(request) else None
     try:
-        print(f"📥 Requête d'extraction reçue: {file.filename}")
+        logger.info("Requête d'extraction reçue", extra=fields(file=file.filename, mode=mode))
+        check_mode(mode)
+        field_names = parse_fields(field_spec)
+        slowlog.annotate(mode=mode)
         
         if not file.filename:
             raise HTTPException(400, "Nom de fichier requis")
         
-        file_content = await file.read()
-        print(f"   Taille fichier: {len(file_content)} bytes")
+        with profiling.stage("upload_read"):
+            file_content = await file.read()
         
-        if len(file_content) == 0:
-            raise HTTPException(400, "Fichier vide")
+        # Format lu dans le contenu : vide ou non pris en charge, rejeté avant tout parsing
+        doc_format = check_format(file_content, file.filename)
         
-        # Extraire le texte
-        text = cv_extractor.extract_text(file_content, file.filename)
-        print(f"   Texte extrait: {len(text)} caractères")
+        # Calculer le hash
+        file_hash = hashlib.md5(file_content).hexdigest()
+        slowlog.annotate(file_hash=file_hash)
         
-        if not text or len(text.strip()) < 50:
-            print("⚠️ Texte insuffisant pour analyse")
-            return JSONResponse({
+        # Extraire et analyser le texte (niveau selon le mode)
+        with memory_guard.document(file_hash):
+            text, result = await analyze_document(file_content, file.filename, mode, field_names, doc_format)
+        logger.debug("Texte extrait", extra=fields(size=len(file_content), chars=len(text)))
+        profiling.set_char_count(len(text))
+        
+        if result is None:
+            logger.warning("Texte insuffisant pour analyse", extra=fields(chars=len(text)))
+            response = {
                 "success": True,
                 "warning": "Texte insuffisant pour analyse approfondie",
                 "extracted": {"filename": file.filename}
-            })
+            }
+            if profile:
+                response["timings"] = profiling.finish(profile)
+            return JSONResponse(response)
         
-        # Analyser le CV
-        print("🔍 Début de l'analyse du CV...")
-        result = cv_extractor.analyze_cv(text, file.filename)
-        print("✅ Analyse terminée")
+        # Sauvegarder dans Supabase (analyse complète uniquement, pas le niveau fast)
+        if supabase_manager.client and field_names is None:
+            save_extraction(result, file_hash, file.filename)
         
-        # Calculer le hash
-        file_hash = hashlib.md5(file_content).hexdigest()
-        
-        # Sauvegarder dans Supabase
-        save_result = {}
-        if supabase_manager.client:
-            print("💾 Sauvegarde dans Supabase...")
-            save_result = supabase_manager.save_candidate(
-                cv_data=result,
-                file_hash=file_hash,
-                filename=file.filename
-            )
-            
-            if save_result["success"]:
-                result["supabase"] = save_result
-                print("✅ Sauvegarde Supabase réussie")
-            else:
-                result["supabase"] = {"success": False, "error": save_result.get("error")}
-                print(f"⚠️ Erreur sauvegarde Supabase: {save_result.get('error')}")
+        if profile:
+            result["timings"] = profiling.finish(profile)
         
         return result
         
     except HTTPException:
         raise
+    except ImageOnlyDocument as e:
+        # PDF scanné : analyse différée dans la file OCR, statut sur /jobs/{job_id}
+        logger.info("PDF scanné envoyé à l'OCR", extra=fields(file_hash=file_hash, pages=e.pages))
+        try:
+            job = submit_ocr(file_content, file.filename, functools.partial(
+                extract_ocr_result, filename=file.filename, file_hash=file_hash,
+                mode=mode, field_names=field_names
+            ))
+        except ocr.OcrQueueFull:
+            return ocr_queue_full_response()
+        if job is None:
+            return JSONResponse({
+                "success": True,
+                "warning": "PDF scanné : OCR non disponible",
+                "extracted": {"filename": file.filename}
+            })
+        return JSONResponse({"success": True, "ocr_job": job}, status_code=202)
+    except ExtractionTimeout as e:
+        return timeout_response(e)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
     except Exception as e:
-        print(f"❌ Erreur extraction: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        metrics.FAILURES.inc(stage="extract_route")
+        logger.exception("Erreur extraction")
         return JSONResponse(
             {"success": False, "error": f"Erreur interne: {str(e)}"},
             status_code=500
         )
+    finally:
+        if profile and profiling.current_profile.get() is profile:
+            profiling.finish(profile)
 
-@app.post("/process-wordpress-upload")
+@router.post("/process-wordpress-upload")
 async def process_wordpress_upload(
+    request: Request,
     file: UploadFile = File(...),
     wp_user_id: int = Form(0),
     wp_offer_id: int = Form(0),
-    message: str = Form("")
+    message: str = Form(""),
+    mode: str = Form("standard")
 ):
-    """Endpoint pour WordPress - Version améliorée"""
+    """Endpoint pour WordPress - Version améliorée (idempotent)"""
     try:
-        print(f"\n" + "="*50)
-        print(f"📥 UPLOAD WORDPRESS REÇU")
-        print(f"   Fichier: {file.filename}")
-        print(f"   User ID: {wp_user_id}")
-        print(f"   Offer ID: {wp_offer_id}")
-        print(f"   Message: {message[:50]}..." if message else "   Message: (aucun)")
+        logger.info("Upload WordPress reçu", extra=fields(
+            file=file.filename,
+            wp_user_id=wp_user_id,
+            wp_offer_id=wp_offer_id,
+            has_message=bool(message),
+            mode=mode
+        ))
+        check_mode(mode)
+        slowlog.annotate(mode=mode)
         
         if not file.filename:
             raise HTTPException(400, "Nom de fichier requis")
         
-        file_content = await file.read()
-        print(f"   Taille: {len(file_content)} bytes")
-        
-        # Extraire le texte
-        text = cv_extractor.extract_text(file_content, file.filename)
-        print(f"   Texte extrait: {len(text)} caractères")
-        
-        if not text or len(text.strip()) < 50:
-            print("⚠️ Texte insuffisant")
-            return {
-                "success": True,
-                "warning": "Texte insuffisant pour analyse",
-                "extracted": {
-                    "name": "Candidat",
-                    "email": "",
-                    "phone": "",
-                    "skills": []
-                }
-            }
+        with profiling.stage("upload_read"):
+            file_content = await file.read()
         
-        # Analyser le CV
-        print("🔍 Analyse du CV en cours...")
-        result = cv_extractor.analyze_cv(text, file.filename)
-        extracted = result.get("extracted", {})
-        
-        print(f"📊 RÉSULTATS EXTRACTION:")
-        print(f"   Nom: {extracted.get('name')}")
-        print(f"   Email: {extracted.get('email')}")
-        print(f"   Téléphone: {extracted.get('phone')}")
-        print(f"   Localisation: {extracted.get('location')}")
-        print(f"   Compétences: {len(extracted.get('skills', []))}")
-        print(f"   Langues: {len(extracted.get('languages', []))}")
-        print(f"   Expérience: {extracted.get('experience_years', 0)} ans")
-        print(f"   Niveau: {extracted.get('experience_level')}")
-        print(f"   Formation: {extracted.get('education_degree')}")
-        print(f"   Métiers: {extracted.get('metiers')}")
+        # Format lu dans le contenu : vide ou non pris en charge, rejeté avant tout parsing
+        doc_format = check_format(file_content, file.filename)
         
         # Calculer le hash
         file_hash = hashlib.md5(file_content).hexdigest()
+        slowlog.annotate(file_hash=file_hash)
         
-        # Sauvegarder dans Supabase
-        save_result = {}
-        if supabase_manager.client:
-            print("💾 Sauvegarde dans Supabase...")
-            save_result = supabase_manager.save_candidate(
-                cv_data=result,
-                file_hash=file_hash,
-                filename=file.filename,
-                wp_user_id=wp_user_id,
-                wp_offer_id=wp_offer_id,
-                message=message
-            )
-            print(f"   Résultat sauvegarde: {save_result.get('success', False)}")
-            if save_result.get("error"):
-                print(f"   Erreur: {save_result.get('error')}")
-        
-        # Préparer la réponse
-        response = {
-            "success": True,
-            "message": "CV analysé avec succès",
-            "analysis": result.get("analysis", {}),
-            "extracted": extracted,
-            "supabase": save_result,
-            "file_info": {
-                "original_name": file.filename,
-                "file_hash": file_hash,
-                "size": len(file_content)
-            }
-        }
-        
-        if message:
-            response["candidate_message"] = message
-        
-        print("✅ Traitement terminé avec succès")
-        print("="*50 + "\n")
-        
-        return response
+        # Soumission répétée (retry WordPress) : résultat existant ou traitement en cours
+        key = idempotency.key_for(
+            request.headers.get(idempotency.IDEMPOTENCY_HEADER), file_hash, wp_user_id, wp_offer_id, mode
+        )
+        response, status = await idempotency_store.run(
+            key,
+            lambda: shared_wordpress_document(file_content, file.filename, file_hash,
+                                              wp_user_id, wp_offer_id, message, mode, doc_format),
+            cacheable=lambda result: result.get("supabase", {}).get("success", True)
+        )
+        if status != "created":
+            logger.info("Upload WordPress déjà traité", extra=fields(file_hash=file_hash, status=status))
+        return JSONResponse(response, headers={idempotency.STATUS_HEADER: status})
         
+    except HTTPException:
+        raise
+    except ocr.OcrQueueFull:
+        return ocr_queue_full_response()
+    except ExtractionTimeout as e:
+        return timeout_response(e)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
     except Exception as e:
-        print(f"❌ ERREUR WordPress: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        metrics.FAILURES.inc(stage="wordpress_route")
+        logger.exception("Erreur WordPress")
         return JSONResponse(
             {"success": False, "error": str(e)},
             status_code=500
         )
 
-@app.get("/test-supabase")
+async def shared_wordpress_document(*args) -> dict:
+    """Traitement partagé entre requêtes identiques : annulé quand toutes sont parties"""
+    with deadline.detached():
+        return await process_wordpress_document(*args)
+
+async def process_wordpress_document(file_content: bytes, filename: str, file_hash: str,
+                                     wp_user_id: int, wp_offer_id: int, message: str,
+                                     mode: str = "standard", doc_format: Optional[str] = None) -> dict:
+    """Extraction, analyse et sauvegarde d'un upload WordPress"""
+    # Extraire et analyser le texte (niveau selon le mode)
+    try:
+        with memory_guard.document(file_hash):
+            text, result = await analyze_document(file_content, filename, mode, doc_format=doc_format)
+            if result is not None and result["analysis"]["mode"] == "fast" and supabase_manager.client:
+                # Le candidat sauvegardé (et dédupliqué) doit être complet : reprise en standard
+                text, result = await analyze_document(file_content, filename, "standard", doc_format=doc_format)
+                if result is not None:
+                    result["analysis"]["requested_mode"] = mode
+    except ImageOnlyDocument as e:
+        return queue_wordpress_ocr(e, file_content, filename, file_hash, wp_user_id, wp_offer_id,
+                                   message, mode)
+    logger.debug("Texte extrait", extra=fields(size=len(file_content), chars=len(text)))
+    return wordpress_response(result, filename, file_hash, len(file_content),
+                              wp_user_id, wp_offer_id, message)
+
+def queue_wordpress_ocr(error: ImageOnlyDocument, file_content: bytes, filename: str, file_hash: str,
+                        wp_user_id: int, wp_offer_id: int, message: str, mode: str) -> dict:
+    """PDF scanné : la sauvegarde du candidat se fera à la fin de la tâche OCR
+
+    La réponse garde la forme attendue par le plugin (200, `extracted` vide)
+    et indique la tâche à suivre dans `ocr_job`.
+    """
+    logger.info("PDF scanné envoyé à l'OCR", extra=fields(file_hash=file_hash, pages=error.pages))
+    # Candidat sauvegardé : analyse complète du texte OCR même en fast
+    tier = "standard" if mode == "fast" and supabase_manager.client else mode
+
+    def on_text(text: str) -> dict:
+        result = analyze_ocr_text(text, filename, tier)
+        if result is not None:
+            result["analysis"]["requested_mode"] = mode
+        return wordpress_response(result, filename, file_hash, len(file_content),
+                                  wp_user_id, wp_offer_id, message)
+
+    job = submit_ocr(file_content, filename, on_text)
+    response = wordpress_response(None, filename, file_hash, len(file_content),
+                                  wp_user_id, wp_offer_id, message)
+    if job is None:
+        response["warning"] = "PDF scanné : OCR non disponible"
+    else:
+        response["warning"] = "PDF scanné : analyse OCR en file d'attente"
+        response["ocr_job"] = job
+    return response
+
+def wordpress_response(result: Optional[dict], filename: str, file_hash: str, size: int,
+                       wp_user_id: int, wp_offer_id: int, message: str) -> dict:
+    """Sauvegarde du candidat et réponse WordPress pour une analyse (None : texte insuffisant)"""
+    if result is None:
+        logger.warning("Texte insuffisant", extra=fields(file_hash=file_hash))
+        return {
+            "success": True,
+            "warning": "Texte insuffisant pour analyse",
+            "extracted": {
+                "name": "Candidat",
+                "email": "",
+                "phone": "",
+                "skills": []
+            }
+        }
+    
+    extracted = result.get("extracted", {})
+    
+    logger.debug("Résultats extraction", extra=fields(
+        name=extracted.get("name"),
+        email=extracted.get("email"),
+        phone=extracted.get("phone"),
+        location=extracted.get("location"),
+        skills=len(extracted.get("skills", [])),
+        languages=len(extracted.get("languages", [])),
+        experience_years=extracted.get("experience_years", 0),
+        experience_level=extracted.get("experience_level"),
+        degree=extracted.get("education_degree"),
+        metiers=extracted.get("metiers")
+    ))
+    
+    # Sauvegarder dans Supabase (jamais une analyse fast : la déduplication bloquerait la fiche complète)
+    save_result = {}
+    if supabase_manager.client and result["analysis"].get("mode") == "fast":
+        save_result = {"success": False, "skipped": "fast_mode"}
+    elif supabase_manager.client:
+        save_result = supabase_manager.save_candidate(
+            cv_data=result,
+            file_hash=file_hash,
+            filename=filename,
+            wp_user_id=wp_user_id,
+            wp_offer_id=wp_offer_id,
+            message=message,
+            deduplicate=True
+        )
+        if save_result.get("error"):
+            logger.warning("Erreur sauvegarde Supabase", extra=fields(error=save_result.get("error")))
+    
+    # Préparer la réponse (`analysis.degraded` : étapes sautées faute de temps)
+    response = {
+        "success": True,
+        "message": "CV analysé avec succès",
+        "analysis": result.get("analysis", {}),
+        "extracted": extracted,
+        "supabase": save_result,
+        "file_info": {
+            "original_name": filename,
+            "file_hash": file_hash,
+            "size": size
+        }
+    }
+    
+    if message:
+        response["candidate_message"] = message
+    
+    logger.info("Traitement terminé", extra=fields(
+        file_hash=file_hash,
+        saved=save_result.get("success", False)
+    ))
+    
+    return response
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Statut d'une tâche OCR (queued, running, done, failed) et, une fois finie, son résultat
+
+    Le résultat final n'est rendu qu'une fois : il est ensuite supprimé.
+    """
+    job = ocr.job_store.fetch(job_id)
+    if job is None:
+        raise HTTPException(404, "Tâche introuvable")
+    return job
+
+@router.get("/admin/slow-requests", dependencies=[Depends(require_admin)])
+async def list_slow_requests():
+    """Requêtes lentes capturées (plus récentes en premier)"""
+    return {
+        "threshold_seconds": slow_recorder.threshold,
+        "traces": slow_recorder.list_traces()
+    }
+
+@router.get("/admin/slow-requests/{trace_id}", dependencies=[Depends(require_admin)])
+async def download_slow_request(trace_id: str):
+    """Piles échantillonnées au format collapsed (flamegraph)"""
+    trace = slow_recorder.get_trace(trace_id)
+    if not trace:
+        raise HTTPException(404, "Trace introuvable")
+    return PlainTextResponse(
+        trace.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="{trace_id}.folded"'}
+    )
+
+@router.get("/debug/profile", dependencies=[Depends(require_admin)])
+async def debug_profile(seconds: float = 10.0, sort: str = "cumulative", limit: int = 50):
+    """cProfile sur une fenêtre de `seconds` secondes, pstats triées"""
+    try:
+        report = await profile_window(seconds, sort, limit)
+    except ProfilerBusy:
+        raise HTTPException(409, "Profilage déjà en cours")
+    return PlainTextResponse(report)
+
+@router.get("/debug/memory", dependencies=[Depends(require_admin)])
+async def debug_memory(limit: int = 25, reset: bool = False, stop: bool = False):
+    """Top des allocations tracemalloc et diff avec l'instantané de référence"""
+    if stop:
+        return memory_tracker.stop()
+    return memory_tracker.report(limit=limit, reset_baseline=reset)
+
+@router.get("/test-supabase")
 async def test_supabase():
     """Test Supabase avec vérification"""
     if not supabase_manager.client:
@@ -1098,21 +1656,118 @@ async def test_supabase():
     except Exception as e:
         return {"connected": False, "error": str(e)}
 
+# ========== APPLICATION ==========
+# Métriques par route et identifiant de corrélation
+async def observe_requests(request: Request, call_next):
+    # Identifiant serveur toujours généré ; celui du client sert à la corrélation
+    server_id = uuid.uuid4().hex[:16]
+    request_id = request.headers.get("x-request-id") or server_id
+    new_request_context(request_id)
+    profiling.server_request_id.set(server_id)
+    capture = None
+    if request.url.path in CAPTURED_ROUTES and not request.app.state.serverless:
+        capture = slow_recorder.begin(server_id, request_id, request.url.path)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    except asyncio.CancelledError:
+        # Client parti : traitement annulé par DeadlineMiddleware
+        status = 499
+        raise
+    finally:
+        endpoint = request.scope.get("endpoint")
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            route=endpoint.__name__ if endpoint else "unmatched",
+            method=request.method,
+            status=str(status)
+        )
+        if capture:
+            slow_recorder.end(capture)
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """Démarrage : surveillance de boucle et warm-up en arrière-plan"""
+    serverless = application.state.serverless
+    if not serverless and LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    
+    warmup_task = None
+    if WARMUP_ENABLED and not serverless:
+        warmup_task = asyncio.create_task(run_warmup(cv_extractor, supabase_manager))
+    else:
+        warmup_state.ready = True
+    
+    yield
+    
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await loop_monitor.stop()
+    sandbox.shutdown()
+    ocr.shutdown()
+
+def create_app(serverless: bool = SERVERLESS) -> FastAPI:
+    """Construit l'application sans I/O (clients et modèles sont créés au premier usage)
+
+    En mode serverless, seules les routes et les middlewares sont installés :
+    pas de thread de métriques, de surveillance de boucle, d'échantillonneur
+    ni de warm-up.
+    """
+    application = FastAPI(
+        title="TruthTalent CV Parser",
+        description="API d'extraction avancée de CV",
+        version="3.0.0",
+        lifespan=lifespan
+    )
+    application.state.serverless = serverless
+    
+    # Le dernier middleware ajouté est le plus externe.
+    # Corps compressés décompressés sous la garde de ratio, sous l'admission
+    # (une requête refusée ne coûte pas sa décompression)
+    application.add_middleware(compression.RequestDecompressionMiddleware)
+    application.middleware("http")(admission.admission_control)
+    # CORS autour de l'admission et de la décompression : les refus 429/503 et
+    # 413/415 en portent les en-têtes, lisibles par le navigateur
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Les refus sont mesurés
+    application.middleware("http")(observe_requests)
+    if compression.GZIP_ENABLED:
+        application.add_middleware(GZipMiddleware, minimum_size=compression.GZIP_MIN_SIZE,
+                                   compresslevel=compression.GZIP_LEVEL)
+    # ASGI pur et le plus externe : BaseHTTPMiddleware masque la déconnexion du client
+    application.add_middleware(DeadlineMiddleware)
+    application.include_router(router)
+    
+    if not serverless:
+        metrics.start_flusher()
+    
+    return application
+
+app = create_app()
+
 # ========== POINT D'ENTRÉE ==========
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 10000))
-    print(f"\n" + "="*50)
-    print(f"🚀 TruthTalent API Advanced démarrée")
-    print(f"   Port: {port}")
-    print(f"   PDF support: {PDF_AVAILABLE}")
-    print(f"   DOCX support: {DOCX_AVAILABLE}")
-    print(f"   Supabase: {SUPABASE_AVAILABLE and bool(SUPABASE_KEY)}")
-    print(f"   Extraction: PRÊTE")
-    print("="*50 + "\n")
-    
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
+    logger.info("TruthTalent API Advanced démarrée", extra=fields(
         port=port,
-        workers=1
-    )
\ No newline at end of file
+        pdf_support=PDF_AVAILABLE,
+        docx_support=True,
+        ocr_support=ocr.available(),
+        supabase=SUPABASE_AVAILABLE and bool(SUPABASE_KEY)
+    ))
+    
+    import sys
+    from lib.server import serve
+    # Le lanceur importe `app` : on réutilise ce module plutôt que de le recharger
+    sys.modules.setdefault("app", sys.modules[__name__])
+    sys.exit(serve(port=port))
\ No newline at end of file
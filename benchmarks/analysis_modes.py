@@ -0,0 +1,78 @@
+"""
+Latence de chaque mode d'analyse (fast, standard, deep, auto)
+
+    python -m benchmarks.analysis_modes > /dev/null
+
+Extraction (processus isolé compris) et analyse d'un même document dans
+chaque mode, en processus : médiane et p95 sur TT_BENCH_ITERATIONS passages,
+niveau finalement atteint en auto et score de confiance. Les documents
+« sans nom » (email et téléphone seuls : score fast sous
+TT_AUTO_FAST_CONFIDENCE) et « sans coordonnées » forcent l'escalade du mode
+auto. Résultats sur stderr.
+"""
+import os
+import sys
+import time
+import asyncio
+import statistics
+
+from lib import samples
+
+ITERATIONS = int(os.getenv("TT_BENCH_ITERATIONS", "20"))
+
+NO_CONTACT_TEXT = "\n".join(
+    line for line in samples.SAMPLE_CV_TEXT.splitlines()
+    if not line.startswith(("Email", "Tel", "Jean"))
+)
+
+NO_NAME_TEXT = "\n".join(
+    line for line in samples.SAMPLE_CV_TEXT.splitlines() if not line.startswith("Jean")
+)
+
+DOCUMENTS = {
+    "1 page (pdf)": ("cv.pdf", samples.make_pdf),
+    "40 pages (pdf)": ("cv.pdf", samples.make_long_pdf),
+    "docx": ("cv.docx", samples.make_docx),
+    "sans nom (txt)": ("cv.txt", lambda: samples.make_txt(NO_NAME_TEXT)),
+    "sans coordonnées (txt)": ("cv.txt", lambda: samples.make_txt(NO_CONTACT_TEXT)),
+}
+
+
+def measure(app, filename: str, content: bytes, mode: str) -> dict:
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        _, result = asyncio.run(app.analyze_document(content, filename, mode))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    analysis = result["analysis"] if result else {}
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "tier": analysis.get("mode", "-"),
+        "confidence": analysis.get("confidence_score", 0.0),
+    }
+
+
+def main() -> int:
+    import app
+    from lib import metrics, sandbox
+
+    try:
+        with metrics.muted():
+            for label, (filename, build) in DOCUMENTS.items():
+                content = build()
+                # Premier passage hors mesure (processus isolés, motifs compilés)
+                asyncio.run(app.analyze_document(content, filename, "deep"))
+                for mode in app.ANALYSIS_MODES:
+                    result = measure(app, filename, content, mode)
+                    print(f"{label:24} {mode:8} p50={result['p50_ms']:8.2f} ms "
+                          f"p95={result['p95_ms']:8.2f} ms niveau={result['tier']:8} "
+                          f"confiance={result['confidence']:.2f}", file=sys.stderr)
+    finally:
+        sandbox.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Extraction DOCX : python-docx contre lecture en flux (lib.docxstream)
+
+    python -m benchmarks.docx_extraction > /dev/null
+
+Sur un petit corpus synthétique (CV simple, modèle avec en-tête, tableau et
+zone de texte, document de 20 000 paragraphes), en processus : médiane sur
+TT_BENCH_ITERATIONS passages, pic mémoire (tracemalloc) et caractères
+extraits par chaque méthode. « flux (parcours) » lit les lignes sans garder
+le texte : le pic mesure alors le parsing seul. Résultats sur stderr.
+"""
+import os
+import sys
+import time
+import statistics
+import tracemalloc
+from io import BytesIO
+
+from lib import samples, docxstream
+
+ITERATIONS = int(os.getenv("TT_BENCH_ITERATIONS", "20"))
+
+CORPUS = {
+    "cv simple": samples.make_docx,
+    "modèle (en-tête, tableau)": samples.make_template_docx,
+    "20 000 paragraphes": samples.make_large_docx,
+}
+
+
+def python_docx_text(content: bytes) -> str:
+    from docx import Document
+
+    return "\n".join(paragraph.text for paragraph in Document(BytesIO(content)).paragraphs)
+
+
+def stream_text(content: bytes) -> str:
+    return docxstream.extract(content, sys.maxsize)["text"]
+
+
+def stream_lines(content: bytes) -> int:
+    # Parcours seul, sans garder le texte : mémoire du parsing elle-même
+    return max(0, sum(len(line) + 1 for line in docxstream.iter_lines(content)) - 1)
+
+
+METHODS = {"python-docx": python_docx_text, "flux": stream_text, "flux (parcours)": stream_lines}
+
+
+def measure(method, content: bytes) -> dict:
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        text = method(content)
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    method(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    chars = text if isinstance(text, int) else len(text)
+    return {"p50_ms": statistics.median(timings), "peak_kb": peak / 1024, "chars": chars}
+
+
+def main() -> int:
+    for label, build in CORPUS.items():
+        content = build()
+        for name, method in METHODS.items():
+            method(content)
+            result = measure(method, content)
+            print(f"{label:26} {name:15} p50={result['p50_ms']:9.2f} ms "
+                  f"pic={result['peak_kb']:9.0f} Ko caractères={result['chars']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
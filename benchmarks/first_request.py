@@ -0,0 +1,82 @@
+"""
+Écart entre la première requête et le régime établi
+
+    python -m benchmarks.first_request
+
+Lance uvicorn avec et sans warm-up (TT_WARMUP), attend /ready puis envoie
+le même CV PDF plusieurs fois à /extract : l'écart est la latence de la
+première requête moins la médiane des suivantes.
+"""
+import os
+import sys
+import time
+import uuid
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+from benchmarks.startup import ROOT, _free_port
+from lib.samples import make_pdf
+
+REQUESTS = int(os.getenv("TT_BENCH_REQUESTS", "10"))
+
+
+def _multipart(filename: str, content: bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _wait_ready(port: int, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1):
+                return
+        except (OSError, urllib.error.HTTPError):
+            time.sleep(0.02)
+    raise TimeoutError("L'instance n'est jamais prête")
+
+
+def measure(warmup: bool) -> dict:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "TT_LOG_LEVEL": "ERROR", "TT_WARMUP": "1" if warmup else "0"},
+    )
+    body, content_type = _multipart("cv.pdf", make_pdf())
+    latencies = []
+    try:
+        _wait_ready(port)
+        for _ in range(REQUESTS):
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/extract", data=body,
+                headers={"Content-Type": content_type}, method="POST",
+            )
+            start = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        process.terminate()
+        process.wait()
+    steady = statistics.median(latencies[1:])
+    return {"first_ms": latencies[0], "steady_ms": steady, "gap_ms": latencies[0] - steady}
+
+
+def main() -> int:
+    for warmup in (False, True):
+        result = measure(warmup)
+        label = "avec warm-up" if warmup else "sans warm-up"
+        print(f"{label}: première {result['first_ms']:.1f} ms, "
+              f"médiane suivantes {result['steady_ms']:.1f} ms, écart {result['gap_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
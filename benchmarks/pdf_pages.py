@@ -0,0 +1,81 @@
+"""
+Extraction PDF page par page : arrêt anticipé et découpage des longs PDF
+
+    python -m benchmarks.pdf_pages > /dev/null
+
+Sur un PDF d'une page et un de 40 pages, via les processus isolés :
+- standard : lecture séquentielle d'un bloc, puis découpage forcé entre
+  les processus isolés (TT_PDF_SPLIT_MIN_PAGES, une plage par processus,
+  même sur une machine à un seul cœur où il est désactivé par défaut) ;
+- fast : plafond de pages du mode fast, sans puis avec arrêt à la page où
+  email et téléphone sont trouvés.
+Médiane et p95 sur TT_BENCH_ITERATIONS passages, pages lues. Résultats sur
+stderr.
+"""
+import os
+import sys
+import time
+import statistics
+
+from lib import samples
+
+ITERATIONS = int(os.getenv("TT_BENCH_ITERATIONS", "50"))
+
+DOCUMENTS = {
+    "1 page": samples.make_pdf,
+    "40 pages": samples.make_long_pdf,
+}
+
+
+def measure(content: bytes, max_pages: int, max_chars: int, **options) -> dict:
+    from lib import sandbox
+
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        extraction = sandbox.extract("pdf", content, max_pages=max_pages, max_chars=max_chars,
+                                     **options)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "pages_read": extraction["pages_read"],
+        "chars": len(extraction["text"]),
+    }
+
+
+def main() -> int:
+    import app
+    from lib import metrics, sandbox
+
+    split_workers = sandbox.SPLIT_WORKERS
+    scenarios = {
+        "standard séquentiel": (sandbox.MAX_PAGES, sandbox.MAX_TEXT_CHARS, {}, 1),
+        "standard découpé": (sandbox.MAX_PAGES, sandbox.MAX_TEXT_CHARS, {}, sandbox.SANDBOX_WORKERS),
+        "fast": (app.FAST_MAX_PAGES, app.FAST_MAX_CHARS, {"fallback": False}, 1),
+        "fast arrêt anticipé": (app.FAST_MAX_PAGES, app.FAST_MAX_CHARS,
+                                {"fallback": False, "stop_patterns": app.CONTACT_STOP_PATTERNS}, 1),
+    }
+    print(f"cœurs : {os.cpu_count()}, processus isolés : {sandbox.SANDBOX_WORKERS}, "
+          f"découpage par défaut : {split_workers} plage(s)", file=sys.stderr)
+    try:
+        with metrics.muted():
+            for label, build in DOCUMENTS.items():
+                content = build()
+                # Premier passage hors mesure (processus isolés, motifs compilés)
+                sandbox.extract("pdf", content, stop_patterns=app.CONTACT_STOP_PATTERNS)
+                for scenario, (max_pages, max_chars, options, workers) in scenarios.items():
+                    sandbox.SPLIT_WORKERS = workers
+                    result = measure(content, max_pages, max_chars, **options)
+                    print(f"{label:9} {scenario:21} p50={result['p50_ms']:7.2f} ms "
+                          f"p95={result['p95_ms']:7.2f} ms pages lues={result['pages_read']:3} "
+                          f"caractères={result['chars']}", file=sys.stderr)
+    finally:
+        sandbox.SPLIT_WORKERS = split_workers
+        sandbox.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
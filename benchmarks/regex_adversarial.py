@@ -0,0 +1,129 @@
+"""
+Pire cas des motifs d'analyse sur des entrées hostiles
+
+    python -m benchmarks.regex_adversarial
+
+Rejoue chaque motif enregistré dans lib.patterns (ceux qu'utilisent
+l'extracteur et le parser du mode deep sur un CV réel) contre des textes
+construits pour provoquer du backtracking : longues répétitions des
+classes de caractères des motifs, préfixes de mots-clés sans suite, et
+mélanges aléatoires de fragments (fuzz, graine fixe). Le script échoue (code 1) si un motif dépasse
+TT_REGEX_BUDGET_MS sur un texte de TT_ADVERSARIAL_CHARS caractères.
+"""
+import os
+import sys
+import time
+import random
+from typing import Dict, List, Tuple
+
+from lib import patterns, samples
+
+BUDGET_MS = float(os.getenv("TT_REGEX_BUDGET_MS", "100"))
+CHARS = int(os.getenv("TT_ADVERSARIAL_CHARS", "100000"))
+FUZZ_CASES = int(os.getenv("TT_FUZZ_CASES", "20"))
+# Délai de garde : un motif catastrophique est arrêté et compté au-delà
+GUARD_TIMEOUT = max(1.0, BUDGET_MS * 20 / 1000)
+
+FRAGMENTS = [
+    "a", "A", "1", "12", " ", ".", "-", "@", ":", "+33", "Tel", "Tél.", "Phone", "e-mail",
+    "contact", "linkedin.com/in/", "Profil LinkedIn", "LinkedIn", "compétences", "skills",
+    "langues", "formation", "éducation", "profil", "objectif", "jan", "janvier", "2019",
+    "ans", "années", "expérience", "Nom", "Prénom", "\n", "é",
+]
+
+
+def _repeat(unit: str, prefix: str = "", suffix: str = "") -> str:
+    return prefix + unit * max(1, (CHARS - len(prefix) - len(suffix)) // len(unit)) + suffix
+
+
+def adversarial_inputs() -> Dict[str, str]:
+    inputs = {
+        "letters": _repeat("a"),
+        "digits": _repeat("1"),
+        "spaces": _repeat(" "),
+        "dots": _repeat("a."),
+        "email_no_tld": _repeat("a", suffix="@" + "a" * 50),
+        "email_local_run": _repeat("a.", suffix="@"),
+        "at_signs": _repeat("a@"),
+        "digit_pairs": _repeat("12 "),
+        "digit_dots": _repeat("12."),
+        "phone_prefix": _repeat("1 ", prefix="Tel: "),
+        "phone_keywords": _repeat("Tél : 1 "),
+        "linkedin_no_url": _repeat("Profil LinkedIn : "),
+        "linkedin_colon": _repeat("a", prefix="Profil LinkedIn :"),
+        "section_no_colon": _repeat("compétences : " + "x" * 20),
+        "section_keywords": _repeat("Langues: Formation: Profil: "),
+        "months": _repeat("jan"),
+        "month_letters": _repeat("a", prefix="janvier"),
+        "years": _repeat("2019 - "),
+        "year_digits": _repeat("2019"),
+        "experience": _repeat("1 ans "),
+        "experience_digits": _repeat("1", suffix=" années"),
+        "names": _repeat("Nom: " + "x" * 40),
+    }
+    rng = random.Random(0)
+    for case in range(FUZZ_CASES):
+        parts: List[str] = []
+        size = 0
+        while size < CHARS:
+            fragment = rng.choice(FRAGMENTS) * rng.choice((1, 1, 2, 5, 50))
+            parts.append(fragment)
+            size += len(fragment)
+        inputs[f"fuzz_{case}"] = "".join(parts)[:CHARS]
+    return inputs
+
+
+def load_patterns() -> List[Tuple[str, int]]:
+    """Fait tourner l'extracteur (et le parser du mode deep) pour enregistrer tous ses motifs"""
+    import app
+    from lib.advanced_cv_parser import advanced_parser
+
+    extractor = app.cv_extractor
+    for build_text in (samples.SAMPLE_CV_TEXT, "", "Nom: X\nLangues: anglais\nFormation: bac"):
+        extractor.analyze_cv(build_text)
+        advanced_parser.parse_cv_advanced(build_text)
+        extractor._extract_summary(build_text)
+        extractor._extract_job_title(build_text)
+    _ = extractor.taxonomy
+    return patterns.registered()
+
+
+def worst_case(source: str, flags: int, inputs: Dict[str, str]) -> Tuple[float, str]:
+    compiled = patterns.compile(source, flags)
+    worst, worst_input = 0.0, ""
+    for name, text in inputs.items():
+        start = time.perf_counter()
+        try:
+            if patterns.REGEX_AVAILABLE:
+                compiled.findall(text, timeout=GUARD_TIMEOUT)
+            else:
+                compiled.findall(text)
+            elapsed = (time.perf_counter() - start) * 1000
+        except TimeoutError:
+            elapsed = float("inf")
+        if elapsed > worst:
+            worst, worst_input = elapsed, name
+    return worst, worst_input
+
+
+def main() -> int:
+    inputs = adversarial_inputs()
+    results = []
+    for source, flags in load_patterns():
+        worst, worst_input = worst_case(source, flags, inputs)
+        results.append((worst, worst_input, source))
+
+    failures = 0
+    for worst, worst_input, source in sorted(results, reverse=True):
+        over = worst > BUDGET_MS
+        failures += over
+        shown = "timeout" if worst == float("inf") else f"{worst:.1f} ms"
+        if over or worst > BUDGET_MS / 10:
+            print(f"{'ÉCHEC' if over else 'ok'} {shown:>10} [{worst_input}] {source[:90]}")
+    print(f"{len(results)} motifs, {len(inputs)} entrées de {CHARS} caractères, "
+          f"budget {BUDGET_MS:.0f} ms : {failures} échec(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
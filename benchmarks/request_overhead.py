@@ -0,0 +1,43 @@
+"""
+Surcoût par requête du pipeline (journalisation incluse)
+
+    python -m benchmarks.request_overhead [iterations] > /dev/null
+
+Les résultats sont écrits sur stderr pour ne pas être mélangés aux logs.
+"""
+import sys
+import time
+import statistics
+
+from fastapi.testclient import TestClient
+
+from lib import samples
+
+
+def run(iterations: int = 200) -> dict:
+    import app
+    client = TestClient(app.app)
+    payload = samples.make_pdf()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.post(
+            "/process-wordpress-upload",
+            files={"file": ("cv.pdf", payload, "application/pdf")},
+            data={"wp_user_id": "1", "wp_offer_id": "2", "message": "Bonjour"},
+        )
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95)] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    result = run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
+    print(" ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()),
+          file=sys.stderr)
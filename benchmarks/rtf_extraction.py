@@ -0,0 +1,60 @@
+"""
+Extraction RTF : décodage UTF-8 brut contre texte visible (lib.rtf)
+
+    python -m benchmarks.rtf_extraction > /dev/null
+
+Sur le RTF synthétique façon Word (samples.make_rtf : polices, styles,
+métadonnées, thème et photo en hexadécimal, en-tête, tableau), en
+processus : médiane sur TT_BENCH_ITERATIONS passages de l'extraction puis
+de l'analyse, caractères envoyés à l'analyse, téléphone trouvé et mots de
+contrôle restés dans le résumé. Résultats sur stderr.
+"""
+import os
+import sys
+import time
+import statistics
+
+from lib import samples, rtf, sandbox
+
+ITERATIONS = int(os.getenv("TT_BENCH_ITERATIONS", "20"))
+
+
+def raw_text(content: bytes) -> str:
+    # Ancien chemin : le RTF lu comme du texte brut
+    return content.decode("utf-8", errors="ignore")[:sandbox.MAX_TEXT_CHARS]
+
+
+def visible_text(content: bytes) -> str:
+    return rtf.extract(content, sandbox.MAX_TEXT_CHARS)["text"]
+
+
+METHODS = {"utf-8 brut": raw_text, "tokenizer": visible_text}
+
+
+def _median_ms(function, *args) -> float:
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        function(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> int:
+    from app import cv_extractor
+
+    content = samples.make_rtf()
+    print(f"RTF de {len(content)} octets", file=sys.stderr)
+    for name, method in METHODS.items():
+        text = method(content)
+        extracted = cv_extractor.analyze_cv(text, "cv.rtf")["extracted"]
+        extract_ms = _median_ms(method, content)
+        analyze_ms = _median_ms(cv_extractor.analyze_cv, text, "cv.rtf")
+        print(f"{name:11} extraction={extract_ms:7.2f} ms analyse={analyze_ms:7.2f} ms "
+              f"caractères={len(text):6} téléphone={extracted['phone'] or '-'} "
+              f"contrôles_dans_résumé={extracted['summary'].count(chr(92))}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
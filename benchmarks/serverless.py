@@ -0,0 +1,70 @@
+"""
+Harnais de cycle de vie serverless (démarrage à froid / invocations à chaud)
+
+    python -m benchmarks.serverless [cold_starts] [warm_invocations]
+
+Chaque démarrage à froid est un nouveau processus Python qui importe
+lib.api.main (comme le runtime Vercel via jobs.py) puis sert des
+invocations ASGI successives sur la même instance, comme une fonction
+restée chaude.
+"""
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = r"""
+import json, sys, time, asyncio
+t0 = time.perf_counter()
+from lib.api.main import app
+t1 = time.perf_counter()
+import httpx
+from lib import samples
+
+async def invoke(client, payload):
+    start = time.perf_counter()
+    response = await client.post("/extract", files={"file": ("cv.pdf", payload, "application/pdf")})
+    assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) * 1000
+
+async def main(warm):
+    payload = samples.make_pdf()
+    async with httpx.AsyncClient(app=app, base_url="http://lambda") as client:
+        first = await invoke(client, payload)
+        warm_timings = [await invoke(client, payload) for _ in range(warm)]
+    return first, warm_timings
+
+first, warm_timings = asyncio.run(main(int(sys.argv[1])))
+print(json.dumps({"init_ms": (t1 - t0) * 1000, "first_ms": first, "warm_ms": warm_timings}))
+"""
+
+
+def cold_start(warm_invocations: int) -> dict:
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD, str(warm_invocations)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, "TT_LOG_LEVEL": "ERROR", "VERCEL": "1"},
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def main(cold_starts: int = 3, warm_invocations: int = 50):
+    runs = [cold_start(warm_invocations) for _ in range(cold_starts)]
+    warm = sorted(t for run in runs for t in run["warm_ms"])
+    print(f"démarrages à froid: {cold_starts}, invocations à chaud: {len(warm)}")
+    print(f"  processus complet      : {statistics.median(r['process_ms'] for r in runs):.1f} ms (médiane)")
+    print(f"  import lib.api.main    : {statistics.median(r['init_ms'] for r in runs):.1f} ms (médiane)")
+    print(f"  1re invocation (froid) : {statistics.median(r['first_ms'] for r in runs):.1f} ms (médiane)")
+    print(f"  invocation à chaud     : p50 {warm[len(warm) // 2]:.2f} ms, p95 {warm[int(len(warm) * 0.95)]:.2f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,101 @@
+"""
+Budget de démarrage à froid
+
+    python -m benchmarks.startup
+
+Mesure (1) le temps d'import de `app` via `python -X importtime` et
+(2) le temps jusqu'à la première réponse de /health d'un uvicorn lancé à
+froid. Le script échoue (code 1) si un budget est dépassé :
+TT_IMPORT_BUDGET_MS et TT_FIRST_RESPONSE_BUDGET_MS.
+"""
+import os
+import sys
+import time
+import socket
+import subprocess
+import urllib.request
+
+IMPORT_BUDGET_MS = float(os.getenv("TT_IMPORT_BUDGET_MS", "800"))
+FIRST_RESPONSE_BUDGET_MS = float(os.getenv("TT_FIRST_RESPONSE_BUDGET_MS", "2500"))
+# Modules lourds qui ne doivent pas être chargés à l'import de l'application
+LAZY_MODULES = ("PyPDF2", "docx", "supabase", "spacy", "pdfplumber")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module: str = "app") -> dict:
+    """Temps d'import cumulé et modules les plus coûteux"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "TT_LOG_LEVEL": "ERROR"},
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        depth = len(raw_name) - len(raw_name.lstrip())
+        entries.append((int(cumulative_us), depth, raw_name.strip()))
+    total_us = next((c for c, _, name in reversed(entries) if name == module), 0)
+    loaded = {name for _, _, name in entries}
+    # Imports directs de `module` : un niveau d'indentation sous lui
+    module_depth = next((d for _, d, name in entries if name == module), 1)
+    top = sorted(((c, name) for c, d, name in entries if d == module_depth + 2), reverse=True)[:8]
+    return {
+        "import_ms": total_us / 1000,
+        "eager_heavy_modules": [m for m in LAZY_MODULES if m in loaded],
+        "top_imports": [(name, c / 1000) for c, name in top],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(timeout: float = 30.0) -> float:
+    """Millisecondes entre le lancement d'uvicorn et la première réponse 200"""
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "TT_LOG_LEVEL": "ERROR"},
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("Pas de réponse de /health")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main() -> int:
+    imports = measure_import()
+    first_response_ms = measure_first_response()
+    print(f"import app: {imports['import_ms']:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    for name, ms in imports["top_imports"]:
+        print(f"    {name}: {ms:.0f} ms")
+    print(f"première réponse: {first_response_ms:.0f} ms (budget {FIRST_RESPONSE_BUDGET_MS:.0f} ms)")
+
+    failures = []
+    if imports["eager_heavy_modules"]:
+        failures.append(f"modules lourds importés au démarrage: {imports['eager_heavy_modules']}")
+    if imports["import_ms"] > IMPORT_BUDGET_MS:
+        failures.append("budget d'import dépassé")
+    if first_response_ms > FIRST_RESPONSE_BUDGET_MS:
+        failures.append("budget de première réponse dépassé")
+    for failure in failures:
+        print(f"ÉCHEC: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Octets transférés et latence : uploads et réponses compressés ou non
+
+    python -m benchmarks.upload_compression
+
+Lance uvicorn, puis envoie chaque CV synthétique à /extract dans les quatre
+combinaisons corps brut / gzip (Content-Encoding) et réponse brute / gzip
+(Accept-Encoding). Pour chacune : octets envoyés et reçus, médiane de
+latence sur TT_BENCH_REQUESTS requêtes en local, et temps de transfert
+estimé sur un lien de TT_BENCH_LINK_KBPS kbit/s (hébergement mutualisé
+lent), qui s'ajoute à la latence locale.
+"""
+import os
+import sys
+import gzip
+import time
+import statistics
+import subprocess
+import urllib.request
+
+from benchmarks.startup import ROOT, _free_port
+from benchmarks.first_request import _multipart, _wait_ready
+from lib import samples
+
+REQUESTS = int(os.getenv("TT_BENCH_REQUESTS", "10"))
+LINK_KBPS = float(os.getenv("TT_BENCH_LINK_KBPS", "1000"))
+
+CORPUS = {
+    "cv.pdf": samples.make_pdf,
+    "portfolio.pdf": lambda: samples.make_long_pdf(40),
+    "cv.docx": samples.make_template_docx,
+    "cv.rtf": samples.make_rtf,
+    "cv.txt": samples.make_txt,
+}
+
+
+def _send(port: int, body: bytes, content_type: str, compress_body: bool, accept_gzip: bool) -> dict:
+    headers = {"Content-Type": content_type, "Accept-Encoding": "gzip" if accept_gzip else "identity"}
+    if compress_body:
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    latencies, received = [], 0
+    for _ in range(REQUESTS):
+        request = urllib.request.Request(f"http://127.0.0.1:{port}/extract", data=body,
+                                         headers=headers, method="POST")
+        start = time.perf_counter()
+        # urllib ne décompresse pas : la longueur lue est celle transmise
+        with urllib.request.urlopen(request, timeout=30) as response:
+            received = len(response.read())
+        latencies.append((time.perf_counter() - start) * 1000)
+    sent = len(body)
+    return {"sent": sent, "received": received, "p50_ms": statistics.median(latencies),
+            "link_ms": (sent + received) * 8 / LINK_KBPS}
+
+
+def main() -> int:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "TT_LOG_LEVEL": "ERROR", "TT_WARMUP": "0"},
+    )
+    try:
+        _wait_ready(port)
+        for filename, build in CORPUS.items():
+            body, content_type = _multipart(filename, build())
+            for compress_body in (False, True):
+                for accept_gzip in (False, True):
+                    result = _send(port, body, content_type, compress_body, accept_gzip)
+                    label = f"corps {'gzip' if compress_body else 'brut'}, réponse {'gzip' if accept_gzip else 'brute'}"
+                    print(f"{filename:14} {label:29} envoyés={result['sent']:7} reçus={result['received']:6} "
+                          f"local p50={result['p50_ms']:7.1f} ms "
+                          f"lien {LINK_KBPS:.0f} kbit/s ≈ {result['p50_ms'] + result['link_ms']:7.1f} ms")
+    finally:
+        process.terminate()
+        process.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
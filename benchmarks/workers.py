@@ -0,0 +1,100 @@
+"""
+Mémoire par worker et montée en charge du serveur pre-fork
+
+    python -m benchmarks.workers [N]
+
+Pour 1..N workers (N = CPU disponibles par défaut), lance `lib.server`,
+envoie des CV PDF en parallèle pendant TT_BENCH_SECONDS et affiche le débit
+ainsi que la RSS et la PSS (part réellement privée, pages copy-on-write
+partagées réparties) de chaque worker, lues dans /proc.
+"""
+import os
+import sys
+import time
+import threading
+import subprocess
+import urllib.request
+from typing import Dict, List
+
+from benchmarks.startup import ROOT, _free_port
+from benchmarks.first_request import _multipart, _wait_ready
+from lib.samples import make_pdf
+from lib.server import default_workers
+
+DURATION = float(os.getenv("TT_BENCH_SECONDS", "5"))
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    values = {}
+    for path, keys in ((f"/proc/{pid}/status", ("VmRSS",)), (f"/proc/{pid}/smaps_rollup", ("Pss",))):
+        try:
+            with open(path) as f:
+                for line in f:
+                    key, _, rest = line.partition(":")
+                    if key in keys:
+                        values[key] = int(rest.split()[0])
+        except OSError:
+            pass
+    return values
+
+
+def _workers_of(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def measure(workers: int) -> Dict:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "lib.server"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "TT_LOG_LEVEL": "ERROR", "TT_WORKERS": str(workers),
+             "TT_MAX_REQUESTS": "0", "PORT": str(port), "HOST": "127.0.0.1"},
+    )
+    body, content_type = _multipart("cv.pdf", make_pdf())
+    completed = [0]
+    lock = threading.Lock()
+    try:
+        _wait_ready(port)
+        deadline = time.perf_counter() + DURATION
+
+        def client():
+            while time.perf_counter() < deadline:
+                request = urllib.request.Request(
+                    f"http://127.0.0.1:{port}/extract", data=body,
+                    headers={"Content-Type": content_type}, method="POST",
+                )
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                with lock:
+                    completed[0] += 1
+
+        threads = [threading.Thread(target=client) for _ in range(workers * 4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        memory = [_memory_kb(pid) for pid in _workers_of(process.pid)]
+    finally:
+        process.terminate()
+        process.wait()
+    return {"rps": completed[0] / DURATION, "memory": memory}
+
+
+def main() -> int:
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else default_workers()
+    baseline = None
+    for workers in range(1, max_workers + 1):
+        result = measure(workers)
+        baseline = baseline or result["rps"]
+        print(f"{workers} worker(s): {result['rps']:.1f} req/s (x{result['rps'] / baseline:.2f})")
+        for memory in result["memory"]:
+            print(f"    RSS {memory.get('VmRSS', 0) / 1024:.1f} Mo, PSS {memory.get('Pss', 0) / 1024:.1f} Mo")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
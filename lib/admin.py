@@ -0,0 +1,26 @@
+"""
+Protection des endpoints d'administration et de debug
+
+Les endpoints sont désactivés tant que TT_ADMIN_TOKEN n'est pas défini ;
+le jeton est attendu dans `X-Admin-Token` ou `Authorization: Bearer`.
+"""
+import os
+import hmac
+
+from fastapi import HTTPException, Request
+
+ADMIN_TOKEN = os.getenv("TT_ADMIN_TOKEN", "")
+
+
+def require_admin(request: Request) -> None:
+    """Dépendance FastAPI : refuse l'accès sans jeton d'administration valide"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(404, "Endpoints d'administration désactivés")
+
+    token = request.headers.get("x-admin-token", "")
+    authorization = request.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(403, "Jeton d'administration invalide")
@@ -0,0 +1,185 @@
+"""
+Contrôle d'admission des routes de parsing
+
+Chaque route limitée a un nombre maximal de requêtes en cours et une file
+d'attente bornée. File pleine : 429 ; attente trop longue dans la file :
+503. Les deux réponses portent un `Retry-After` estimé à partir du temps de
+service moyen. Les routes non listées (/health, /ready, /metrics...) ne
+sont jamais limitées.
+
+    TT_ADMISSION_LIMITS="/extract=4:16,/process-wordpress-upload=4:32"
+
+(concurrence:taille de file par route). La profondeur de file et
+l'utilisation sont exportées en gauges, signal d'autoscaling.
+"""
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from lib import metrics
+from lib.logs import logger, fields
+
+DEFAULT_LIMITS = "/extract=4:16,/process-wordpress-upload=4:32"
+QUEUE_TIMEOUT = float(os.getenv("TT_ADMISSION_QUEUE_TIMEOUT", "10"))
+
+IN_FLIGHT = metrics.gauge(
+    "truthtalent_admission_in_flight",
+    "Requêtes admises en cours de traitement, par route",
+    ["route"],
+)
+QUEUE_DEPTH = metrics.gauge(
+    "truthtalent_admission_queue_depth",
+    "Requêtes en attente d'admission, par route",
+    ["route"],
+)
+UTILISATION = metrics.gauge(
+    "truthtalent_admission_utilisation_ratio",
+    "Requêtes en cours rapportées à la limite de concurrence (max des workers)",
+    ["route"],
+    mode="max",
+)
+REJECTED = metrics.counter(
+    "truthtalent_admission_rejected_total",
+    "Requêtes refusées par le contrôle d'admission, par route et motif",
+    ["route", "reason"],
+)
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "truthtalent_admission_queue_wait_seconds",
+    "Attente dans la file d'admission, par route",
+    ["route"],
+)
+
+
+class Rejected(Exception):
+    """Requête refusée : file pleine ou attente trop longue"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteLimiter:
+    """Sémaphore à file bornée (à utiliser depuis la boucle asyncio)"""
+
+    def __init__(self, route: str, concurrency: int, queue_size: int, queue_timeout: float = QUEUE_TIMEOUT):
+        self.route = route
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Temps de service moyen (moyenne mobile exponentielle) pour Retry-After
+        self._service_time = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        backlog = (self.queued + 1) / self.concurrency
+        return max(1, math.ceil(backlog * self._service_time))
+
+    def _publish(self):
+        IN_FLIGHT.set(self.active, route=self.route)
+        QUEUE_DEPTH.set(self.queued, route=self.route)
+        UTILISATION.set(self.active / self.concurrency, route=self.route)
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self._publish()
+            return
+        if self.queued >= self.queue_size:
+            raise Rejected("queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Rejected("queue_timeout", self.retry_after())
+        except BaseException:
+            # Annulée (client parti) alors que la place venait d'être cédée : on la rend
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start, route=self.route)
+            self._publish()
+
+    def release(self, service_time: Optional[float] = None):
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+        # La place passe directement au premier en attente
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+    def snapshot(self) -> Dict:
+        return {
+            "in_flight": self.active,
+            "queued": self.queued,
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "utilisation": round(self.active / self.concurrency, 3),
+        }
+
+
+def parse_limits(spec: str) -> Dict[str, RouteLimiter]:
+    """`/route=concurrence:file,...` -> limiteurs par route"""
+    limiters = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, limits = entry.partition("=")
+        concurrency, _, queue_size = limits.partition(":")
+        limiters[route] = RouteLimiter(route, int(concurrency), int(queue_size or 0))
+    return limiters
+
+
+limiters = parse_limits(os.getenv("TT_ADMISSION_LIMITS", DEFAULT_LIMITS))
+
+
+def snapshot() -> Dict[str, Dict]:
+    return {route: limiter.snapshot() for route, limiter in limiters.items()}
+
+
+async def admission_control(request: Request, call_next):
+    """Middleware : admet, met en file ou refuse les requêtes des routes limitées"""
+    limiter = limiters.get(request.url.path)
+    if limiter is None:
+        return await call_next(request)
+
+    try:
+        await limiter.acquire()
+    except Rejected as rejection:
+        REJECTED.inc(route=limiter.route, reason=rejection.reason)
+        logger.warning("Requête refusée (surcharge)", extra=fields(
+            route=limiter.route, reason=rejection.reason, **limiter.snapshot()
+        ))
+        return JSONResponse(
+            {"success": False, "error": "overloaded", "reason": rejection.reason,
+             "retry_after": rejection.retry_after},
+            status_code=429 if rejection.reason == "queue_full" else 503,
+            headers={"Retry-After": str(rejection.retry_after)}
+        )
+
+    start = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        limiter.release(time.perf_counter() - start)
@@ -3,26 +3,49 @@
 Advanced CV Parser avec extraction intelligente
 Amélioration de parseur.com
 """
+import os
 import re
 import json
+import threading
 from typing import Dict, List, Optional, Tuple
-import spacy
-from dateutil import parser as date_parser
 from datetime import datetime
 import io
 
-try:
-    # Essayer de charger le modèle français
-    nlp = spacy.load("fr_core_news_sm")
-    SPACY_AVAILABLE = True
-except:
-    try:
-        # Charger le modèle anglais en fallback
-        nlp = spacy.load("en_core_web_sm")
-        SPACY_AVAILABLE = True
-    except:
-        SPACY_AVAILABLE = False
-        print("⚠️ SpaCy non disponible - extraction limitée")
+from lib import deadline, patterns
+from lib.logs import logger
+
+# Le modèle spaCy est chargé au premier usage (plusieurs secondes au démarrage sinon)
+DISABLE_SPACY = os.getenv("DISABLE_SPACY", "").lower() in ("1", "true", "yes")
+SPACY_MODELS = ("fr_core_news_sm", "en_core_web_sm")
+
+_nlp = None
+_nlp_loaded = False
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """Charge (une seule fois) le modèle spaCy français, anglais en fallback"""
+    global _nlp, _nlp_loaded
+    if _nlp_loaded:
+        return _nlp
+    with _nlp_lock:
+        if _nlp_loaded:
+            return _nlp
+        if not DISABLE_SPACY:
+            try:
+                import spacy
+                for model in SPACY_MODELS:
+                    try:
+                        _nlp = spacy.load(model)
+                        break
+                    except Exception:
+                        continue
+            except ImportError:
+                pass
+            if _nlp is None:
+                logger.warning("SpaCy non disponible - extraction limitée")
+        _nlp_loaded = True
+    return _nlp
 
 class AdvancedCVParser:
     """Parser avancé de CV avec NLP"""
@@ -58,8 +81,9 @@ class AdvancedCVParser:
         # Nettoyer le texte
         clean_text = self.clean_text(text)
         
-        # Extraction avec NLP si disponible
-        if SPACY_AVAILABLE and len(clean_text) > 100:
+        # Extraction avec NLP si disponible (et si l'échéance de la requête le permet)
+        nlp = get_nlp() if len(clean_text) > 100 and deadline.allows("nlp") else None
+        if nlp is not None:
             doc = nlp(clean_text[:10000])  # Limiter pour performance
             
             # Extraire les entités nommées
@@ -108,9 +132,9 @@ class AdvancedCVParser:
     def clean_text(self, text: str) -> str:
         """Nettoyer le texte"""
         # Supprimer les caractères spéciaux multiples
-        text = re.sub(r'\s+', ' ', text)
+        text = patterns.sub(r'\s+', ' ', text)
         # Normaliser les retours à la ligne
-        text = re.sub(r'\n+', '\n', text)
+        text = patterns.sub(r'\n+', '\n', text)
         # Supprimer les espaces en début/fin
         text = text.strip()
         return text
@@ -127,9 +151,9 @@ class AdvancedCVParser:
             "linkedin": ""
         }
         
-        # Email
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
+        # Email (longueurs bornées comme app.EMAIL_PATTERN : sans borne, quadratique sans @)
+        email_pattern = r'\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,}\b'
+        emails = patterns.findall(email_pattern, text)
         if emails:
             info["email"] = emails[0]
         
@@ -141,7 +165,7 @@ class AdvancedCVParser:
         ]
         
         for pattern in phone_patterns:
-            phones = re.findall(pattern, text)
+            phones = patterns.findall(pattern, text)
             if phones:
                 info["phone"] = phones[0] if isinstance(phones[0], str) else phones[0][0]
                 break
@@ -153,7 +177,7 @@ class AdvancedCVParser:
         ]
         
         for pattern in linkedin_patterns:
-            linkedins = re.findall(pattern, text)
+            linkedins = patterns.findall(pattern, text)
             if linkedins:
                 info["linkedin"] = "https://" + linkedins[0]
                 break
@@ -198,16 +222,17 @@ class AdvancedCVParser:
         for i, line in enumerate(lines):
             line_lower = line.lower()
             
-            # Détecter début d'une expérience
+            # Détecter début d'une expérience (mots bornés : `\w+` non borné est
+            # quadratique sur une longue suite de lettres)
             exp_patterns = [
                 r'(\d{4})\s*[-–]\s*(?:présent|\d{4})',  # 2020 - 2023
-                r'(\w+\s+\d{4})\s*[-–]\s*(?:présent|\w+\s+\d{4})',  # Jan 2020 - Dec 2023
+                r'(\w{1,20}\s+\d{4})\s*[-–]\s*(?:présent|\w{1,20}\s+\d{4})',  # Jan 2020 - Dec 2023
                 r'chez\s+[A-Z]',  # chez Google
-                r'[A-Z][a-z]+\s+(?:SAS|SA|SARL|EURL)'  # Nom d'entreprise
+                r'[A-Z][a-z]{1,40}\s+(?:SAS|SA|SARL|EURL)'  # Nom d'entreprise
             ]
             
             for pattern in exp_patterns:
-                if re.search(pattern, line):
+                if patterns.search(pattern, line):
                     if current_exp and len(current_exp) > 0:
                         experiences.append(current_exp)
                     
@@ -220,11 +245,12 @@ class AdvancedCVParser:
                     in_exp_section = True
                     break
             
-            # Collecter la description
-            elif in_exp_section and line.strip() and len(line.strip()) > 10:
-                if "description" not in current_exp:
-                    current_exp["description"] = []
-                current_exp["description"].append(line.strip())
+            else:
+                # Collecter la description (aucun début d'expérience sur la ligne)
+                if in_exp_section and line.strip() and len(line.strip()) > 10:
+                    if "description" not in current_exp:
+                        current_exp["description"] = []
+                    current_exp["description"].append(line.strip())
         
         # Ajouter la dernière expérience
         if current_exp and len(current_exp) > 0:
@@ -270,13 +296,13 @@ class AdvancedCVParser:
         
         # Extraire les compétences spécifiques au CV
         specific_patterns = {
-            "certifications": r'(?:certification|certificat)\s+(?:en\s+)?([A-Z][a-zA-Z\s]+)',
+            "certifications": r'(?:certification|certificat)\s+(?:en\s+)?([A-Z][a-zA-Z\s]{0,100})',
             "languages": r'(?:anglais|français|espagnol|allemand|italien)\s*(?:\(([A-C1-3\+]+)\))?',
             "tools": r'(?:Jira|Confluence|GitLab|GitHub|Notion|Slack|Teams)'
         }
         
         for category, pattern in specific_patterns.items():
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = patterns.findall(pattern, text, re.IGNORECASE)
             if matches:
                 skills_found[category] = list(set(matches))
         
@@ -304,7 +330,7 @@ class AdvancedCVParser:
             return " ".join(summary_lines)
         
         # Fallback: première phrase significative
-        sentences = re.split(r'[.!?]+', text)
+        sentences = patterns.split(r'[.!?]+', text)
         for sentence in sentences:
             sentence = sentence.strip()
             if len(sentence.split()) > 5 and len(sentence.split()) < 30:
@@ -314,7 +340,7 @@ class AdvancedCVParser:
     
     def extract_year_from_text(self, text: str) -> str:
         """Extraire une année depuis un texte"""
-        year_match = re.search(r'\b(19|20)\d{2}\b', text)
+        year_match = patterns.search(r'\b(19|20)\d{2}\b', text)
         if year_match:
             return year_match.group()
         return ""
@@ -0,0 +1,17 @@
+"""
+Point d'entrée ASGI serverless (Vercel, via jobs.py)
+
+Le module est importé une fois par instance : l'application, l'extracteur
+(et ses motifs compilés) et le client Supabase/httpx sont conservés au
+niveau module et réutilisés par toutes les invocations « à chaud ».
+"""
+import os
+
+os.environ.setdefault("TT_SERVERLESS", "1")
+
+import app as application_module  # noqa: E402
+
+app = application_module.app
+if not app.state.serverless:
+    # app.py déjà importé en mode serveur classique : instance dédiée
+    app = application_module.create_app(serverless=True)
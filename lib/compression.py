@@ -0,0 +1,174 @@
+"""
+Corps de requête compressés et réponses compressées
+
+Les CV arrivent souvent de sites WordPress sur des hébergements mutualisés
+lents : le transfert de l'upload pèse plus que l'analyse. Les routes
+d'upload acceptent donc un corps `Content-Encoding: gzip` (ou `deflate`,
+zlib ou brut), décompressé au fil de la réception : chaque morceau reçu
+est décompressé avant d'être passé au parsing multipart, jamais le corps
+entier d'un coup.
+
+Garde contre les bombes de décompression : au-delà de
+TT_MAX_DECOMPRESSION_RATIO fois les octets compressés reçus (passé une
+marge de TT_DECOMPRESSION_SLACK octets), ou de TT_MAX_DECOMPRESSED_BYTES
+au total, la requête est refusée en 413. Chaque morceau est décompressé
+avec ce plafond : la mémoire reste bornée même sur un corps hostile.
+Un corps corrompu ou tronqué donne 400, un autre encodage 415.
+
+Côté réponse, `GZipMiddleware` compresse les résultats JSON au-delà de
+TT_GZIP_MIN_SIZE octets quand le client annonce `Accept-Encoding: gzip`.
+"""
+import os
+import zlib
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from lib import metrics
+from lib.logs import logger, fields
+
+DECOMPRESSED_ROUTES = ("/extract", "/process-wordpress-upload")
+MAX_RATIO = float(os.getenv("TT_MAX_DECOMPRESSION_RATIO", "50"))
+SLACK = int(os.getenv("TT_DECOMPRESSION_SLACK", str(1024 * 1024)))
+MAX_DECOMPRESSED = int(os.getenv("TT_MAX_DECOMPRESSED_BYTES", str(50 * 1024 * 1024)))
+GZIP_ENABLED = os.getenv("TT_GZIP", "1") != "0"
+GZIP_MIN_SIZE = int(os.getenv("TT_GZIP_MIN_SIZE", "1000"))
+# Niveau 6 : presque le gain du niveau 9 sur du JSON, pour une fraction du CPU
+GZIP_LEVEL = int(os.getenv("TT_GZIP_LEVEL", "6"))
+
+BODY_BYTES = metrics.counter(
+    "truthtalent_request_body_bytes_total",
+    "Octets des corps compressés : reçus (wire) et décompressés (decoded)",
+    ["encoding", "kind"],
+)
+DECOMPRESSION_REJECTED = metrics.counter(
+    "truthtalent_request_decompression_rejected_total",
+    "Corps compressés refusés (ratio, size, invalid, unsupported)",
+    ["reason"],
+)
+
+# Formats zlib par encodage (wbits) ; deflate : zlib ou brut, vu au premier octet
+_GZIP = 16 + zlib.MAX_WBITS
+_ENCODINGS = ("gzip", "x-gzip", "deflate")
+
+
+class BodyTooLarge(HTTPException):
+    """Corps décompressé au-delà du ratio ou du plafond autorisé"""
+
+    def __init__(self, reason: str, decoded: int):
+        super().__init__(status_code=413, detail="Corps décompressé trop volumineux")
+        self.reason = reason
+        self.decoded = decoded
+
+
+class InvalidBody(HTTPException):
+    """Corps compressé corrompu ou tronqué"""
+
+    def __init__(self, error: str):
+        super().__init__(status_code=400, detail=f"Corps compressé invalide : {error}")
+
+
+def _deflate_wbits(head: bytes) -> int:
+    # En-tête zlib (RFC 1950) : méthode 8 et somme de contrôle multiple de 31 ;
+    # sinon deflate brut, envoyé par certains clients
+    if len(head) >= 2 and head[0] & 0x0F == 8 and ((head[0] << 8) | head[1]) % 31 == 0:
+        return zlib.MAX_WBITS
+    return -zlib.MAX_WBITS
+
+
+class StreamingDecoder:
+    """Décompresse un corps morceau par morceau, sous le ratio et le plafond"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self.wire = 0
+        self.decoded = 0
+        self._decompressor: Optional[object] = (
+            zlib.decompressobj(_GZIP) if encoding != "deflate" else None
+        )
+
+    def _limit(self) -> int:
+        return min(MAX_DECOMPRESSED, max(SLACK, int(self.wire * MAX_RATIO)))
+
+    def decode(self, chunk: bytes, final: bool) -> bytes:
+        self.wire += len(chunk)
+        if self._decompressor is None:
+            if not chunk and not final:
+                return b""
+            self._decompressor = zlib.decompressobj(_deflate_wbits(chunk))
+        decompressor = self._decompressor
+        if decompressor.eof and chunk:
+            raise InvalidBody("données après la fin du flux")
+        allowed = self._limit() - self.decoded
+        try:
+            # Un octet de plus que permis : le dépassement se voit sans tout décompresser
+            data = decompressor.decompress(chunk, allowed + 1)
+            if final and not decompressor.unconsumed_tail:
+                data += decompressor.flush()
+        except zlib.error as e:
+            raise InvalidBody(str(e))
+        self.decoded += len(data)
+        if len(data) > allowed:
+            reason = "size" if self._limit() >= MAX_DECOMPRESSED else "ratio"
+            raise BodyTooLarge(reason, self.decoded)
+        if decompressor.eof and decompressor.unused_data:
+            raise InvalidBody("données après la fin du flux")
+        if final and not decompressor.eof:
+            raise InvalidBody("flux tronqué")
+        return data
+
+
+class RequestDecompressionMiddleware:
+    """Décompresse au fil de la réception le corps des routes d'upload"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in DECOMPRESSED_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        headers = []
+        for name, value in scope["headers"]:
+            if name == b"content-encoding":
+                encoding = value.decode("latin-1").strip().lower()
+            elif name != b"content-length":
+                headers.append((name, value))
+        if encoding in (None, "", "identity"):
+            await self.app(scope, receive, send)
+            return
+        if encoding not in _ENCODINGS:
+            DECOMPRESSION_REJECTED.inc(reason="unsupported")
+            response = JSONResponse({"detail": f"Content-Encoding non pris en charge : {encoding}"},
+                                    status_code=415, headers={"Accept-Encoding": "gzip, deflate"})
+            await response(scope, receive, send)
+            return
+
+        label = "gzip" if encoding == "x-gzip" else encoding
+        decoder = StreamingDecoder(label)
+
+        async def decoding_receive():
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            final = not message.get("more_body", False)
+            try:
+                body = decoder.decode(message.get("body", b""), final)
+            except BodyTooLarge as e:
+                DECOMPRESSION_REJECTED.inc(reason=e.reason)
+                logger.warning("Corps décompressé refusé", extra=fields(
+                    route=scope["path"], reason=e.reason, wire=decoder.wire, decoded=e.decoded
+                ))
+                raise
+            except InvalidBody:
+                DECOMPRESSION_REJECTED.inc(reason="invalid")
+                raise
+            if final:
+                BODY_BYTES.inc(decoder.wire, encoding=label, kind="wire")
+                BODY_BYTES.inc(decoder.decoded, encoding=label, kind="decoded")
+            return {**message, "body": body}
+
+        # Le corps transmis n'est plus compressé et sa longueur est inconnue
+        await self.app({**scope, "headers": headers}, decoding_receive, send)
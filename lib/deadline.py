@@ -0,0 +1,207 @@
+"""
+Échéance des requêtes de parsing et annulation quand le client est parti
+
+L'échéance vient de l'en-tête `X-Request-Timeout` (secondes, plafonnée par
+TT_MAX_REQUEST_TIMEOUT) ou de TT_REQUEST_TIMEOUT. Elle suit la requête dans
+un ContextVar (copié vers les threads de run_in_threadpool) :
+- chaque étape chronométrée (`profiling.stage`) est un point d'arrêt :
+  `DeadlineExceeded` si l'échéance est passée ou si le client s'est déconnecté ;
+- les étapes optionnelles (langues, résumé, NLP) sont sautées quand il reste
+  moins que leur budget, et listées dans `degraded`.
+
+`DeadlineMiddleware` (ASGI pur, le plus externe) surveille la déconnexion
+du client une fois le corps reçu et annule alors le traitement.
+"""
+import os
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from lib import metrics
+from lib.logs import logger, fields
+
+DEADLINE_HEADER = b"x-request-timeout"
+DEADLINE_ROUTES = ("/extract", "/process-wordpress-upload")
+DEFAULT_TIMEOUT = float(os.getenv("TT_REQUEST_TIMEOUT", "30"))
+MAX_TIMEOUT = float(os.getenv("TT_MAX_REQUEST_TIMEOUT", "120"))
+
+
+def _parse_budgets(spec: str) -> Dict[str, float]:
+    budgets = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        stage_name, _, seconds = entry.partition("=")
+        budgets[stage_name] = float(seconds)
+    return budgets
+
+
+# Temps restant minimal pour lancer une étape optionnelle
+OPTIONAL_STAGE_BUDGETS = _parse_budgets(
+    os.getenv("TT_OPTIONAL_STAGE_BUDGETS", "languages=0.5,summary=0.5,nlp=3")
+)
+
+DEADLINE_EXCEEDED = metrics.counter(
+    "truthtalent_deadline_exceeded_total",
+    "Traitements arrêtés (échéance dépassée ou client parti), par motif et étape",
+    ["reason", "stage"],
+)
+DEGRADED_STAGES = metrics.counter(
+    "truthtalent_degraded_stages_total",
+    "Étapes optionnelles sautées faute de temps, par étape",
+    ["stage"],
+)
+CLIENT_DISCONNECTS = metrics.counter(
+    "truthtalent_client_disconnects_total",
+    "Clients déconnectés avant la réponse, par route",
+    ["route"],
+)
+
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Échéance dépassée ou client déconnecté : le travail restant est abandonné"""
+
+    def __init__(self, reason: str, stage_name: str):
+        super().__init__(f"{reason} ({stage_name})")
+        self.reason = reason
+        self.stage = stage_name
+
+
+class Deadline:
+    """Échéance d'une requête, consultée depuis la boucle et les threads"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.cancel_reason: Optional[str] = None
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def cancel(self, reason: str):
+        self.cancel_reason = self.cancel_reason or reason
+
+    def check(self, stage_name: str):
+        reason = self.cancel_reason or ("deadline" if self.remaining() <= 0 else None)
+        if reason:
+            DEADLINE_EXCEEDED.inc(reason=reason, stage=stage_name)
+            raise DeadlineExceeded(reason, stage_name)
+
+    def allows(self, stage_name: str) -> bool:
+        if self.remaining() >= OPTIONAL_STAGE_BUDGETS.get(stage_name, 0.0):
+            return True
+        self.degraded.append(stage_name)
+        DEGRADED_STAGES.inc(stage=stage_name)
+        return False
+
+    def detached(self) -> "Deadline":
+        """Même échéance, annulation indépendante (tâche partagée entre requêtes)"""
+        copy = Deadline(0)
+        copy.timeout, copy.expires_at = self.timeout, self.expires_at
+        return copy
+
+
+def checkpoint(stage_name: str):
+    """Point d'arrêt : lève DeadlineExceeded si la requête courante est finie"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage_name)
+
+
+def allows(stage_name: str) -> bool:
+    """L'étape optionnelle a-t-elle encore le temps de s'exécuter ?"""
+    deadline = current_deadline.get()
+    return deadline is None or deadline.allows(stage_name)
+
+
+def degraded() -> List[str]:
+    deadline = current_deadline.get()
+    return list(deadline.degraded) if deadline is not None else []
+
+
+@contextmanager
+def detached():
+    """Exécute le bloc sous une copie de l'échéance, annulée si la tâche l'est"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        yield
+        return
+    copy = deadline.detached()
+    token = current_deadline.set(copy)
+    try:
+        yield
+    except asyncio.CancelledError:
+        copy.cancel("client_disconnected")
+        raise
+    finally:
+        current_deadline.reset(token)
+
+
+def _timeout_from(scope) -> float:
+    for name, value in scope.get("headers", []):
+        if name == DEADLINE_HEADER:
+            try:
+                return max(0.0, min(float(value), MAX_TIMEOUT))
+            except ValueError:
+                break
+    return DEFAULT_TIMEOUT
+
+
+class DeadlineMiddleware:
+    """Installe l'échéance et annule le traitement si le client se déconnecte"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in DEADLINE_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(_timeout_from(scope))
+        token = current_deadline.set(deadline)
+        body_received = asyncio.Event()
+        response_sent = False
+
+        async def tracking_receive():
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                body_received.set()
+            elif message["type"] == "http.disconnect":
+                deadline.cancel("client_disconnected")
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_sent
+            # Marquée avant l'envoi : le serveur signale déjà la fin de la réponse
+            # comme un http.disconnect
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_sent = True
+            await send(message)
+
+        app_task = asyncio.ensure_future(self.app(scope, tracking_receive, tracking_send))
+
+        async def watch_disconnect():
+            # Après le corps, le serveur ne renvoie plus que http.disconnect
+            # (déconnexion, ou fin de la réponse déjà envoyée)
+            await body_received.wait()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            if not response_sent and not app_task.done():
+                deadline.cancel("client_disconnected")
+                CLIENT_DISCONNECTS.inc(route=scope["path"])
+                logger.info("Client déconnecté, traitement annulé", extra=fields(route=scope["path"]))
+                app_task.cancel()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if deadline.cancel_reason != "client_disconnected":
+                raise
+        finally:
+            watcher.cancel()
+            current_deadline.reset(token)
@@ -0,0 +1,202 @@
+"""
+Outils de profilage à la demande (cProfile, tracemalloc)
+
+Utilisés par les endpoints /debug/* protégés : ils permettent de profiler
+le code de traitement des requêtes en production sans redéploiement.
+"""
+import io
+import os
+import pstats
+import asyncio
+import cProfile
+import marshal
+import functools
+import threading
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from lib import profiling
+
+MAX_PROFILE_SECONDS = float(os.getenv("TT_DEBUG_MAX_PROFILE_SECONDS", "60"))
+TRACEMALLOC_FRAMES = int(os.getenv("TT_TRACEMALLOC_FRAMES", "1"))
+SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls", "time")
+
+
+class ProfilerBusy(Exception):
+    """Une session de profilage est déjà en cours"""
+
+
+class _MarshalledStats:
+    """Statistiques cProfile reçues d'un processus isolé (lues par pstats.Stats)"""
+
+    def __init__(self, data: bytes):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+class _ProfileWindow:
+    """Profils des threads et des processus isolés pendant une fenêtre ouverte"""
+
+    def __init__(self, loop_thread: int):
+        self.loop_thread = loop_thread
+        self.sources: List = []
+        self.threads = 0
+        self.sandboxes = 0
+        self._lock = threading.Lock()
+
+    def add_thread(self, profiler: cProfile.Profile):
+        with self._lock:
+            self.sources.append(profiler)
+            self.threads += 1
+
+    def add_sandbox(self, data: bytes):
+        with self._lock:
+            self.sources.append(_MarshalledStats(data))
+            self.sandboxes += 1
+
+
+_profile_lock = asyncio.Lock()
+_window: Optional[_ProfileWindow] = None
+# Un seul profileur par thread : pas d'imbrication des callables profilés
+_thread_state = threading.local()
+
+
+def window_open() -> bool:
+    """Une fenêtre /debug/profile est-elle ouverte ? (processus isolés à profiler)"""
+    return _window is not None
+
+
+def add_sandbox_stats(data: Optional[bytes]):
+    """Ajoute à la fenêtre ouverte les statistiques marshallées d'un processus isolé"""
+    window = _window
+    if data and window is not None:
+        window.add_sandbox(data)
+
+
+def profiled(function: Callable) -> Callable:
+    """Callable de thread profilé (cProfile propre au thread) pendant une fenêtre"""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        window = _window
+        if (window is None or getattr(_thread_state, "active", False)
+                or threading.get_ident() == window.loop_thread):
+            return function(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Autre outil de profilage déjà actif (sys.monitoring, Python 3.12+)
+            return function(*args, **kwargs)
+        _thread_state.active = True
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _thread_state.active = False
+            window.add_thread(profiler)
+
+    return wrapper
+
+
+async def profile_window(seconds: float, sort: str = "cumulative", limit: int = 50) -> str:
+    """Active cProfile pendant `seconds` et renvoie les pstats triées
+
+    Le thread de la boucle est profilé en continu ; les callables passés
+    par `profiled()` (threads de run_in_threadpool, pool des extracteurs)
+    ont chacun leur profileur, et les processus isolés renvoient leurs
+    statistiques marshallées. Tout est fusionné avec `pstats.Stats.add`.
+    Un appel de thread n'est compté que s'il se termine avant la fin de la
+    fenêtre.
+    """
+    global _window
+    if _profile_lock.locked():
+        raise ProfilerBusy()
+    seconds = max(0.1, min(seconds, MAX_PROFILE_SECONDS))
+    sort = sort if sort in SORT_KEYS else "cumulative"
+
+    async with _profile_lock:
+        window = _ProfileWindow(threading.get_ident())
+        profiler = cProfile.Profile()
+        profiler.enable()
+        _window = window
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            _window = None
+            profiler.disable()
+
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    with window._lock:
+        if window.sources:
+            stats.add(*window.sources)
+    stats.sort_stats(sort).print_stats(max(1, limit))
+    return (
+        f"# cProfile {seconds:.1f}s, tri={sort}\n"
+        f"# Boucle + {window.threads} appels de threads + {window.sandboxes} extractions isolées\n"
+        + out.getvalue()
+    )
+
+
+class MemoryTracker:
+    """Instantanés tracemalloc et différences par rapport à une référence"""
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._active = False
+
+    def _filter(self, snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def report(self, limit: int = 25, reset_baseline: bool = False) -> Dict:
+        with self._lock:
+            started = False
+            if not self._active:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(TRACEMALLOC_FRAMES)
+                profiling.acquire_tracemalloc()
+                self._active = True
+                started = True
+
+            snapshot = self._filter(tracemalloc.take_snapshot())
+            if self.baseline is None or reset_baseline:
+                self.baseline = snapshot
+
+            current, peak = tracemalloc.get_traced_memory()
+            return {
+                "tracing_started": started,
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top": [
+                    {"site": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:limit]
+                ],
+                "diff_vs_baseline": [
+                    {
+                        "site": str(stat.traceback),
+                        "size_diff_bytes": stat.size_diff,
+                        "count_diff": stat.count_diff,
+                        "size_bytes": stat.size,
+                    }
+                    for stat in snapshot.compare_to(self.baseline, "lineno")[:limit]
+                ],
+            }
+
+    def stop(self) -> Dict:
+        with self._lock:
+            if self._active:
+                profiling.release_tracemalloc()
+                self._active = False
+            self.baseline = None
+            return {"tracing": tracemalloc.is_tracing()}
+
+
+memory_tracker = MemoryTracker()
@@ -0,0 +1,171 @@
+"""
+Extraction du texte d'un DOCX en flux, sans python-docx
+
+`python-docx` construit l'arbre complet du document pour n'en lire que les
+paragraphes du corps : lent et gourmand sur les gros fichiers, et aveugle aux
+tableaux, en-têtes, pieds de page et zones de texte, là où beaucoup de
+modèles de CV français rangent coordonnées et compétences.
+
+Ici, les parties XML sont lues directement dans l'archive et parcourues avec
+`iterparse` : en-têtes, corps puis pieds de page. Chaque élément est vidé
+dès qu'il est traité, la mémoire reste constante quelle que soit la taille
+du document. Les cellules d'une ligne de tableau sont séparées par une
+tabulation. Les zones de texte sont lues une seule fois : la version VML de
+repli (`mc:Fallback`) est ignorée.
+
+Garde de décompression : au-delà de TT_DOCX_MAX_UNCOMPRESSED octets XML
+(taille annoncée par l'archive ou réellement décompressée), `DocxTooLarge`.
+"""
+import os
+import re
+import zipfile
+from io import BytesIO
+from typing import Dict, Iterator, List
+from xml.etree.ElementTree import iterparse
+
+MAX_UNCOMPRESSED = int(os.getenv("TT_DOCX_MAX_UNCOMPRESSED", str(50 * 1024 * 1024)))
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+# Éléments dont les enfants directs sont vidés une fois traités
+_CONTAINERS = {_W + "body", _W + "hdr", _W + "ftr"}
+# Caractères portés par un élément vide
+_SPECIAL_CHARS = {_W + "tab": "\t", _W + "br": "\n", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+_HEADER = re.compile(r"word/header\d*\.xml")
+_FOOTER = re.compile(r"word/footer\d*\.xml")
+
+
+class DocxTooLarge(ValueError):
+    """Parties XML du DOCX plus volumineuses que la garde de décompression"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"DOCX décompressé au-delà de {limit} octets")
+        self.limit = limit
+
+
+class _CountingReader:
+    """Flux décompressé d'une partie, plafonné au budget restant"""
+
+    def __init__(self, stream, budget: Dict[str, int]):
+        self._stream = stream
+        self._budget = budget
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self._budget["left"] -= len(data)
+        if self._budget["left"] < 0:
+            raise DocxTooLarge(MAX_UNCOMPRESSED)
+        return data
+
+
+def _parts(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """En-têtes, corps puis pieds de page (ordre de lecture d'une page)"""
+    names = {info.filename: info for info in archive.infolist()}
+    headers = sorted(name for name in names if _HEADER.fullmatch(name))
+    footers = sorted(name for name in names if _FOOTER.fullmatch(name))
+    body = ["word/document.xml"] if "word/document.xml" in names else []
+    if not body:
+        raise ValueError("DOCX sans word/document.xml")
+    return [names[name] for name in headers + body + footers]
+
+
+def _part_lines(stream) -> Iterator[str]:
+    """Lignes de texte d'une partie XML, dans l'ordre du document"""
+    elements = []
+    lines: List[str] = []
+    paragraphs: List[List[str]] = []
+    rows: List[List[str]] = []
+    cells: List[List[str]] = []
+    skipped = 0
+
+    def emit(line: str):
+        # Dans une cellule (tableaux imbriqués compris), la ligne reste dans la cellule
+        if cells:
+            cells[-1].append(line)
+        else:
+            lines.append(line)
+
+    for event, element in iterparse(stream, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            elements.append(element)
+            if tag == _FALLBACK:
+                skipped += 1
+            elif skipped:
+                pass
+            elif tag == _W + "p":
+                paragraphs.append([])
+            elif tag == _W + "tr":
+                rows.append([])
+            elif tag == _W + "tc":
+                cells.append([])
+            continue
+
+        elements.pop()
+        if tag == _FALLBACK:
+            skipped -= 1
+        elif skipped:
+            pass
+        elif tag == _W + "t":
+            if paragraphs and element.text:
+                paragraphs[-1].append(element.text)
+        elif tag in _SPECIAL_CHARS:
+            if paragraphs:
+                paragraphs[-1].append(_SPECIAL_CHARS[tag])
+        elif tag == _W + "p":
+            emit("".join(paragraphs.pop()))
+            element.clear()
+        elif tag == _W + "tc":
+            cell = " ".join(line for line in cells.pop() if line.strip())
+            if rows:
+                rows[-1].append(cell)
+        elif tag == _W + "tr":
+            emit("\t".join(rows.pop()))
+
+        if elements and elements[-1].tag in _CONTAINERS:
+            # Bloc de premier niveau traité : plus rien à en garder
+            elements[-1].clear()
+        if lines:
+            yield from lines
+            lines.clear()
+
+
+def iter_lines(content: bytes) -> Iterator[str]:
+    """Lignes de texte du DOCX (en-têtes, corps, pieds de page), au fil de la lecture"""
+    with zipfile.ZipFile(BytesIO(content)) as archive:
+        parts = _parts(archive)
+        if sum(info.file_size for info in parts) > MAX_UNCOMPRESSED:
+            raise DocxTooLarge(MAX_UNCOMPRESSED)
+        # La taille annoncée peut mentir : le flux décompressé est aussi compté
+        budget = {"left": MAX_UNCOMPRESSED}
+        seen_margins = set()
+        for info in parts:
+            margin = info.filename != "word/document.xml"
+            with archive.open(info) as stream:
+                for line in _part_lines(_CountingReader(stream, budget)):
+                    if margin:
+                        # Même en-tête pour la première page, les paires et les impaires
+                        if line in seen_margins:
+                            continue
+                        seen_margins.add(line)
+                    yield line
+
+
+def extract(content: bytes, max_chars: int) -> Dict:
+    """Texte du DOCX, arrêté au plafond de caractères
+
+    Renvoie {"text", "pages", "truncated"} comme les autres extracteurs.
+    """
+    parts, chars, truncated = [], 0, False
+    lines = iter_lines(content)
+    try:
+        for line in lines:
+            parts.append(line)
+            chars += len(line) + 1
+            if chars >= max_chars:
+                truncated = True
+                break
+    finally:
+        lines.close()
+    return {"text": "\n".join(parts)[:max_chars], "pages": None, "truncated": truncated}
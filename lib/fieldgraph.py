@@ -0,0 +1,136 @@
+"""
+Graphe de dépendances des extracteurs d'analyse
+
+Chaque extracteur déclare les valeurs dont il dépend (entrées ou autres
+extracteurs). Pour les champs demandés, seuls les extracteurs nécessaires
+sont exécutés, niveau topologique par niveau topologique. Avec
+TT_FIELD_WORKERS > 0, les extracteurs indépendants d'un même niveau tournent
+en parallèle sur un pool de threads (les recherches `regex` relâchent le
+GIL). Désactivé par défaut : sur des CV de 1 à 200 pages, chaque extracteur
+prend moins de 2 ms et le passage de relais entre threads coûte plus qu'il
+ne rapporte.
+
+Les extracteurs optionnels (langues, résumé) sont remplacés par leur valeur
+par défaut quand l'échéance de la requête ne leur laisse pas le temps.
+"""
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from lib import deadline, debugtools, profiling
+
+FIELD_WORKERS = int(os.getenv("TT_FIELD_WORKERS", "0"))
+
+
+class Extractor:
+    """Nœud du graphe : fonction appelée avec les valeurs de ses dépendances"""
+
+    def __init__(self, name: str, func: Callable, deps: Sequence[str],
+                 optional: bool = False, default: Callable[[], Any] = None, timed: bool = True):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.optional = optional
+        self.default = default
+        self.timed = timed
+
+
+class ExtractorGraph:
+    """Extracteurs et leurs dépendances ; exécute le sous-graphe nécessaire"""
+
+    def __init__(self, inputs: Iterable[str] = ("text",)):
+        self.inputs = frozenset(inputs)
+        self._extractors: Dict[str, Extractor] = {}
+        self._plans: Dict[FrozenSet[str], List[List[str]]] = {}
+
+    def add(self, name: str, func: Callable, deps: Sequence[str], **options):
+        for dep in deps:
+            if dep not in self.inputs and dep not in self._extractors:
+                raise ValueError(f"Dépendance inconnue pour {name} : {dep}")
+        self._extractors[name] = Extractor(name, func, deps, **options)
+        self._plans.clear()
+
+    def plan(self, targets: Iterable[str]) -> List[List[str]]:
+        """Extracteurs nécessaires, groupés par niveau (un niveau ne dépend que des précédents)"""
+        key = frozenset(targets)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+
+        depth: Dict[str, int] = {}
+
+        def visit(name: str) -> int:
+            if name in self.inputs:
+                return -1
+            if name not in depth:
+                extractor = self._extractors[name]
+                depth[name] = 1 + max((visit(dep) for dep in extractor.deps), default=-1)
+            return depth[name]
+
+        for target in key:
+            visit(target)
+        plan = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        # Ordre d'enregistrement au sein d'un niveau : exécution séquentielle stable
+        for name in self._extractors:
+            if name in depth:
+                plan[depth[name]].append(name)
+        self._plans[key] = plan
+        return plan
+
+    def _call(self, name: str, values: Dict[str, Any]) -> Any:
+        extractor = self._extractors[name]
+        if extractor.optional and not deadline.allows(name):
+            return extractor.default()
+        args = [values[dep] for dep in extractor.deps]
+        if not extractor.timed:
+            return extractor.func(*args)
+        with profiling.stage(name):
+            return extractor.func(*args)
+
+    def run(self, targets: Iterable[str], inputs: Dict[str, Any], parallel: bool = True) -> Dict[str, Any]:
+        """Valeurs des extracteurs nécessaires aux `targets` (et de leurs dépendances)"""
+        values = dict(inputs)
+        executor = get_executor() if parallel else None
+        for level in self.plan(targets):
+            if executor is None or len(level) < 2:
+                for name in level:
+                    values[name] = self._call(name, values)
+                continue
+            # Contexte copié : échéance, profil et id de requête suivent dans les threads,
+            # chaque tâche a sa propre étape courante (profiling.current_stage)
+            futures = {
+                name: executor.submit(contextvars.copy_context().run,
+                                      debugtools.profiled(self._call), name, values)
+                for name in level[1:]
+            }
+            values[level[0]] = self._call(level[0], values)
+            for name, future in futures.items():
+                values[name] = future.result()
+        return values
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[ThreadPoolExecutor]:
+    global _executor
+    if FIELD_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(FIELD_WORKERS, thread_name_prefix="tt-fields")
+        return _executor
+
+
+def _after_fork_in_child():
+    # Les threads du pool n'existent pas dans le worker forké
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,120 @@
+"""
+Uploads idempotents et coalescence des requêtes identiques en vol
+
+WordPress renvoie l'upload quand il n'a pas eu de réponse à temps. La clé
+d'idempotence (en-tête `Idempotency-Key`, sinon hash du fichier + candidat
++ offre) permet de :
+- renvoyer le résultat déjà calculé pour une soumission répétée ;
+- rattacher une requête identique arrivée pendant le traitement à la même
+  tâche, pour un seul parsing et une seule insertion.
+
+Le cache est propre au worker ; entre workers, l'insertion Supabase vérifie
+l'existence du candidat (voir `SupabaseManager.save_candidate`).
+"""
+import os
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from lib import metrics
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+STATUS_HEADER = "Idempotency-Status"
+TTL = float(os.getenv("TT_IDEMPOTENCY_TTL", "3600"))
+MAX_ENTRIES = int(os.getenv("TT_IDEMPOTENCY_MAX_ENTRIES", "1000"))
+
+IDEMPOTENT_HITS = metrics.counter(
+    "truthtalent_idempotency_total",
+    "Requêtes idempotentes par issue (created, replayed, coalesced)",
+    ["status"],
+)
+
+
+def key_for(header: Optional[str], file_hash: str, wp_user_id: int, wp_offer_id: int,
+            mode: str = "standard") -> str:
+    """Clé fournie par l'appelant, sinon dérivée du contenu et du contexte"""
+    if header:
+        return "h:" + header.strip()[:200]
+    context = f"{file_hash}:{wp_user_id}:{wp_offer_id}"
+    if mode != "standard":
+        # Un autre mode d'analyse donne un autre résultat
+        context += f":{mode}"
+    digest = hashlib.sha256(context.encode()).hexdigest()
+    return "c:" + digest
+
+
+class IdempotencyStore:
+    """Résultats récents (TTL, LRU) et tâches en cours par clé"""
+
+    def __init__(self, ttl: float = TTL, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Requêtes encore en attente de chaque tâche en vol
+        self._waiters: Dict[str, int] = {}
+
+    def _cached(self, key: str):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, result: Any):
+        self._results[key] = (time.monotonic(), result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]],
+                  cacheable: Callable[[Any], bool] = lambda result: True) -> Tuple[Any, str]:
+        """Exécute `factory` une seule fois par clé : (résultat, statut)
+
+        Seuls les résultats `cacheable` sont conservés : une exception est
+        transmise à toutes les requêtes rattachées, la suivante réessaie.
+        La tâche est annulée quand toutes les requêtes rattachées sont parties.
+        """
+        entry = self._cached(key)
+        if entry is not None:
+            IDEMPOTENT_HITS.inc(status="replayed")
+            return entry[1], "replayed"
+
+        task = self._in_flight.get(key)
+        status = "coalesced"
+        if task is None:
+            status = "created"
+            # Tâche séparée : elle survit à l'annulation de la requête qui l'a lancée
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done, cacheable))
+        IDEMPOTENT_HITS.inc(status=status)
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task), status
+        except asyncio.CancelledError:
+            if self._waiters.get(key) == 1 and not task.done():
+                # Plus personne n'attend ce résultat
+                task.cancel()
+            raise
+        finally:
+            remaining = self._waiters.get(key, 1) - 1
+            if remaining > 0:
+                self._waiters[key] = remaining
+            else:
+                self._waiters.pop(key, None)
+
+    def _finish(self, key: str, task: asyncio.Task, cacheable: Callable[[Any], bool]):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled() and task.exception() is None and cacheable(task.result()):
+            self._store(key, task.result())
+
+
+idempotency_store = IdempotencyStore()
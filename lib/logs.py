@@ -0,0 +1,225 @@
+"""
+Journalisation structurée et non bloquante pour TruthTalent
+
+Les appels de log du chemin critique ne font qu'empiler l'enregistrement
+dans une file bornée ; un thread d'écoute (QueueListener) se charge du
+formatage JSON, de l'anonymisation et de l'écriture sur stdout.
+"""
+import os
+import re
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import contextvars
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("TT_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("TT_LOG_FORMAT", "json")  # json | text
+LOG_REDACT = os.getenv("TT_LOG_REDACT", "1") != "0"
+DEBUG_SAMPLE_RATE = float(os.getenv("TT_LOG_DEBUG_SAMPLE_RATE", "0.05"))
+QUEUE_SIZE = int(os.getenv("TT_LOG_QUEUE_SIZE", "10000"))
+
+# Contexte de la requête en cours (propagé par asyncio et run_in_threadpool)
+request_id_var = contextvars.ContextVar("request_id", default="-")
+debug_sampled_var = contextvars.ContextVar("debug_sampled", default=False)
+
+logger = logging.getLogger("truthtalent")
+
+_STANDARD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+_PII_KEYS = {"email", "phone", "telephone", "name", "nom", "prenom", "first_name",
+             "last_name", "linkedin", "message", "adresse", "location"}
+# Identifiants de corrélation : jamais réécrits (un hash md5 contient souvent
+# 9 chiffres de suite, pris sinon pour un numéro de téléphone)
+_ID_KEYS = {"file_hash", "request_id", "trace_id", "job_id"}
+_EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+_PHONE_RE = re.compile(r'(?:\+|00)?\d(?:[\s.-]?\d){8,13}')
+
+
+def fields(**values) -> Dict:
+    """Champs structurés à passer en `extra=` d'un appel de log"""
+    return {"fields": values}
+
+
+def new_request_context(request_id: str) -> None:
+    """Initialise l'identifiant de corrélation et l'échantillonnage debug"""
+    request_id_var.set(request_id)
+    debug_sampled_var.set(random.random() < DEBUG_SAMPLE_RATE)
+
+
+# ========== FILTRES ==========
+class ContextFilter(logging.Filter):
+    """Attache l'id de requête et échantillonne les logs debug (côté appelant)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        if record.levelno <= logging.DEBUG and not debug_sampled_var.get():
+            return False
+        return True
+
+
+def redact(value):
+    """Masque emails et numéros de téléphone dans une valeur"""
+    if isinstance(value, str):
+        value = _EMAIL_RE.sub("[email]", value)
+        return _PHONE_RE.sub("[phone]", value)
+    if isinstance(value, dict):
+        return {k: redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+def _mask(value) -> str:
+    if not value:
+        return ""
+    return f"[redacted:{len(str(value))}]"
+
+
+class RedactionFilter(logging.Filter):
+    """Anonymise les données personnelles (exécuté dans le thread d'écoute)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not LOG_REDACT:
+            return True
+        record.msg = redact(record.getMessage())
+        record.args = None
+        extra = getattr(record, "fields", None)
+        if extra:
+            record.fields = {
+                key: value if key in _ID_KEYS else _mask(value) if key in _PII_KEYS else redact(value)
+                for key, value in extra.items()
+            }
+        return True
+
+
+# ========== FORMATAGE ==========
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        extra = getattr(record, "fields", None)
+        if extra:
+            entry.update(extra)
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and key not in ("fields", "request_id") and key not in entry:
+                entry[key] = value
+        if record.exc_text or record.exc_info:
+            entry["exc"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Format lisible pour le développement local"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{record.levelname[0]} [{getattr(record, 'request_id', '-')}] {record.getMessage()}"
+        extra = getattr(record, "fields", None)
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        if record.exc_text or record.exc_info:
+            line += "\n" + (record.exc_text or self.formatException(record.exc_info))
+        return line
+
+
+# ========== FILE NON BLOQUANTE ==========
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui n'attend jamais : file pleine = enregistrement abandonné"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Le formatage complet est fait par le listener ; on fige juste le message
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener dont l'arrêt attend une place libre dans la file"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue: Optional[queue.Queue] = None
+
+
+def _build_output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    handler.addFilter(RedactionFilter())
+    return handler
+
+
+def setup_logging(asynchronous: bool = True) -> logging.Logger:
+    """Installe la file et le thread d'écoute (idempotent)
+
+    `asynchronous=False` écrit directement sur stdout : utile en serverless,
+    où le processus peut être gelé avant que le listener n'ait vidé la file.
+    """
+    global _listener, _queue
+    if _listener is not None:
+        return logger
+
+    if not asynchronous:
+        handler = _build_output_handler()
+        handler.addFilter(ContextFilter())
+        logger.handlers[:] = [handler]
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+        return logger
+
+    _queue = queue.Queue(maxsize=QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    logger.handlers[:] = [queue_handler]
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+    _listener = _Listener(_queue, _build_output_handler(), respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return logger
+
+
+def shutdown_logging() -> None:
+    """Vide la file et arrête le thread d'écoute"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _after_fork_in_child():
+    # Le thread d'écoute n'existe pas dans le processus enfant : on le recrée
+    global _listener
+    if _listener is not None:
+        _listener = None
+        setup_logging()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
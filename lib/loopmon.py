@@ -0,0 +1,113 @@
+"""
+Surveillance de la boucle asyncio : retard d'ordonnancement et appels bloquants
+
+Une tâche asyncio mesure le retard de réveil d'un `sleep` périodique.
+Un thread chien de garde vérifie que cette tâche bat toujours : si la boucle
+ne répond plus au-delà du seuil, il capture la pile du thread de la boucle
+(sys._current_frames) et la journalise avec l'id de la requête en cause.
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from typing import Optional
+
+from lib import metrics
+from lib.logs import logger, fields, request_id_var
+from lib.profiling import thread_activity
+
+LOOP_MONITOR_ENABLED = os.getenv("TT_LOOP_MONITOR", "1") != "0"
+LOOP_LAG_INTERVAL = float(os.getenv("TT_LOOP_LAG_INTERVAL", "0.1"))
+LOOP_BLOCK_THRESHOLD = float(os.getenv("TT_LOOP_BLOCK_THRESHOLD", "0.25"))
+STACK_LIMIT = 40
+
+LOOP_LAG_SECONDS = metrics.histogram(
+    "truthtalent_event_loop_lag_seconds",
+    "Retard d'ordonnancement de la boucle asyncio",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_LAG_CURRENT = metrics.gauge(
+    "truthtalent_event_loop_lag_current_seconds",
+    "Dernier retard mesuré de la boucle asyncio",
+    mode="max",
+)
+LOOP_BLOCKED = metrics.counter(
+    "truthtalent_event_loop_blocked_total",
+    "Blocages de la boucle au-delà du seuil, par étape",
+    ["stage"],
+)
+
+
+class LoopLagMonitor:
+    """Mesure le retard de la boucle et détecte les appels bloquants"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_BLOCK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Démarre la mesure (à appeler depuis la boucle)"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self._heartbeat = time.monotonic()
+            LOOP_LAG_SECONDS.observe(lag)
+            LOOP_LAG_CURRENT.set(lag)
+
+    def _watch(self):
+        reported_heartbeat = None
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold or heartbeat == reported_heartbeat:
+                continue
+            # Un seul rapport par blocage
+            reported_heartbeat = heartbeat
+            self._report(stalled)
+
+    def _report(self, stalled: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.format_stack(frame, limit=STACK_LIMIT)
+        request_id, stage_name, _ = thread_activity.get(self._loop_thread_id, ("-", "unknown", "-"))
+        LOOP_BLOCKED.inc(stage=stage_name)
+        # Le log porte l'id de la requête qui bloque la boucle, pas celui du watchdog
+        request_id_var.set(request_id)
+        logger.warning("Boucle asyncio bloquée", extra=fields(
+            blocked_ms=round(stalled * 1000, 1),
+            stage=stage_name,
+            stack="".join(stack)
+        ))
+
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,150 @@
+"""
+Garde-fou mémoire des workers de parsing
+
+PyPDF2 peut faire gonfler la mémoire sur un PDF énorme ou malformé, et un
+processus Python ne rend presque jamais cette mémoire au système. Après
+chaque document, la RSS du worker est relevée et journalisée avec le hash
+du fichier (avec la hausse du pic `ru_maxrss` pendant le parsing, pour
+retrouver les fichiers responsables). Au-delà de TT_WORKER_MAX_RSS_MB ou de
+TT_WORKER_MAX_DOCUMENTS, le worker se retire proprement : il termine les
+requêtes en cours puis le maître (lib.server) le remplace.
+
+Le parsing lui-même tourne dans les processus isolés (lib.sandbox) : leur
+mémoire est mesurée de leur côté et rapportée avec le hash courant
+(`current_file_hash`).
+"""
+import os
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from lib import metrics
+from lib.logs import logger, fields
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MAX_RSS_MB = float(os.getenv("TT_WORKER_MAX_RSS_MB", "400"))
+MAX_DOCUMENTS = int(os.getenv("TT_WORKER_MAX_DOCUMENTS", "0"))
+
+WORKER_RSS = metrics.gauge(
+    "truthtalent_worker_rss_bytes",
+    "RSS des workers après le dernier document",
+)
+WORKER_RETIREMENTS = metrics.counter(
+    "truthtalent_worker_retirements_total",
+    "Retraits de workers décidés par le garde-fou mémoire, par motif",
+    ["reason"],
+)
+
+# Hash du document en cours de traitement (copié vers les threads d'extraction)
+_file_hash = contextvars.ContextVar("memguard_file_hash", default="")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """RSS du processus en octets (0 si indisponible)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss() -> int:
+    """Pic de RSS du processus en octets"""
+    if resource is None:
+        return 0
+    # ru_maxrss est en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_file_hash() -> str:
+    """Hash du document mesuré par `MemoryGuard.document` ("" hors document)"""
+    return _file_hash.get()
+
+
+class MemoryGuard:
+    """Compte les documents, surveille la RSS et déclenche le retrait"""
+
+    def __init__(self, max_rss_mb: float = MAX_RSS_MB, max_documents: int = MAX_DOCUMENTS):
+        self.max_rss = int(max_rss_mb * 1024 * 1024) if max_rss_mb else 0
+        self.max_documents = max_documents
+        self.documents = 0
+        self.retiring = False
+        self._retire: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+
+    def on_retire(self, callback: Callable[[], None]):
+        """Action de retrait (arrêt gracieux du serveur), fournie par le lanceur"""
+        self._retire = callback
+
+    @contextmanager
+    def document(self, file_hash: str):
+        """Mesure la mémoire autour du parsing d'un document"""
+        rss_before = current_rss()
+        peak_before = peak_rss()
+        token = _file_hash.set(file_hash)
+        try:
+            yield
+        finally:
+            _file_hash.reset(token)
+            self._after_document(file_hash, rss_before, peak_before)
+
+    def _after_document(self, file_hash: str, rss_before: int, peak_before: int):
+        rss = current_rss()
+        peak = peak_rss()
+        WORKER_RSS.set(rss)
+        with self._lock:
+            self.documents += 1
+            documents = self.documents
+        logger.info("Mémoire document", extra=fields(
+            file_hash=file_hash,
+            rss_mb=round(rss / 1048576, 1),
+            rss_growth_mb=round((rss - rss_before) / 1048576, 1),
+            peak_mb=round(peak / 1048576, 1),
+            peak_growth_mb=round((peak - peak_before) / 1048576, 1)
+        ))
+
+        reason = None
+        if self.max_rss and rss > self.max_rss:
+            reason = "rss"
+        elif self.max_documents and documents >= self.max_documents:
+            reason = "documents"
+        if reason:
+            self._request_retirement(reason, rss, documents, file_hash)
+
+    def _request_retirement(self, reason: str, rss: int, documents: int, file_hash: str):
+        if self._retire is None:
+            # Processus unique (uvicorn direct, serverless) : personne pour le
+            # remplacer, il continue de servir (pas de retrait, /ready reste vert)
+            logger.warning("Seuil mémoire atteint sans lanceur multi-workers", extra=fields(
+                reason=reason, rss_mb=round(rss / 1048576, 1), documents=documents, file_hash=file_hash
+            ))
+            return
+        with self._lock:
+            if self.retiring:
+                return
+            self.retiring = True
+        WORKER_RETIREMENTS.inc(reason=reason)
+        logger.warning("Retrait du worker", extra=fields(
+            reason=reason, rss_mb=round(rss / 1048576, 1), documents=documents, file_hash=file_hash
+        ))
+        self._retire()
+
+
+def _after_fork_in_child():
+    # Chaque worker repart avec son propre compteur
+    memory_guard.documents = 0
+    memory_guard.retiring = False
+    memory_guard._retire = None
+
+
+memory_guard = MemoryGuard()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,345 @@
+"""
+Métriques Prometheus légères pour TruthTalent
+
+Compteurs et histogrammes en mémoire, protégés par un verrou, exposés au
+format texte Prometheus. En mode multi-workers, chaque processus écrit
+périodiquement un instantané dans TT_METRICS_DIR et /metrics agrège
+l'ensemble des fichiers.
+"""
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+METRICS_DIR = os.getenv("TT_METRICS_DIR", "")
+FLUSH_INTERVAL = float(os.getenv("TT_METRICS_FLUSH_INTERVAL", "5"))
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Traitements internes (warm-up...) exclus des métriques
+_muted = contextvars.ContextVar("metrics_muted", default=False)
+
+
+@contextmanager
+def muted():
+    """N'enregistre aucune observation dans le bloc (contexte courant uniquement)"""
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+class _Metric:
+    """Base commune : nom, aide, labels et valeurs par combinaison de labels"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    """Compteur monotone"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if _muted.get():
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Jauge ; `mode` indique l'agrégation entre workers (sum ou max)"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Histogramme à buckets cumulés"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if _muted.get():
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    @contextmanager
+    def time(self, **labels):
+        """Mesure la durée du bloc et l'enregistre"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    """Registre des métriques du processus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> Dict:
+        return {
+            metric.name: {"kind": metric.kind, "values": metric.snapshot()}
+            for metric in self.metrics()
+        }
+
+    def reset(self):
+        for metric in self.metrics():
+            metric.reset()
+
+    # ---------- Multi-workers ----------
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(METRICS_DIR, f"metrics_{pid}.json")
+
+    def flush(self):
+        """Écrit l'instantané du processus courant (écriture atomique)"""
+        if not METRICS_DIR:
+            return
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _other_snapshots(self) -> List[Tuple[bool, Dict]]:
+        """Instantanés des autres workers : (processus vivant, données)"""
+        if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+            return []
+        own = os.path.basename(self._snapshot_path(os.getpid()))
+        snapshots = []
+        for entry in os.listdir(METRICS_DIR):
+            if entry == own or not entry.startswith("metrics_") or not entry.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, entry)) as f:
+                    snapshots.append((_pid_alive(int(entry[8:-5])), json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    # ---------- Exposition ----------
+    def render(self) -> str:
+        """Produit le format texte Prometheus (agrégé sur tous les workers)"""
+        others = self._other_snapshots()
+        lines = []
+        for metric in self.metrics():
+            merged: Dict[Tuple[str, ...], object] = {}
+            sources = [metric.snapshot()]
+            for alive, snapshot in others:
+                entry = snapshot.get(metric.name)
+                # Les jauges d'un worker mort ne sont plus significatives
+                if entry and entry.get("kind") == metric.kind and (alive or metric.kind != "gauge"):
+                    sources.append(entry["values"])
+            for values in sources:
+                for key, value in values:
+                    key = tuple(key)
+                    if metric.kind == "histogram":
+                        current = merged.setdefault(key, [[0] * (len(metric.buckets) + 1), 0.0, 0])
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+                    elif metric.kind == "gauge" and metric.mode == "max":
+                        merged[key] = max(merged.get(key, value), value)
+                    else:
+                        merged[key] = merged.get(key, 0.0) + value
+
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(merged.items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(list(metric.buckets) + [float("inf")], value[0]):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{metric.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {value[1]}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {value[2]}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (),
+          mode: str = "sum") -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, mode))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ========== FLUSH PÉRIODIQUE ==========
+_flusher: Optional[threading.Thread] = None
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            REGISTRY.flush()
+        except OSError:
+            pass
+
+
+def start_flusher():
+    """Démarre l'écriture périodique des instantanés (si TT_METRICS_DIR)"""
+    global _flusher
+    if not METRICS_DIR or (_flusher and _flusher.is_alive()):
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _flusher = threading.Thread(target=_flush_loop, name="metrics-flusher", daemon=True)
+    _flusher.start()
+    atexit.register(REGISTRY.flush)
+
+
+def _after_fork_in_child():
+    # Le worker repart de zéro : les valeurs du parent restent dans son propre fichier
+    global _flusher
+    _flusher = None
+    REGISTRY.reset()
+    start_flusher()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+# ========== MÉTRIQUES DU PIPELINE ==========
+REQUEST_SECONDS = histogram(
+    "truthtalent_request_duration_seconds",
+    "Durée des requêtes HTTP par route",
+    ["route", "method", "status"],
+)
+STAGE_SECONDS = histogram(
+    "truthtalent_stage_duration_seconds",
+    "Durée de chaque étape du pipeline d'analyse",
+    ["stage"],
+)
+DOCUMENTS = counter(
+    "truthtalent_documents_total",
+    "Documents traités par format",
+    ["format"],
+)
+DOCUMENT_BYTES = counter(
+    "truthtalent_document_bytes_total",
+    "Octets de documents reçus par format",
+    ["format"],
+)
+DOCUMENT_PAGES = counter(
+    "truthtalent_document_pages_total",
+    "Pages de documents traitées par format",
+    ["format"],
+)
+FAILURES = counter(
+    "truthtalent_failures_total",
+    "Échecs par étape du pipeline",
+    ["stage"],
+)
+
+ANALYSES = counter(
+    "truthtalent_analyses_total",
+    "Analyses par mode demandé et niveau exécuté (escalade du mode auto)",
+    ["mode", "tier"],
+)
@@ -0,0 +1,319 @@
+"""
+File OCR des PDF scannés
+
+Un CV scanné ne contient qu'une image par page : PyPDF2 n'en tire aucun
+texte. `pdfbackends.extract` le détecte sur ses premières pages (ressources
+sans police, densité de texte) et le pipeline lève `ImageOnlyDocument` au
+lieu d'analyser un texte vide. Le document part alors dans cette file :
+- moteur local : `pdftoppm` (poppler) rend les pages, `tesseract` les lit ;
+- threads dédiés (TT_OCR_WORKERS) et file bornée (TT_OCR_QUEUE_SIZE) : le
+  chemin interactif n'attend jamais l'OCR ;
+- sous-processus à priorité réduite (`nice -n TT_OCR_NICE`, pas de
+  `preexec_fn` : il exécuterait les hooks de fork dans un processus
+  multithreadé) et délai par commande (TT_OCR_TIMEOUT).
+
+Le résultat est livré par tâche : l'appelant reçoit un identifiant et suit
+le statut (queued, running, done, failed) sur `GET /jobs/{job_id}`. Les
+statuts sont des fichiers JSON dans un répertoire dédié (TT_OCR_DIR) : tous
+les workers d'une même machine les voient, quel que soit celui qui a traité
+le document. Ils contiennent le CV analysé : répertoire en 0700, fichiers en
+0600, et chaque fichier est supprimé dès que le résultat final a été lu
+(TT_OCR_JOB_TTL ne concerne que les résultats jamais réclamés).
+Chaque tâche porte le pid de son worker : à l'arrêt du worker (recyclage,
+retrait mémoire), ses tâches en attente passent en failed, et une tâche
+dont le worker a disparu sans prévenir est rapportée failed à la lecture.
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from lib import metrics
+from lib.logs import logger, fields
+
+OCR_ENABLED = os.getenv("TT_OCR", "1") != "0"
+PDFTOPPM = os.getenv("TT_OCR_PDFTOPPM", "pdftoppm")
+TESSERACT = os.getenv("TT_OCR_TESSERACT", "tesseract")
+LANGUAGES = os.getenv("TT_OCR_LANGUAGES", "fra+eng")
+DPI = int(os.getenv("TT_OCR_DPI", "200"))
+MAX_PAGES = int(os.getenv("TT_OCR_MAX_PAGES", "5"))
+TIMEOUT = float(os.getenv("TT_OCR_TIMEOUT", "60"))
+NICE = int(os.getenv("TT_OCR_NICE", "10"))
+WORKERS = int(os.getenv("TT_OCR_WORKERS", "1"))
+QUEUE_SIZE = int(os.getenv("TT_OCR_QUEUE_SIZE", "20"))
+JOBS_DIR = os.getenv("TT_OCR_DIR", os.path.join(tempfile.gettempdir(), "truthtalent-ocr-jobs"))
+JOB_TTL = float(os.getenv("TT_OCR_JOB_TTL", "86400"))
+
+OCR_JOBS = metrics.counter(
+    "truthtalent_ocr_jobs_total",
+    "Tâches OCR par issue (queued, done, failed, lost, rejected, unavailable)",
+    ["status"],
+)
+OCR_SECONDS = metrics.histogram(
+    "truthtalent_ocr_duration_seconds",
+    "Durée de l'OCR d'un document (rendu des pages et reconnaissance)",
+)
+OCR_QUEUE_DEPTH = metrics.gauge(
+    "truthtalent_ocr_queue_depth",
+    "Documents en attente dans la file OCR du worker",
+)
+
+
+class ImageOnlyDocument(Exception):
+    """PDF sans texte exploitable (pages scannées) : relève de l'OCR"""
+
+    def __init__(self, pages: int):
+        super().__init__(f"PDF scanné ({pages} pages) : texte à obtenir par OCR")
+        self.pages = pages
+
+
+class OcrQueueFull(Exception):
+    """File OCR pleine : document refusé"""
+
+
+def available() -> bool:
+    """OCR activé et moteur installé localement"""
+    return OCR_ENABLED and shutil.which(PDFTOPPM) is not None and shutil.which(TESSERACT) is not None
+
+
+# ========== MOTEUR ==========
+def _run(command: List[str]) -> str:
+    if NICE and shutil.which("nice"):
+        # Priorité réduite : l'OCR cède le CPU aux requêtes
+        command = ["nice", "-n", str(NICE)] + command
+    completed = subprocess.run(
+        command, capture_output=True, timeout=TIMEOUT, check=True, stdin=subprocess.DEVNULL,
+    )
+    return completed.stdout.decode("utf-8", errors="ignore")
+
+
+def ocr_pdf(content: bytes, max_pages: int = MAX_PAGES) -> str:
+    """Texte des premières pages du PDF : rendu pdftoppm, lecture tesseract"""
+    with tempfile.TemporaryDirectory(prefix="tt-ocr-") as directory:
+        source = os.path.join(directory, "document.pdf")
+        with open(source, "wb") as f:
+            f.write(content)
+        _run([PDFTOPPM, "-r", str(DPI), "-gray", "-png", "-l", str(max_pages),
+              source, os.path.join(directory, "page")])
+        # page-1.png, page-2.png... (numéros complétés par des zéros : tri lexical correct)
+        images = sorted(name for name in os.listdir(directory) if name.endswith(".png"))
+        texts = [_run([TESSERACT, os.path.join(directory, name), "stdout", "-l", LANGUAGES])
+                 for name in images]
+    return "\n".join(text.strip() for text in texts if text.strip())
+
+
+# ========== TÂCHES ==========
+# Statuts d'une tâche pas encore terminée
+PENDING = ("queued", "running")
+# Données personnelles (CV analysé) : lisibles par le seul utilisateur du service
+DIR_MODE = 0o700
+FILE_MODE = 0o600
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Statut des tâches OCR : un fichier JSON par tâche, expiré après `ttl`"""
+
+    def __init__(self, directory: str = JOBS_DIR, ttl: float = JOB_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._purged_at = 0.0
+
+    def _path(self, job_id: str) -> Optional[str]:
+        # Identifiant hexadécimal uniquement : pas de chemin arbitraire
+        if len(job_id) != 32 or any(char not in "0123456789abcdef" for char in job_id):
+            return None
+        return os.path.join(self.directory, job_id + ".json")
+
+    def _ensure_directory(self):
+        os.makedirs(self.directory, mode=DIR_MODE, exist_ok=True)
+        # Répertoire préexistant (créé avec l'umask, ou ancien) : droits resserrés
+        os.chmod(self.directory, DIR_MODE)
+
+    def _write(self, job: Dict):
+        path = self._path(job["job_id"])
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, FILE_MODE)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, default=str)
+        # Remplacement atomique : un lecteur voit l'ancien statut ou le nouveau
+        os.replace(temporary, path)
+
+    def create(self, **details) -> Dict:
+        self._ensure_directory()
+        self._purge()
+        now = datetime.now().isoformat()
+        job = {"job_id": uuid.uuid4().hex, "status": "queued", "pid": os.getpid(),
+               "created_at": now, "updated_at": now}
+        job.update(details)
+        self._write(job)
+        return job
+
+    def update(self, job_id: str, **changes) -> Dict:
+        job = self._read(job_id) or {"job_id": job_id}
+        job.update(changes)
+        job["updated_at"] = datetime.now().isoformat()
+        self._write(job)
+        return job
+
+    def _read(self, job_id: str) -> Optional[Dict]:
+        path = self._path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Tâche ; en attente alors que son worker a disparu : rapportée failed"""
+        job = self._read(job_id)
+        if job and job["status"] in PENDING and job.get("pid") and not _pid_alive(job["pid"]):
+            OCR_JOBS.inc(status="lost")
+            job = self.update(job_id, status="failed", error="worker_stopped")
+        return job
+
+    def fetch(self, job_id: str) -> Optional[Dict]:
+        """Tâche lue par le client ; terminée, son fichier est supprimé (lecture unique)"""
+        job = self.get(job_id)
+        if job and job["status"] not in PENDING:
+            try:
+                os.remove(self._path(job_id))
+            except OSError:
+                pass
+        return job
+
+    def _purge(self):
+        now = time.time()
+        if now - self._purged_at < 60:
+            return
+        self._purged_at = now
+        for entry in os.scandir(self.directory):
+            try:
+                if now - entry.stat().st_mtime > self.ttl:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class OcrQueue:
+    """File bornée de documents à passer à l'OCR, vidée par des threads dédiés
+
+    `on_text(texte)` est appelé dans le thread OCR et renvoie le résultat de
+    la tâche (analyse, sauvegarde) : il est enregistré tel quel.
+    """
+
+    def __init__(self, store: JobStore, size: int = QUEUE_SIZE, workers: int = WORKERS):
+        self.store = store
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=size)
+        self._threads: List[threading.Thread] = []
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, content: bytes, filename: str, on_text: Callable[[str], Dict]) -> Dict:
+        """Tâche créée (statut queued) ; lève `OcrQueueFull` si la file est pleine"""
+        if self._queue.full():
+            OCR_JOBS.inc(status="rejected")
+            raise OcrQueueFull()
+        job = self.store.create(filename=filename)
+        try:
+            self._queue.put_nowait((job["job_id"], content, on_text))
+        except queue.Full:
+            self.store.update(job["job_id"], status="failed", error="ocr_queue_full")
+            OCR_JOBS.inc(status="rejected")
+            raise OcrQueueFull()
+        OCR_JOBS.inc(status="queued")
+        OCR_QUEUE_DEPTH.set(self._queue.qsize())
+        self._start()
+        return job
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"tt-ocr-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job_id, content, on_text = self._queue.get()
+            OCR_QUEUE_DEPTH.set(self._queue.qsize())
+            with self._lock:
+                self._running.add(job_id)
+            self.store.update(job_id, status="running")
+            start = time.perf_counter()
+            try:
+                text = ocr_pdf(content)
+                OCR_SECONDS.observe(time.perf_counter() - start)
+                result = on_text(text)
+            except Exception as e:
+                OCR_JOBS.inc(status="failed")
+                logger.warning("Échec de la tâche OCR", extra=fields(job_id=job_id, error=str(e)))
+                self.store.update(job_id, status="failed", error=f"{type(e).__name__}: {e}")
+                continue
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+            OCR_JOBS.inc(status="done")
+            logger.info("Tâche OCR terminée", extra=fields(
+                job_id=job_id, chars=len(text), duration_ms=round((time.perf_counter() - start) * 1000)
+            ))
+            self.store.update(job_id, status="done", result=result)
+
+    def shutdown(self):
+        """Arrêt du worker : tâches en attente ou en cours marquées failed
+
+        Les threads OCR meurent avec le processus ; sans cela, leurs clients
+        verraient queued/running jusqu'à la purge.
+        """
+        pending = []
+        while True:
+            try:
+                pending.append(self._queue.get_nowait()[0])
+            except queue.Empty:
+                break
+        with self._lock:
+            pending.extend(self._running)
+        OCR_QUEUE_DEPTH.set(0)
+        for job_id in pending:
+            OCR_JOBS.inc(status="lost")
+            self.store.update(job_id, status="failed", error="worker_stopped")
+        if pending:
+            logger.warning("Tâches OCR abandonnées à l'arrêt du worker", extra=fields(jobs=len(pending)))
+
+
+job_store = JobStore()
+ocr_queue = OcrQueue(job_store)
+
+
+def shutdown():
+    """Arrêt du worker (lifespan) : voir `OcrQueue.shutdown`"""
+    ocr_queue.shutdown()
+
+
+def _after_fork_in_child():
+    # Threads et documents en attente restent au parent : file neuve dans le worker
+    global ocr_queue
+    ocr_queue = OcrQueue(job_store)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
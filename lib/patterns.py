@@ -0,0 +1,84 @@
+"""
+Motifs d'analyse compilés avec le module `regex` et un budget de temps
+
+Tous les motifs de l'extracteur passent par ce module : compilation en
+cache, délai maximal par appel (TT_REGEX_TIMEOUT) et GIL relâché pendant la
+recherche (`concurrent=True`). Un motif qui dépasse son budget renvoie un
+résultat vide (le champ est simplement manquant) au lieu de bloquer le worker.
+
+Les motifs enregistrés ici sont aussi ceux que rejoue le benchmark
+adversarial (`python -m benchmarks.regex_adversarial`).
+"""
+import os
+import threading
+from typing import Dict, List, Tuple
+
+from lib import metrics
+from lib.logs import logger, fields
+from lib.profiling import thread_activity
+
+try:
+    import regex as _engine
+    REGEX_AVAILABLE = True
+except ImportError:
+    import re as _engine
+    REGEX_AVAILABLE = False
+
+MATCH_TIMEOUT = float(os.getenv("TT_REGEX_TIMEOUT", "0.25"))
+
+REGEX_TIMEOUTS = metrics.counter(
+    "truthtalent_regex_timeouts_total",
+    "Recherches regex interrompues par le budget de temps, par étape",
+    ["stage"],
+)
+
+_cache: Dict[Tuple[str, int], object] = {}
+_lock = threading.Lock()
+
+
+def compile(pattern: str, flags: int = 0):
+    """Motif compilé (mis en cache et enregistré pour le benchmark)"""
+    key = (pattern, int(flags))
+    compiled = _cache.get(key)
+    if compiled is None:
+        compiled = _engine.compile(pattern, int(flags))
+        with _lock:
+            _cache[key] = compiled
+    return compiled
+
+
+def registered() -> List[Tuple[str, int]]:
+    """Motifs compilés jusqu'ici : (source, flags)"""
+    with _lock:
+        return list(_cache)
+
+
+def _run(method: str, pattern, flags: int, default, *args):
+    compiled = compile(pattern, flags) if isinstance(pattern, str) else pattern
+    if not REGEX_AVAILABLE:
+        return getattr(compiled, method)(*args)
+    try:
+        return getattr(compiled, method)(*args, concurrent=True, timeout=MATCH_TIMEOUT)
+    except TimeoutError:
+        stage_name = thread_activity.get(threading.get_ident(), ("-", "unknown", "-"))[1]
+        REGEX_TIMEOUTS.inc(stage=stage_name)
+        logger.warning("Budget regex dépassé", extra=fields(
+            stage=stage_name, pattern=compiled.pattern[:120], chars=len(args[-1])
+        ))
+        return default
+
+
+def findall(pattern, text: str, flags: int = 0) -> list:
+    return _run("findall", pattern, flags, [], text)
+
+
+def search(pattern, text: str, flags: int = 0):
+    return _run("search", pattern, flags, None, text)
+
+
+def sub(pattern, repl: str, text: str, flags: int = 0) -> str:
+    return _run("sub", pattern, flags, text, repl, text)
+
+
+def split(pattern, text: str, flags: int = 0) -> list:
+    return _run("split", pattern, flags, [text], text)
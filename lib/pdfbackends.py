@@ -0,0 +1,373 @@
+"""
+Moteurs d'extraction PDF et repli page par page
+
+Deux moteurs derrière la même interface (`PdfBackend.open` -> `PdfDocument`) :
+- rapide (TT_PDF_FAST_BACKEND, PyPDF2 par défaut) pour toutes les pages ;
+- mise en page (TT_PDF_LAYOUT_BACKEND, pdfplumber par défaut), plus lent,
+  appelé seulement sur les pages dont le texte échoue au contrôle de qualité
+  (`page_issue`) : vide, surtout des non-lettres, ligatures cassées, ou un
+  caractère par ligne.
+
+`PageStream` produit les pages une à une, à la demande : `extract` lit une
+plage de pages (découpage d'un long PDF entre les processus isolés) et
+s'arrête dès que les motifs d'arrêt ont tous été trouvés (mode fast : email
+et téléphone, presque toujours en première page).
+
+PDF scanné : une page qui n'affiche qu'une image (ressources sans police,
+ou quasiment sans texte) n'est pas renvoyée au moteur de mise en page. Si
+les TT_PDF_IMAGE_PROBE_PAGES premières pages sont toutes de ce type, la
+lecture s'arrête là (`image_only`) : le document relève de l'OCR (lib.ocr).
+
+`extract` s'exécute dans le processus isolé (lib.sandbox) : le temps passé
+dans chaque moteur et les replis sont renvoyés avec le texte, et `record`
+les publie en métriques côté worker.
+"""
+import os
+import time
+import importlib.util
+from io import BytesIO
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from lib import metrics, patterns
+
+FAST_BACKEND = os.getenv("TT_PDF_FAST_BACKEND", "pypdf2")
+LAYOUT_BACKEND = os.getenv("TT_PDF_LAYOUT_BACKEND", "pdfplumber")
+# Part minimale de lettres parmi les caractères visibles d'une page
+MIN_LETTER_RATIO = float(os.getenv("TT_PDF_MIN_LETTER_RATIO", "0.5"))
+# Page « image » : une image affichée et, au plus, ce nombre de caractères visibles
+IMAGE_PAGE_MAX_CHARS = int(os.getenv("TT_PDF_IMAGE_PAGE_MAX_CHARS", "20"))
+# Premières pages examinées avant de conclure à un PDF scanné
+IMAGE_PROBE_PAGES = int(os.getenv("TT_PDF_IMAGE_PROBE_PAGES", "2"))
+
+BACKEND_SECONDS = metrics.histogram(
+    "truthtalent_pdf_backend_seconds",
+    "Temps d'extraction passé dans chaque moteur PDF, par document",
+    ["backend"],
+)
+BACKEND_PAGES = metrics.counter(
+    "truthtalent_pdf_backend_pages_total",
+    "Pages extraites par moteur PDF",
+    ["backend"],
+)
+FALLBACKS = metrics.counter(
+    "truthtalent_pdf_fallbacks_total",
+    "Pages renvoyées au moteur de mise en page, par défaut de qualité détecté",
+    ["reason"],
+)
+EARLY_STOPS = metrics.counter(
+    "truthtalent_pdf_early_stops_total",
+    "Extractions arrêtées avant la dernière page (motifs d'arrêt trouvés)",
+)
+IMAGE_ONLY = metrics.counter(
+    "truthtalent_pdf_image_only_total",
+    "PDF dont les premières pages ne sont que des images (scans)",
+)
+PAGES_SKIPPED = metrics.counter(
+    "truthtalent_pdf_pages_skipped_total",
+    "Pages non lues grâce à l'arrêt anticipé",
+)
+
+# Glyphes typiques d'une table de correspondance cassée
+_BROKEN_GLYPHS = ("�", "(cid:", "ﬀ", "ﬁ", "ﬂ", "ﬃ", "ﬄ")
+
+
+def page_issue(text: str) -> Optional[str]:
+    """Défaut de qualité du texte d'une page (None si le texte est exploitable)
+
+    Contrôle linéaire, sans regex : il s'applique à chaque page.
+    """
+    visible = "".join(text.split())
+    if not visible:
+        return "empty"
+    letters = sum(1 for char in visible if char.isalpha())
+    if letters / len(visible) < MIN_LETTER_RATIO:
+        return "non_letters"
+    if sum(text.count(glyph) for glyph in _BROKEN_GLYPHS) * 50 > len(visible):
+        return "ligatures"
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) >= 10 and sum(1 for line in lines if len(line.strip()) == 1) * 2 > len(lines):
+        return "char_per_line"
+    return None
+
+
+# ========== MOTEURS ==========
+class PdfDocument:
+    """Document ouvert par un moteur : nombre de pages et texte de chacune"""
+
+    page_count = 0
+
+    def page_text(self, index: int) -> str:
+        raise NotImplementedError
+
+    def page_resources(self, index: int) -> Optional[Tuple[bool, bool]]:
+        """(polices, images) utilisées par la page ; None si le moteur l'ignore"""
+        return None
+
+    def close(self):
+        pass
+
+
+class PdfBackend:
+    """Moteur d'extraction PDF"""
+
+    name = ""
+    module = ""
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    def open(self, content: bytes) -> PdfDocument:
+        raise NotImplementedError
+
+
+class _PyPDF2Document(PdfDocument):
+    def __init__(self, content: bytes):
+        import PyPDF2
+
+        self._reader = PyPDF2.PdfReader(BytesIO(content))
+        self.page_count = len(self._reader.pages)
+
+    def page_text(self, index: int) -> str:
+        return self._reader.pages[index].extract_text() or ""
+
+    def page_resources(self, index: int) -> Optional[Tuple[bool, bool]]:
+        return _pypdf2_resources(self._reader.pages[index].get("/Resources"))
+
+
+def _pypdf2_resources(resources, depth: int = 0) -> Tuple[bool, bool]:
+    """(polices, images) d'un dictionnaire /Resources, formulaires imbriqués compris"""
+    resources = resources.get_object() if resources is not None else None
+    if not resources:
+        return False, False
+    fonts, images = bool(resources.get("/Font")), False
+    xobjects = resources.get("/XObject")
+    for reference in (xobjects.get_object().values() if xobjects else ()):
+        xobject = reference.get_object()
+        subtype = xobject.get("/Subtype")
+        if subtype == "/Image":
+            images = True
+        elif subtype == "/Form" and depth < 2:
+            form_fonts, form_images = _pypdf2_resources(xobject.get("/Resources"), depth + 1)
+            fonts, images = fonts or form_fonts, images or form_images
+    return fonts, images
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def open(self, content: bytes) -> PdfDocument:
+        return _PyPDF2Document(content)
+
+
+class _PdfplumberDocument(PdfDocument):
+    def __init__(self, content: bytes):
+        import pdfplumber
+
+        self._pdf = pdfplumber.open(BytesIO(content))
+        self.page_count = len(self._pdf.pages)
+
+    def page_text(self, index: int) -> str:
+        return self._pdf.pages[index].extract_text() or ""
+
+    def close(self):
+        self._pdf.close()
+
+
+class PdfplumberBackend(PdfBackend):
+    name = "pdfplumber"
+    module = "pdfplumber"
+
+    def open(self, content: bytes) -> PdfDocument:
+        return _PdfplumberDocument(content)
+
+
+BACKENDS: Dict[str, PdfBackend] = {
+    backend.name: backend for backend in (PyPDF2Backend(), PdfplumberBackend())
+}
+
+
+# ========== EXTRACTION ==========
+class _TimedDocument:
+    """Ouverture paresseuse d'un moteur et temps cumulé passé dedans"""
+
+    def __init__(self, backend: PdfBackend, content: bytes):
+        self.backend = backend
+        self._content = content
+        self._document: Optional[PdfDocument] = None
+        self.seconds = 0.0
+        self.pages = 0
+
+    def page_text(self, index: int) -> str:
+        start = time.perf_counter()
+        try:
+            if self._document is None:
+                self._document = self.backend.open(self._content)
+            self.pages += 1
+            return self._document.page_text(index)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def page_resources(self, index: int) -> Optional[Tuple[bool, bool]]:
+        start = time.perf_counter()
+        try:
+            if self._document is None:
+                self._document = self.backend.open(self._content)
+            return self._document.page_resources(index)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    @property
+    def page_count(self) -> int:
+        if self._document is None:
+            start = time.perf_counter()
+            self._document = self.backend.open(self._content)
+            self.seconds += time.perf_counter() - start
+        return self._document.page_count
+
+    def close(self):
+        if self._document is not None:
+            self._document.close()
+
+
+class PageStream:
+    """Pages d'un PDF produites à la demande : moteur rapide, repli par page"""
+
+    def __init__(self, content: bytes, fallback: bool = True):
+        self.fast = _TimedDocument(BACKENDS[FAST_BACKEND], content)
+        self.layout = None
+        if fallback and LAYOUT_BACKEND in BACKENDS and BACKENDS[LAYOUT_BACKEND].available():
+            self.layout = _TimedDocument(BACKENDS[LAYOUT_BACKEND], content)
+        self.fallbacks: Dict[str, int] = {}
+        self.fallback_errors = 0
+        self.image_pages = 0
+
+    @property
+    def page_count(self) -> int:
+        return self.fast.page_count
+
+    def is_image_page(self, index: int, page_text: str) -> bool:
+        """Page qui affiche une image sans police, ou presque sans texte (scan)"""
+        resources = self.fast.page_resources(index)
+        if resources is None:
+            return False
+        fonts, images = resources
+        if not images:
+            return False
+        return not fonts or len("".join(page_text.split())) <= IMAGE_PAGE_MAX_CHARS
+
+    def page_text(self, index: int) -> str:
+        page_text = self.fast.page_text(index)
+        if self.is_image_page(index, page_text):
+            # Le moteur de mise en page ne lira pas mieux une image
+            self.image_pages += 1
+            return page_text
+        issue = page_issue(page_text) if self.layout is not None else None
+        if issue is not None:
+            self.fallbacks[issue] = self.fallbacks.get(issue, 0) + 1
+            try:
+                layout_text = self.layout.page_text(index)
+            except Exception:
+                # Le texte du moteur rapide reste préférable à une erreur
+                self.fallback_errors += 1
+                layout_text = ""
+            # Le texte du moteur de mise en page, sauf s'il n'apporte rien
+            if layout_text.strip():
+                page_text = layout_text
+        return page_text
+
+    def pages(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """(index, texte) des pages [start, stop), extraites au fil de l'itération"""
+        stop = self.page_count if stop is None else min(stop, self.page_count)
+        for index in range(start, stop):
+            yield index, self.page_text(index)
+
+    def backends(self) -> Dict[str, Dict]:
+        """Temps et pages par moteur utilisé"""
+        usage = {self.fast.backend.name: {"seconds": self.fast.seconds, "pages": self.fast.pages}}
+        if self.layout is not None and self.layout.pages:
+            usage[self.layout.backend.name] = {"seconds": self.layout.seconds, "pages": self.layout.pages}
+        return usage
+
+    def close(self):
+        self.fast.close()
+        if self.layout is not None:
+            self.layout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def extract(content: bytes, max_pages: int, max_chars: int, fallback: bool = True,
+            first_page: int = 0, last_page: Optional[int] = None,
+            stop_patterns: Sequence[str] = ()) -> Dict:
+    """Texte des pages [first_page, last_page) du PDF, dans la limite de `max_pages`
+
+    Avec `stop_patterns`, la lecture s'arrête à la première page où tous les
+    motifs ont été vus (sur l'ensemble des pages déjà lues). Elle s'arrête
+    aussi, avec `image_only`, quand les premières pages ne sont que des images.
+
+    Renvoie {"text", "pages", "truncated", "pages_read", "stopped_early",
+    "pages_skipped", "image_only", "image_pages", "backends", "fallbacks",
+    "fallback_errors"}.
+    """
+    with PageStream(content, fallback) as stream:
+        page_count = stream.page_count
+        end = page_count if last_page is None else min(page_count, last_page)
+        stop = min(end, max_pages)
+        # Tronqué seulement si le plafond coupe la plage demandée (pas le reste du document)
+        parts, chars, truncated = [], 0, stop < end
+        pending = list(stop_patterns)
+        pages_read, pages_skipped, image_only = 0, 0, False
+        probe = min(IMAGE_PROBE_PAGES, stop) if first_page == 0 else 0
+        for index, page_text in stream.pages(first_page, stop):
+            pages_read += 1
+            if pages_read == probe and stream.image_pages == probe:
+                # Scan : inutile de lire le reste, le texte viendra de l'OCR
+                image_only = True
+                break
+            if not page_text:
+                continue
+            parts.append(page_text)
+            chars += len(page_text)
+            if chars >= max_chars:
+                truncated = True
+                break
+            if pending:
+                pending = [pattern for pattern in pending if patterns.search(pattern, page_text) is None]
+                if not pending:
+                    pages_skipped = stop - index - 1
+                    break
+
+    return {
+        "text": "\n".join(parts)[:max_chars],
+        "pages": page_count,
+        "truncated": truncated,
+        "pages_read": pages_read,
+        "stopped_early": pages_skipped > 0,
+        "pages_skipped": pages_skipped,
+        "image_only": image_only,
+        "image_pages": stream.image_pages,
+        "backends": stream.backends(),
+        "fallbacks": stream.fallbacks,
+        "fallback_errors": stream.fallback_errors,
+    }
+
+
+def record(extraction: Dict):
+    """Publie (côté worker) les temps par moteur et les replis d'une extraction"""
+    for name, usage in extraction.get("backends", {}).items():
+        BACKEND_SECONDS.observe(usage["seconds"], backend=name)
+        BACKEND_PAGES.inc(usage["pages"], backend=name)
+    for reason, count in extraction.get("fallbacks", {}).items():
+        FALLBACKS.inc(count, reason=reason)
+    if extraction.get("fallback_errors"):
+        metrics.FAILURES.inc(extraction["fallback_errors"], stage="extract_pdf_layout")
+    if extraction.get("stopped_early"):
+        EARLY_STOPS.inc()
+        PAGES_SKIPPED.inc(extraction["pages_skipped"])
+    if extraction.get("image_only"):
+        IMAGE_ONLY.inc()
@@ -0,0 +1,194 @@
+"""
+Profil par requête (opt-in) et chronométrage des étapes du pipeline
+
+`stage()` alimente toujours l'histogramme Prometheus ; le détail
+(wall/CPU par étape, correspondances regex, pages, mémoire) n'est collecté
+que si la requête a demandé un profil via `X-TT-Profile: 1` ou `?profile=1`.
+
+Mémoire (tracemalloc, partagé par tout le processus) : `memory_delta_bytes`
+est la différence de mémoire tracée entre le début et la fin de la requête ;
+`peak_memory_bytes`, le pic tracé, n'est donné que si aucune autre requête
+profilée n'a tourné en même temps (sinon `memory_shared` vaut true : le pic
+et la différence incluent ses allocations).
+"""
+import time
+import tracemalloc
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional, Set, Tuple
+
+from lib import metrics, deadline
+from lib.logs import request_id_var
+
+PROFILE_HEADER = "x-tt-profile"
+PROFILE_QUERY = "profile"
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+# Étape en cours de la tâche : chaque tâche du pool des extracteurs (contexte
+# copié) a la sienne, sans toucher à celle du thread qui l'a lancée
+current_stage = contextvars.ContextVar("current_stage", default="request")
+
+# Identifiant de la requête généré par le serveur (X-Request-ID vient du
+# client : ni unique ni fiable), clé des captures de requêtes lentes
+server_request_id = contextvars.ContextVar("server_request_id", default="-")
+
+# Étape en cours par thread : (id de requête, étape, id serveur), lue par le
+# détecteur de blocage et l'échantillonneur des requêtes lentes
+thread_activity: Dict[int, Tuple[str, str, str]] = {}
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+# Profils en cours de mesure mémoire : un pic n'est attribuable qu'à un profil seul
+_measuring: Set["RequestProfile"] = set()
+
+
+class RequestProfile:
+    """Mesures détaillées d'une requête"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.regex: Dict[str, Dict[str, int]] = {}
+        self.page_count: Optional[int] = None
+        self.char_count: Optional[int] = None
+        self.memory_start = 0
+        self.memory_shared = False
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        # Étapes alimentées en parallèle par les threads du pool des extracteurs
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, wall: float, cpu: float):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0, "calls": 0})
+            entry["wall_ms"] += wall * 1000
+            entry["cpu_ms"] += cpu * 1000
+            entry["calls"] += 1
+
+    def add_matches(self, stage: str, count: int):
+        with self._lock:
+            entry = self.regex.setdefault(stage, {"calls": 0, "matches": 0})
+            entry["calls"] += 1
+            entry["matches"] += count
+
+    def to_dict(self) -> Dict:
+        return {
+            "total_wall_ms": round((time.perf_counter() - self._wall_start) * 1000, 3),
+            "total_cpu_ms": round((time.process_time() - self._cpu_start) * 1000, 3),
+            "stages": {
+                name: {k: round(v, 3) if isinstance(v, float) else v for k, v in entry.items()}
+                for name, entry in self.stages.items()
+            },
+            "regex": self.regex,
+            "page_count": self.page_count,
+            "char_count": self.char_count,
+        }
+
+
+def requested(request) -> bool:
+    """La requête demande-t-elle un profil ?"""
+    flag = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY)
+    return flag in ("1", "true", "yes")
+
+
+def acquire_tracemalloc():
+    """Démarre tracemalloc (compteur d'utilisateurs partagé)"""
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracemalloc_users += 1
+
+
+def release_tracemalloc():
+    """Arrête tracemalloc quand plus personne ne l'utilise"""
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users = max(0, _tracemalloc_users - 1)
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def start() -> RequestProfile:
+    """Active le profil pour la requête courante (et tracemalloc)"""
+    acquire_tracemalloc()
+    profile = RequestProfile()
+    with _tracemalloc_lock:
+        if _measuring:
+            # Requêtes simultanées : aucun pic ne leur est propre
+            profile.memory_shared = True
+            for other in _measuring:
+                other.memory_shared = True
+        elif hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        else:
+            profile.memory_shared = True
+        _measuring.add(profile)
+        profile.memory_start = tracemalloc.get_traced_memory()[0]
+    current_profile.set(profile)
+    return profile
+
+
+def finish(profile: RequestProfile) -> Dict:
+    """Termine le profil et renvoie l'objet `timings` (mémoire : voir en tête du module)"""
+    timings = profile.to_dict()
+    with _tracemalloc_lock:
+        _measuring.discard(profile)
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            timings["memory_delta_bytes"] = current - profile.memory_start
+            timings["memory_shared"] = profile.memory_shared
+            if not profile.memory_shared:
+                timings["peak_memory_bytes"] = peak
+    release_tracemalloc()
+    current_profile.set(None)
+    return timings
+
+
+@contextmanager
+def stage(name: str):
+    """Chronomètre une étape : histogramme + profil de la requête si actif
+
+    Chaque étape est aussi un point d'arrêt : `DeadlineExceeded` si
+    l'échéance de la requête est passée ou si le client est parti.
+    """
+    deadline.checkpoint(name)
+    profile = current_profile.get()
+    ident = threading.get_ident()
+    previous_activity = thread_activity.get(ident)
+    thread_activity[ident] = (request_id_var.get(), name, server_request_id.get())
+    if profile is not None:
+        start_cpu = time.thread_time()
+        stage_token = current_stage.set(name)
+    start_wall = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start_wall
+        metrics.STAGE_SECONDS.observe(wall, stage=name)
+        if profile is not None:
+            profile.add_stage(name, wall, time.thread_time() - start_cpu)
+            current_stage.reset(stage_token)
+        if previous_activity is None:
+            thread_activity.pop(ident, None)
+        else:
+            thread_activity[ident] = previous_activity
+
+
+def count_matches(count: int):
+    """Compte les correspondances regex de l'étape courante (si profil actif)"""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add_matches(current_stage.get(), count)
+
+
+def set_page_count(count: int):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.page_count = count
+
+
+def set_char_count(count: int):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.char_count = count
@@ -0,0 +1,178 @@
+"""
+Texte visible d'un document RTF
+
+Décoder un RTF comme de l'UTF-8 envoie à l'analyse les mots de contrôle,
+la table des polices, les métadonnées et les images en hexadécimal : un
+texte plusieurs fois plus long que le CV, où les motifs trouvent de faux
+numéros de téléphone et de fausses compétences.
+
+Ici, un tokenizer en un seul passage (temps linéaire, sans retour arrière)
+ne garde que le texte affiché :
+- groupes de destination ignorés (tables de polices, de couleurs et de
+  styles, infos, images, objets, instructions de champ, `{\\*...}`), mais
+  pas les en-têtes, pieds de page ni zones de texte (`\\shptxt`) ;
+- `\\uN` décodé (`\\ucN` caractères de repli sautés), `\\'hh` décodé selon la
+  page de code du document (`\\ansicpgN`, cp1252 par défaut) ;
+- paragraphes, lignes et rangées de tableau en sauts de ligne, cellules et
+  tabulations en tabulations ; `\\binN` sauté sans être lu.
+
+Le texte est produit au fil de la lecture (`iter_text`) : `extract`
+s'arrête au plafond de caractères sans tokenizer la suite.
+"""
+import re
+import codecs
+from typing import Dict, Iterator, List
+
+DEFAULT_CODEPAGE = "cp1252"
+
+# Mot de contrôle (et son paramètre, espace de fin comprise), octet \'hh,
+# symbole de contrôle, accolade, texte brut, fins de ligne (ignorées)
+_TOKEN = re.compile(
+    r"\\([a-zA-Z]{1,32})(-?\d{1,10})? ?"
+    r"|\\'([0-9a-fA-F]{2})"
+    r"|\\(.)"
+    r"|([{}])"
+    r"|([^\\{}\r\n]+)"
+    r"|[\r\n]+",
+    re.S,
+)
+
+# Destinations dont le contenu n'est jamais affiché
+_SKIPPED_DESTINATIONS = frozenset((
+    "fonttbl", "colortbl", "stylesheet", "info", "listtable", "listoverridetable",
+    "rsidtbl", "generator", "latentstyles", "themedata", "colorschememapping",
+    "datastore", "xmlnstbl", "mmathPr", "filetbl", "revtbl", "pgdsctbl",
+    "pict", "object", "objdata", "shppict", "nonshppict", "shprslt", "sp", "sn", "sv",
+    "fldinst", "listtext", "pntext", "pntxta", "pntxtb", "bkmkstart", "bkmkend",
+    "template", "userprops", "docvar", "annotation", "atnid", "atnauthor",
+    "xe", "tc", "txe", "rxe", "falt", "panose", "fontemb", "fontfile", "blipuid",
+))
+# Mots de contrôle qui produisent du texte
+_CHARACTERS = {
+    "par": "\n", "line": "\n", "sect": "\n", "page": "\n", "row": "\n", "nestrow": "\n",
+    "cell": "\t", "nestcell": "\t", "tab": "\t",
+    "emdash": "\u2014", "endash": "\u2013", "bullet": "\u2022",
+    "lquote": "\u2018", "rquote": "\u2019", "ldblquote": "\u201c", "rdblquote": "\u201d",
+    "emspace": " ", "enspace": " ", "qmspace": " ",
+}
+_SYMBOLS = {"\\": "\\", "{": "{", "}": "}", "~": "\u00a0", "_": "-", "-": "", "\n": "\n", "\r": "\n"}
+_CHARSETS = {"ansi": "cp1252", "mac": "mac_roman", "pc": "cp437", "pca": "cp850"}
+
+
+def _codepage(number: int) -> str:
+    name = f"cp{number}"
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return DEFAULT_CODEPAGE
+    return name
+
+
+def iter_text(content: bytes) -> Iterator[str]:
+    """Morceaux de texte visible du RTF, dans l'ordre du document"""
+    # latin-1 : un caractère par octet, les octets 8 bits sont décodés plus tard
+    data = content.decode("latin-1")
+    codepage = DEFAULT_CODEPAGE
+    # Par groupe : (contenu ignoré, nombre de caractères de repli après \uN)
+    stack: List[tuple] = []
+    skipping, uc = False, 1
+    # Caractères de repli restant à sauter après un \uN
+    fallback = 0
+    # Octets \'hh consécutifs : décodés ensemble (pages de code multi-octets)
+    pending = bytearray()
+    position, end = 0, len(data)
+
+    while position < end:
+        match = _TOKEN.match(data, position)
+        if match is None:
+            # Barre oblique finale isolée
+            position += 1
+            continue
+        position = match.end()
+        word, parameter, hex_byte, symbol, brace, text = match.groups()
+
+        if hex_byte is not None:
+            if fallback:
+                fallback -= 1
+            elif not skipping:
+                pending.append(int(hex_byte, 16))
+            continue
+        if match.lastindex is None:
+            # Fins de ligne brutes : sans effet, même entre deux octets \'hh
+            continue
+        if pending:
+            yield pending.decode(codepage, errors="replace")
+            pending.clear()
+
+        if brace is not None:
+            if brace == "{":
+                stack.append((skipping, uc))
+            elif stack:
+                skipping, uc = stack.pop()
+            fallback = 0
+        elif text is not None:
+            if fallback:
+                skipped = min(fallback, len(text))
+                fallback -= skipped
+                text = text[skipped:]
+            if text and not skipping:
+                yield text.encode("latin-1").decode(codepage, errors="replace")
+        elif fallback:
+            # Un mot ou symbole de contrôle compte pour un caractère de repli
+            fallback -= 1
+        elif symbol is not None:
+            if symbol == "*":
+                # Destination facultative : inconnue des lecteurs anciens, jamais affichée
+                skipping = True
+            elif not skipping and symbol in _SYMBOLS:
+                yield _SYMBOLS[symbol]
+        elif word == "bin":
+            # Données binaires brutes : sautées sans être tokenizées
+            position += max(0, int(parameter or 0))
+        elif word in _SKIPPED_DESTINATIONS:
+            skipping = True
+        elif word == "u" and parameter:
+            value = int(parameter)
+            if not skipping:
+                yield chr(value + 65536 if value < 0 else value)
+            fallback = uc
+        elif word == "uc" and parameter:
+            uc = int(parameter)
+        elif word == "ansicpg" and parameter:
+            codepage = _codepage(int(parameter))
+        elif word in _CHARSETS:
+            codepage = _CHARSETS[word]
+        elif not skipping and word in _CHARACTERS:
+            yield _CHARACTERS[word]
+
+    if pending:
+        yield pending.decode(codepage, errors="replace")
+
+
+def _join(parts: List[str]) -> str:
+    text = "".join(parts)
+    try:
+        text.encode("utf-8")
+    except UnicodeEncodeError:
+        # Paires de substitution venues de deux \uN successifs
+        text = text.encode("utf-16", "surrogatepass").decode("utf-16", errors="replace")
+    return text
+
+
+def extract(content: bytes, max_chars: int) -> Dict:
+    """Texte visible du RTF, arrêté au plafond de caractères
+
+    Renvoie {"text", "pages", "truncated"} comme les autres extracteurs.
+    """
+    parts, chars, truncated = [], 0, False
+    pieces = iter_text(content)
+    try:
+        for piece in pieces:
+            parts.append(piece)
+            chars += len(piece)
+            if chars >= max_chars:
+                truncated = True
+                break
+    finally:
+        pieces.close()
+    return {"text": _join(parts)[:max_chars], "pages": None, "truncated": truncated}
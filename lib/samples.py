@@ -0,0 +1,242 @@
+"""
+Documents CV synthétiques (PDF, DOCX, RTF, TXT) générés en mémoire
+
+Utilisés par les benchmarks et le warm-up : aucun fichier binaire n'est
+versionné, les documents sont construits à la volée.
+"""
+import io
+import zipfile
+from typing import Dict, List, Optional
+
+SAMPLE_CV_TEXT = """Jean Dupont
+Email: jean.dupont@example.com
+Tel: 06 12 34 56 78
+Paris
+Profil: Développeur Python senior avec 8 ans d'expérience en backend et cloud.
+Compétences: Python, Django, Docker, AWS, PostgreSQL, React, Kubernetes
+2018 - 2023 Développeur backend chez Acme
+2015 - 2018 Développeur chez Initech
+Formation: Master informatique, Université de Lyon
+Langues: anglais courant, espagnol intermédiaire"""
+
+FILLER_PAGE_TEXT = """Projet: refonte d'une plateforme de recrutement en microservices.
+Réalisations: migration vers Kubernetes, mise en place de la CI GitLab.
+Technologies: Python, FastAPI, PostgreSQL, Redis, Docker, Terraform.
+Responsabilités: encadrement de 4 développeurs et revue de code."""
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: Optional[List[str]] = None) -> bytes:
+    """Construit un PDF texte minimal (une page par élément de `pages`)"""
+    pages = pages or [SAMPLE_CV_TEXT]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages))).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, page_text in enumerate(pages):
+        operations = ["BT /F1 11 Tf 50 780 Td 14 TL"]
+        operations += [f"({_pdf_escape(line)}) Tj T*" for line in page_text.split("\n")]
+        operations.append("ET")
+        stream = "\n".join(operations).encode("cp1252", errors="replace")
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        ).encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    return _pdf_file(objects)
+
+
+def _pdf_file(objects: List[bytes]) -> bytes:
+    """Assemble les objets (numérotés à partir de 1, catalogue en premier) et la table xref"""
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def make_long_pdf(page_count: int = 40) -> bytes:
+    """PDF multi-pages : le CV en première page puis des pages de projets"""
+    return make_pdf([SAMPLE_CV_TEXT] + [FILLER_PAGE_TEXT] * (page_count - 1))
+
+
+def make_scanned_pdf(page_count: int = 2) -> bytes:
+    """PDF « scanné » : chaque page n'affiche qu'une image, sans police ni texte"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(page_count)), page_count)).encode(),
+        b"<< /Type /XObject /Subtype /Image /Width 2 /Height 2 /ColorSpace /DeviceGray "
+        b"/BitsPerComponent 8 /Length 4 >>\nstream\n\x00\xff\xff\x00\nendstream",
+    ]
+    stream = b"q 595 0 0 842 0 0 cm /Im0 Do Q"
+    for i in range(page_count):
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /XObject << /Im0 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        ).encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    return _pdf_file(objects)
+
+
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+
+def _xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+_W_NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape" '
+    'xmlns:v="urn:schemas-microsoft-com:vml"'
+)
+
+
+def _docx_paragraphs(lines: List[str]) -> str:
+    return "".join(
+        f"<w:p><w:r><w:t xml:space=\"preserve\">{_xml_escape(line)}</w:t></w:r></w:p>"
+        for line in lines
+    )
+
+
+def _docx_archive(body: str, extra_parts: Optional[Dict[str, str]] = None) -> bytes:
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f"<w:document {_W_NAMESPACES}><w:body>{body}</w:body></w:document>"
+    )
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _DOCX_RELS)
+        archive.writestr("word/document.xml", document)
+        for name, xml in (extra_parts or {}).items():
+            archive.writestr(name, xml)
+    return out.getvalue()
+
+
+def make_docx(text: str = SAMPLE_CV_TEXT) -> bytes:
+    """Construit un DOCX minimal (un paragraphe par ligne)"""
+    return _docx_archive(_docx_paragraphs(text.split("\n")))
+
+
+def make_template_docx() -> bytes:
+    """DOCX façon modèle de CV : coordonnées en en-tête, compétences en
+    tableau, langues dans une zone de texte (avec sa version VML de repli)"""
+    lines = SAMPLE_CV_TEXT.split("\n")
+    header = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f"<w:hdr {_W_NAMESPACES}>{_docx_paragraphs(lines[:4])}</w:hdr>"
+    )
+    rows = "".join(
+        f"<w:tr><w:tc>{_docx_paragraphs([label])}</w:tc><w:tc>{_docx_paragraphs([value])}</w:tc></w:tr>"
+        for label, value in (line.split(": ", 1) for line in (lines[5], lines[8]))
+    )
+    text_box = f"<w:txbxContent>{_docx_paragraphs(lines[9:])}</w:txbxContent>"
+    body = (
+        _docx_paragraphs([lines[4]] + lines[6:8])
+        + f"<w:tbl>{rows}</w:tbl>"
+        + "<w:p><w:r><mc:AlternateContent>"
+        + f"<mc:Choice Requires=\"wps\"><w:drawing><wps:txbx>{text_box}</wps:txbx></w:drawing></mc:Choice>"
+        + f"<mc:Fallback><w:pict><v:textbox>{text_box}</v:textbox></w:pict></mc:Fallback>"
+        + "</mc:AlternateContent></w:r></w:p>"
+    )
+    return _docx_archive(body, {"word/header1.xml": header})
+
+
+def make_large_docx(paragraph_count: int = 20000) -> bytes:
+    """DOCX volumineux : le CV puis des paragraphes de projets"""
+    filler = FILLER_PAGE_TEXT.split("\n")
+    lines = SAMPLE_CV_TEXT.split("\n") + [filler[i % len(filler)] for i in range(paragraph_count)]
+    return _docx_archive(_docx_paragraphs(lines))
+
+
+def _rtf_escape(line: str) -> str:
+    """Texte en RTF comme l'écrit Word : \\'hh pour cp1252, \\uN? au-delà"""
+    out = []
+    for char in line.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}"):
+        if ord(char) < 128:
+            out.append(char)
+        elif ord(char) < 256:
+            out.append(f"\\'{ord(char):02x}")
+        else:
+            out.append(f"\\u{ord(char)}?")
+    return "".join(out)
+
+
+def make_rtf(text: str = SAMPLE_CV_TEXT) -> bytes:
+    """RTF façon Word : tables de polices, couleurs et styles, métadonnées,
+    thème et photo en hexadécimal, coordonnées en en-tête, compétences en
+    tableau"""
+    lines = [_rtf_escape(line) for line in text.split("\n")]
+    fonts = "".join(
+        f"{{\\f{index}\\fswiss\\fcharset0\\fprq2{{\\*\\panose 020b0604020202020204}}{name};}}"
+        for index, name in enumerate(("Arial", "Calibri", "Times New Roman", "Cambria Math"))
+    )
+    colors = "".join(f"\\red{r}\\green{g}\\blue{b};" for r, g, b in ((0, 0, 0), (31, 56, 100), (68, 114, 196)))
+    styles = "".join(
+        f"{{\\s{index}\\ql\\li0\\ri0\\sa160\\sl259\\slmult1\\f1\\fs22\\lang1036 {name};}}"
+        for index, name in enumerate(("Normal", "heading 1", "heading 2", "Title", "List Paragraph"))
+    )
+    rsids = "".join(f"\\rsid{1234567 + index * 7919}" for index in range(40))
+    latent = "".join(f"\\lsdpriority{index} \\lsdlocked0 Style {index};" for index in range(60))
+    # Blobs hexadécimaux : des suites de chiffres que l'UTF-8 brut livrait à l'analyse
+    theme = "".join(f"{(index * 2654435761) % 4294967296:08x}" for index in range(600))
+    photo = "".join(f"{(index * 40503 + 6) % 4294967296:08x}" for index in range(2000))
+    body = "\\par\n".join(f"\\pard\\plain\\s0\\f1\\fs22 {line}" for line in [lines[4]] + lines[6:8] + lines[9:])
+    rows = "".join(
+        f"\\trowd\\trgaph108\\cellx3000\\cellx9000\\pard\\intbl {label}\\cell {value}\\cell\\row\n"
+        for label, value in (line.split(": ", 1) for line in (lines[5], lines[8]))
+    )
+    document = (
+        "{\\rtf1\\adeflang1025\\ansi\\ansicpg1252\\uc1\\deff1\\deflang1036\n"
+        f"{{\\fonttbl{fonts}}}\n{{\\colortbl;{colors}}}\n{{\\stylesheet{styles}}}\n"
+        "{\\*\\rsidtbl " + rsids + "}\n"
+        "{\\*\\generator Microsoft Word 16.0;}\n"
+        "{\\info{\\title CV}{\\author Jean Dupont}{\\operator RH 01 23 45 67 89}"
+        "{\\creatim\\yr2023\\mo5\\dy12\\hr9\\min30}{\\version4}{\\edmins12}{\\nofpages1}{\\nofwords120}}\n"
+        "{\\*\\latentstyles\\lsdstimax376\\lsdlockeddef0 " + latent + "}\n"
+        "{\\*\\themedata " + theme + "}\n"
+        "\\paperw11906\\paperh16838\\margl1417\\margr1417\\margt1417\\margb1417\n"
+        "{\\header \\pard\\plain\\s0\\f1\\fs22 " + "\\par\n".join(lines[:4]) + "\\par}\n"
+        "{\\*\\shppict{\\pict\\jpegblip\\picw2000\\pich2000 " + photo + "}}"
+        "{\\nonshppict{\\pict\\wmetafile8 " + photo[:2000] + "}}\n"
+        + body + "\\par\n" + rows + "}"
+    )
+    return document.encode("latin-1")
+
+
+def make_txt(text: str = SAMPLE_CV_TEXT) -> bytes:
+    return text.encode("utf-8")
+
+
+SAMPLES = {
+    "cv.pdf": make_pdf,
+    "cv.docx": make_docx,
+    "cv.rtf": make_rtf,
+    "cv.txt": make_txt,
+}
@@ -0,0 +1,494 @@
+"""
+Extraction isolée des documents (PDF, DOCX, RTF) avec délais stricts
+
+Un PDF forgé ou corrompu peut faire tourner `PdfReader` ou
+`page.extract_text()` pendant des minutes. Le parsing est donc confié à des
+processus dédiés : délai mur (TT_SANDBOX_WALL_TIMEOUT), délai CPU via
+RLIMIT_CPU (TT_SANDBOX_CPU_TIMEOUT), plafond de pages (TT_MAX_PAGES) et de
+texte (TT_MAX_TEXT_CHARS). Un processus qui dépasse est tué et remplacé ;
+l'appelant reçoit `ExtractionTimeout`.
+
+Après chaque document, le processus isolé rapporte sa RSS et son pic
+(journalisés avec le hash du fichier) ; au-delà de TT_SANDBOX_MAX_RSS_MB il
+est remplacé. Pendant une fenêtre /debug/profile, il renvoie aussi ses
+statistiques cProfile, fusionnées au rapport. L'attente d'un processus libre respecte l'échéance de la
+requête.
+
+Un PDF de plus de TT_PDF_SPLIT_MIN_PAGES pages (portfolio) est découpé :
+les premières pages d'abord, puis le reste en plages de pages réparties
+entre les processus isolés, dont les textes sont remis dans l'ordre. Chaque
+plage rouvre le document : sur un seul cœur le découpage ne fait que
+coûter, il est donc limité au nombre de cœurs (TT_PDF_SPLIT_WORKERS).
+
+En serverless (ou TT_SANDBOX=0) l'extraction reste dans le processus, avec
+les seuls plafonds de pages et de texte.
+"""
+import os
+import sys
+import math
+import queue
+import signal
+import marshal
+import cProfile
+import threading
+import contextvars
+import subprocess
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional, Tuple
+
+from lib import metrics, deadline, debugtools, docxstream, pdfbackends, rtf
+from lib.logs import logger, fields
+from lib.memguard import current_file_hash, current_rss, peak_rss
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Descripteurs hérités (pass_fds) : POSIX uniquement
+SANDBOX_ENABLED = os.getenv("TT_SANDBOX", "1") != "0" and os.name == "posix"
+SANDBOX_WORKERS = int(os.getenv("TT_SANDBOX_WORKERS", "2"))
+WALL_TIMEOUT = float(os.getenv("TT_SANDBOX_WALL_TIMEOUT", "20"))
+CPU_TIMEOUT = float(os.getenv("TT_SANDBOX_CPU_TIMEOUT", "10"))
+MAX_PAGES = int(os.getenv("TT_MAX_PAGES", "50"))
+MAX_TEXT_CHARS = int(os.getenv("TT_MAX_TEXT_CHARS", "200000"))
+# Recyclage des processus isolés (fuites mémoire des bibliothèques PDF)
+SANDBOX_MAX_DOCUMENTS = int(os.getenv("TT_SANDBOX_MAX_DOCUMENTS", "200"))
+# Processus isolé remplacé dès que sa RSS dépasse ce seuil après un document (0 : jamais)
+SANDBOX_MAX_RSS_MB = float(os.getenv("TT_SANDBOX_MAX_RSS_MB", "300"))
+# Pages lues d'un bloc ; au-delà, le reste est réparti entre les processus isolés
+SPLIT_MIN_PAGES = int(os.getenv("TT_PDF_SPLIT_MIN_PAGES", "10"))
+# Plages extraites en parallèle (une par cœur disponible) ; 0 ou 1 : pas de découpage
+_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+SPLIT_WORKERS = int(os.getenv("TT_PDF_SPLIT_WORKERS", str(min(SANDBOX_WORKERS, _CPUS))))
+# Intervalle de vérification de l'échéance de la requête pendant l'attente
+POLL_INTERVAL = 0.1
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SANDBOX_TIMEOUTS = metrics.counter(
+    "truthtalent_extraction_timeouts_total",
+    "Extractions interrompues (processus tué), par format et type de délai",
+    ["format", "kind"],
+)
+SANDBOX_RESTARTS = metrics.counter(
+    "truthtalent_sandbox_restarts_total",
+    "Processus d'extraction remplacés",
+)
+SANDBOX_RSS = metrics.gauge(
+    "truthtalent_sandbox_rss_bytes",
+    "RSS du processus d'extraction après son dernier document",
+)
+SANDBOX_RECYCLED = metrics.counter(
+    "truthtalent_sandbox_recycled_total",
+    "Processus d'extraction remplacés après un document, par motif (rss, documents)",
+    ["reason"],
+)
+TRUNCATED = metrics.counter(
+    "truthtalent_extraction_truncated_total",
+    "Extractions tronquées par le plafond de pages ou de texte, par format",
+    ["format"],
+)
+SPLIT_RANGES = metrics.counter(
+    "truthtalent_pdf_split_ranges_total",
+    "Plages de pages d'un long PDF extraites en parallèle",
+)
+
+
+class ExtractionCancelled(Exception):
+    """Extraction abandonnée : une autre plage du même document a échoué"""
+
+
+class ExtractionTimeout(Exception):
+    """Délai d'extraction dépassé : le processus a été tué"""
+
+    def __init__(self, doc_format: str, kind: str, limit: float):
+        super().__init__(f"Extraction {doc_format} interrompue ({kind} > {limit}s)")
+        self.doc_format = doc_format
+        self.kind = kind
+        self.limit = limit
+
+    def to_dict(self) -> Dict:
+        return {"format": self.doc_format, "kind": self.kind, "limit_s": self.limit}
+
+
+# ========== EXTRACTEURS (exécutés dans le processus isolé) ==========
+def pdf_text(content: bytes, max_pages: int = MAX_PAGES, max_chars: int = MAX_TEXT_CHARS,
+             fallback: bool = True, first_page: int = 0, last_page: Optional[int] = None,
+             stop_patterns: Tuple[str, ...] = ()) -> Dict:
+    return pdfbackends.extract(content, max_pages, max_chars, fallback,
+                               first_page, last_page, stop_patterns)
+
+
+def docx_text(content: bytes, max_pages: int = MAX_PAGES, max_chars: int = MAX_TEXT_CHARS) -> Dict:
+    return docxstream.extract(content, max_chars)
+
+
+def rtf_text(content: bytes, max_pages: int = MAX_PAGES, max_chars: int = MAX_TEXT_CHARS) -> Dict:
+    return rtf.extract(content, max_chars)
+
+
+EXTRACTORS = {"pdf": pdf_text, "docx": docx_text, "rtf": rtf_text}
+
+
+def _limit_cpu(seconds: float):
+    """Plafonne le CPU du document à venir (SIGXCPU tue le processus)"""
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + seconds)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+class _Duplex:
+    """Réunit le tube des travaux et celui des réponses"""
+
+    def __init__(self, jobs: Connection, replies: Connection):
+        self.recv = jobs.recv
+        self.send = replies.send
+
+
+def _sandbox_main(conn, cpu_timeout: float):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, signal.SIG_DFL)
+    while True:
+        try:
+            doc_format, content, max_pages, max_chars, options, profile = conn.recv()
+        except (EOFError, OSError):
+            return
+        _limit_cpu(cpu_timeout)
+        # Fenêtre /debug/profile ouverte chez le parent : statistiques renvoyées avec la réponse
+        profiler = cProfile.Profile() if profile else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            status, payload = "ok", EXTRACTORS[doc_format](content, max_pages, max_chars, **options)
+        except Exception as e:
+            status, payload = "error", f"{type(e).__name__}: {e}"
+        # Mémoire du processus qui a réellement parsé le document
+        info = {"rss": current_rss(), "peak": peak_rss()}
+        if profiler is not None:
+            profiler.disable()
+            profiler.create_stats()
+            info["profile"] = marshal.dumps(profiler.stats)
+        conn.send((status, payload, info))
+
+
+# ========== POOL DE PROCESSUS ==========
+class _SandboxProcess:
+    """Interpréteur dédié (`python -m lib.sandbox`) relié par deux tubes
+
+    Un sous-processus neuf plutôt qu'un fork : pas de copie des threads et
+    verrous du worker uvicorn, ni de réimport du module principal.
+    """
+
+    def __init__(self, cpu_timeout: float):
+        job_read, job_write = os.pipe()
+        reply_read, reply_write = os.pipe()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "lib.sandbox", str(job_read), str(reply_write), str(cpu_timeout)],
+            cwd=ROOT, pass_fds=(job_read, reply_write), stdin=subprocess.DEVNULL,
+        )
+        os.close(job_read)
+        os.close(reply_write)
+        self.documents = 0
+        self._jobs = Connection(job_write, readable=False)
+        self._replies = Connection(reply_read, writable=False)
+
+    def send(self, job):
+        self._jobs.send(job)
+
+    def poll(self, timeout: float) -> bool:
+        return self._replies.poll(timeout)
+
+    def recv(self):
+        return self._replies.recv()
+
+    def alive(self) -> bool:
+        return self.process.poll() is None and not self._jobs.closed
+
+    def exitcode(self, timeout: float = 1.0) -> Optional[int]:
+        try:
+            return self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+        self._jobs.close()
+        self._replies.close()
+
+
+class SandboxPool:
+    """Processus d'extraction réutilisés, tués et remplacés en cas de dépassement"""
+
+    def __init__(self, size: int = SANDBOX_WORKERS, wall_timeout: float = WALL_TIMEOUT,
+                 cpu_timeout: float = CPU_TIMEOUT):
+        self.size = max(1, size)
+        self.wall_timeout = wall_timeout
+        self.cpu_timeout = cpu_timeout
+        self._idle: "queue.Queue[_SandboxProcess]" = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+        for _ in range(self.size):
+            self._add()
+
+    def _add(self):
+        process = _SandboxProcess(self.cpu_timeout)
+        with self._lock:
+            self._all.append(process)
+        self._idle.put(process)
+
+    def _replace(self, process: _SandboxProcess):
+        process.kill()
+        with self._lock:
+            if process in self._all:
+                self._all.remove(process)
+        SANDBOX_RESTARTS.inc()
+        self._add()
+
+    def _acquire(self, cancel: Optional[threading.Event] = None) -> _SandboxProcess:
+        """Processus libre ; l'attente respecte l'échéance de la requête"""
+        while True:
+            try:
+                process = self._idle.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                # Tous occupés : client parti ou échéance dépassée, inutile d'attendre
+                deadline.checkpoint("extract_sandbox_queue")
+                if cancel is not None and cancel.is_set():
+                    raise ExtractionCancelled()
+                continue
+            if process.alive():
+                return process
+            # Mort entre deux documents (OOM killer...) : remplacé avant usage
+            self._replace(process)
+
+    def run(self, doc_format: str, content: bytes, max_pages: int, max_chars: int,
+            options: Optional[Dict] = None, cancel: Optional[threading.Event] = None) -> Dict:
+        """Extraction dans un processus isolé ; `cancel` levé : processus tué, ExtractionCancelled"""
+        process = self._acquire(cancel)
+        try:
+            process.send((doc_format, content, max_pages, max_chars, options or {},
+                          debugtools.window_open()))
+            waited = 0.0
+            while not process.poll(POLL_INTERVAL):
+                waited += POLL_INTERVAL
+                if waited >= self.wall_timeout:
+                    raise ExtractionTimeout(doc_format, "wall", self.wall_timeout)
+                # Client parti ou échéance dépassée : inutile de finir ce document
+                deadline.checkpoint("extract_sandbox")
+                if cancel is not None and cancel.is_set():
+                    raise ExtractionCancelled()
+            try:
+                status, payload, memory = process.recv()
+            except (EOFError, OSError):
+                # Processus mort pendant le parsing : SIGXCPU (RLIMIT_CPU) ou crash natif
+                exitcode = process.exitcode()
+                if exitcode == -getattr(signal, "SIGXCPU", 0):
+                    raise ExtractionTimeout(doc_format, "cpu", self.cpu_timeout)
+                raise RuntimeError(f"Processus d'extraction terminé (code {exitcode})")
+        except BaseException as e:
+            if isinstance(e, ExtractionTimeout):
+                SANDBOX_TIMEOUTS.inc(format=doc_format, kind=e.kind)
+                logger.warning("Extraction interrompue", extra=fields(**e.to_dict()))
+            self._replace(process)
+            raise
+        process.documents += 1
+        debugtools.add_sandbox_stats(memory.get("profile"))
+        reason = self._recycle_reason(process, doc_format, memory)
+        if reason:
+            SANDBOX_RECYCLED.inc(reason=reason)
+            self._replace(process)
+        else:
+            self._idle.put(process)
+        if status == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def _recycle_reason(self, process: _SandboxProcess, doc_format: str, memory: Dict) -> Optional[str]:
+        """Journalise la mémoire du processus isolé ; motif de remplacement ou None"""
+        SANDBOX_RSS.set(memory["rss"])
+        logger.info("Mémoire extraction isolée", extra=fields(
+            file_hash=current_file_hash() or "-",
+            format=doc_format,
+            sandbox_pid=process.process.pid,
+            rss_mb=round(memory["rss"] / 1048576, 1),
+            peak_mb=round(memory["peak"] / 1048576, 1),
+            documents=process.documents
+        ))
+        if SANDBOX_MAX_RSS_MB and memory["rss"] > SANDBOX_MAX_RSS_MB * 1048576:
+            logger.warning("Processus d'extraction remplacé (mémoire)", extra=fields(
+                file_hash=current_file_hash() or "-", rss_mb=round(memory["rss"] / 1048576, 1)
+            ))
+            return "rss"
+        if SANDBOX_MAX_DOCUMENTS and process.documents >= SANDBOX_MAX_DOCUMENTS:
+            return "documents"
+        return None
+
+    def shutdown(self):
+        with self._lock:
+            processes, self._all = self._all, []
+        for process in processes:
+            process.kill()
+
+
+_pool: Optional[SandboxPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SandboxPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+        return _pool
+
+
+_split_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_split_executor() -> ThreadPoolExecutor:
+    global _split_executor
+    with _pool_lock:
+        if _split_executor is None:
+            _split_executor = ThreadPoolExecutor(max(1, SPLIT_WORKERS), thread_name_prefix="tt-pdf-split")
+        return _split_executor
+
+
+def _page_ranges(start: int, stop: int, parts: int) -> List[Tuple[int, int]]:
+    """Plages contiguës [début, fin) de tailles égales (à une page près)"""
+    parts = max(1, min(parts, stop - start))
+    size, extra = divmod(stop - start, parts)
+    ranges = []
+    for index in range(parts):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _merge_pdf(parts: List[Dict], max_chars: int) -> Dict:
+    """Réassemble, dans l'ordre des pages, les extractions de plusieurs plages"""
+    text = "\n".join(part["text"] for part in parts if part["text"])
+    backends: Dict[str, Dict] = {}
+    fallbacks: Dict[str, int] = {}
+    for part in parts:
+        for name, usage in part["backends"].items():
+            total = backends.setdefault(name, {"seconds": 0.0, "pages": 0})
+            total["seconds"] += usage["seconds"]
+            total["pages"] += usage["pages"]
+        for reason, count in part["fallbacks"].items():
+            fallbacks[reason] = fallbacks.get(reason, 0) + count
+    return {
+        "text": text[:max_chars],
+        "pages": parts[0]["pages"],
+        "truncated": any(part["truncated"] for part in parts) or len(text) > max_chars,
+        "pages_read": sum(part["pages_read"] for part in parts),
+        "stopped_early": False,
+        "pages_skipped": 0,
+        "image_only": False,
+        "image_pages": sum(part["image_pages"] for part in parts),
+        "backends": backends,
+        "fallbacks": fallbacks,
+        "fallback_errors": sum(part["fallback_errors"] for part in parts),
+    }
+
+
+def _extract_pdf_split(pool: SandboxPool, content: bytes, max_pages: int, max_chars: int,
+                       options: Dict) -> Dict:
+    """PDF lu par plages : SPLIT_MIN_PAGES pages d'abord, le reste en parallèle"""
+    head = pool.run("pdf", content, max_pages, max_chars, dict(options, last_page=SPLIT_MIN_PAGES))
+    stop = min(head["pages"], max_pages)
+    # Chaque plage ne se dit tronquée que pour elle-même : le plafond de pages se voit ici
+    capped = head["pages"] > max_pages
+    if (stop <= SPLIT_MIN_PAGES or head["stopped_early"] or head["image_only"]
+            or len(head["text"]) >= max_chars):
+        head["truncated"] = head["truncated"] or capped
+        return head
+    executor = _get_split_executor()
+    cancel = threading.Event()
+    futures = []
+    for first_page, last_page in _page_ranges(SPLIT_MIN_PAGES, stop, min(SPLIT_WORKERS, pool.size)):
+        # Sans motifs d'arrêt : chaque plage ne voit qu'une partie du document
+        range_options = dict(options, first_page=first_page, last_page=last_page, stop_patterns=())
+        # Contexte copié : l'échéance de la requête s'applique aussi à ces plages
+        futures.append(executor.submit(contextvars.copy_context().run, pool.run,
+                                       "pdf", content, max_pages, max_chars, range_options, cancel))
+    SPLIT_RANGES.inc(len(futures))
+    wait(futures, return_when=FIRST_EXCEPTION)
+    for future in futures:
+        if future.done() and future.exception() is not None:
+            # Une plage en échec (délai, PDF illisible) : les autres sont abandonnées,
+            # en attente comme en cours (processus isolé tué et remplacé)
+            cancel.set()
+            for other in futures:
+                other.cancel()
+            raise future.exception()
+    result = _merge_pdf([head] + [future.result() for future in futures], max_chars)
+    result["truncated"] = result["truncated"] or capped
+    return result
+
+
+def extract(doc_format: str, content: bytes, isolated: bool = True,
+            max_pages: int = MAX_PAGES, max_chars: int = MAX_TEXT_CHARS, **options) -> Dict:
+    """Texte d'un document : {"text", "pages", "truncated"} (+ détails du format)
+
+    `options` est transmis à l'extracteur du format (ex. `fallback` ou
+    `stop_patterns` pour le PDF). Lève `ExtractionTimeout` si le processus
+    isolé dépasse un délai.
+    """
+    if isolated and SANDBOX_ENABLED:
+        pool = get_pool()
+        if doc_format == "pdf" and min(SPLIT_WORKERS, pool.size) > 1 and max_pages > SPLIT_MIN_PAGES:
+            result = _extract_pdf_split(pool, content, max_pages, max_chars, options)
+        else:
+            result = pool.run(doc_format, content, max_pages, max_chars, options)
+    else:
+        result = EXTRACTORS[doc_format](content, max_pages, max_chars, **options)
+    if result["truncated"]:
+        TRUNCATED.inc(format=doc_format)
+    return result
+
+
+def shutdown():
+    """Arrête les processus isolés (ils seront recréés au prochain usage)"""
+    global _pool, _split_executor
+    with _pool_lock:
+        pool, _pool = _pool, None
+        executor, _split_executor = _split_executor, None
+    if pool is not None:
+        pool.shutdown()
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def _after_fork_in_child():
+    # Les processus isolés appartiennent au parent : le worker créera les siens
+    global _pool, _pool_lock, _split_executor
+    _pool = None
+    _split_executor = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+if __name__ == "__main__":
+    # Processus isolé : imports lourds faits une fois, avant le premier document
+    for module in ("PyPDF2", "pdfplumber"):
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+    job_fd, reply_fd, cpu_limit = int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3])
+    jobs = Connection(job_fd, writable=False)
+    replies = Connection(reply_fd, readable=False)
+    _sandbox_main(_Duplex(jobs, replies), cpu_limit)
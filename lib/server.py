@@ -0,0 +1,173 @@
+"""
+Serveur de production multi-workers (pre-fork)
+
+    python -m lib.server            # ou python app.py
+
+Le processus maître importe l'application et fait passer les CV de
+démonstration dans le pipeline (imports, taxonomie, motifs compilés) avant
+de forker : ces structures en lecture seule restent partagées entre workers
+(copy-on-write), d'où le `gc.freeze()` juste avant le fork pour que le
+ramasse-miettes ne réécrive pas leurs en-têtes. Chaque worker sert le même
+socket avec uvicorn et se retire après TT_MAX_REQUESTS requêtes, ou quand le
+garde-fou mémoire (lib.memguard) le demande ; le maître le remplace aussitôt.
+"""
+import os
+import sys
+import gc
+import time
+import random
+import signal
+import shutil
+import socket
+import tempfile
+from typing import Dict
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 10000))
+MAX_REQUESTS = int(os.getenv("TT_MAX_REQUESTS", "1000"))
+MAX_REQUESTS_JITTER = int(os.getenv("TT_MAX_REQUESTS_JITTER", str(MAX_REQUESTS // 10)))
+# Délai minimal entre deux remplacements d'un worker qui meurt au démarrage
+RESPAWN_BACKOFF = 1.0
+
+
+def default_workers() -> int:
+    """Un worker par CPU disponible pour ce processus"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+WORKERS = int(os.getenv("TT_WORKERS", "0")) or default_workers()
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Importe l'application et prépare tout ce qui peut être partagé"""
+    import app as application_module
+    from lib import metrics, samples, sandbox
+
+    extractor = application_module.cv_extractor
+    # Pas de Supabase ici : une connexion TLS ne se partage pas entre processus
+    with metrics.muted():
+        for filename, build in samples.SAMPLES.items():
+            extractor.analyze_cv(extractor.extract_text(build(), filename), filename)
+    # Les processus d'extraction isolés sont propres à chaque worker
+    sandbox.shutdown()
+    return application_module.app
+
+
+class Arbiter:
+    """Maître : fork, surveillance et remplacement des workers"""
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self):
+        # Tout ce qui existe avant le fork sort du suivi du GC (pages partagées)
+        gc.freeze()
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        self._run_worker()
+
+    def _run_worker(self):
+        import uvicorn
+        from lib import metrics
+        from lib.logs import shutdown_logging
+        from lib.memguard import memory_guard
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        limit = MAX_REQUESTS + random.randint(0, MAX_REQUESTS_JITTER) if MAX_REQUESTS else None
+        config = uvicorn.Config(self.app, limit_max_requests=limit, log_config=None, access_log=False)
+        server = uvicorn.Server(config)
+        # Retrait demandé par le garde-fou mémoire : uvicorn draine puis s'arrête
+        memory_guard.on_retire(lambda: setattr(server, "should_exit", True))
+        code = 0
+        try:
+            server.run(sockets=[self.sock])
+        except BaseException:
+            code = 1
+        finally:
+            # os._exit n'exécute pas atexit : on vide explicitement métriques et logs
+            try:
+                metrics.REGISTRY.flush()
+            except OSError:
+                pass
+            shutdown_logging()
+        os._exit(code)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        from lib.logs import logger, fields
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("Workers démarrés", extra=fields(workers=self.workers, pids=list(self.children)))
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            logger.info("Worker remplacé", extra=fields(
+                pid=pid, status=status, uptime_s=round(time.monotonic() - started, 1)
+            ))
+            if time.monotonic() - started < RESPAWN_BACKOFF:
+                time.sleep(RESPAWN_BACKOFF)
+            self.spawn()
+        return 0
+
+
+def serve(host: str = HOST, port: int = PORT, workers: int = WORKERS) -> int:
+    """Lance le serveur ; un seul processus si fork n'est pas disponible"""
+    from lib import metrics
+
+    metrics_dir = None
+    if workers > 1 and not metrics.METRICS_DIR:
+        # /metrics agrège les instantanés des workers. Via `python app.py`,
+        # lib.metrics a déjà lu TT_METRICS_DIR : le répertoire lui est donné directement
+        metrics_dir = tempfile.mkdtemp(prefix="tt-metrics-")
+        metrics.METRICS_DIR = metrics_dir
+        os.environ["TT_METRICS_DIR"] = metrics_dir
+
+    try:
+        app = preload()
+        if not hasattr(os, "fork"):
+            import uvicorn
+            uvicorn.run(app, host=host, port=port, workers=1)
+            return 0
+        return Arbiter(app, _bind(host, port), workers).run()
+    finally:
+        # Seul le maître arrive ici (les workers sortent par os._exit)
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(serve())
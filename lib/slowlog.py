@@ -0,0 +1,181 @@
+"""
+Capture des requêtes lentes avec échantillonnage de piles
+
+Pendant une requête d'upload, un thread échantillonneur relève la pile des
+threads qui travaillent pour elle (sys._current_frames) dans un tampon
+borné. Si la requête dépasse TT_SLOW_REQUEST_THRESHOLD, la trace est
+conservée (avec hash, taille, format et pages du fichier) dans un anneau
+consultable par l'admin au format « collapsed stacks » pour les flamegraphs.
+
+Les captures sont indexées et nommées par un identifiant généré par le
+serveur (`profiling.server_request_id`) : deux requêtes qui envoient le même
+X-Request-ID ne se mélangent pas. L'id du client est gardé en champ
+`request_id`.
+"""
+import os
+import sys
+import time
+import threading
+import contextvars
+from collections import deque, Counter
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from lib import metrics
+from lib.logs import logger, fields
+from lib.profiling import thread_activity
+
+SLOW_REQUEST_THRESHOLD = float(os.getenv("TT_SLOW_REQUEST_THRESHOLD", "2.0"))
+SAMPLE_INTERVAL = float(os.getenv("TT_SLOW_SAMPLE_INTERVAL", "0.01"))
+MAX_SAMPLES_PER_REQUEST = int(os.getenv("TT_SLOW_MAX_SAMPLES", "2000"))
+RING_SIZE = int(os.getenv("TT_SLOW_RING_SIZE", "20"))
+MAX_STACK_DEPTH = 64
+
+CAPTURED_ROUTES = ("/extract", "/process-wordpress-upload")
+
+SLOW_REQUESTS = metrics.counter(
+    "truthtalent_slow_requests_total",
+    "Requêtes au-delà du seuil de lenteur, par route",
+    ["route"],
+)
+
+current_capture = contextvars.ContextVar("current_capture", default=None)
+
+
+class RequestCapture:
+    """Échantillons et métadonnées d'une requête en cours"""
+
+    def __init__(self, capture_id: str, request_id: str, route: str):
+        self.capture_id = capture_id
+        self.request_id = request_id
+        self.route = route
+        self.started_at = datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.samples: Deque[str] = deque(maxlen=MAX_SAMPLES_PER_REQUEST)
+        self.file_info: Dict = {}
+        self.duration = 0.0
+
+
+class SlowTrace:
+    """Trace conservée d'une requête lente"""
+
+    def __init__(self, capture: RequestCapture):
+        self.trace_id = capture.capture_id
+        self.request_id = capture.request_id
+        self.route = capture.route
+        self.started_at = capture.started_at
+        self.duration = capture.duration
+        self.file_info = dict(capture.file_info)
+        self.stacks = Counter(capture.samples)
+
+    def summary(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "request_id": self.request_id,
+            "route": self.route,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": sum(self.stacks.values()),
+            "file": self.file_info,
+        }
+
+    def collapsed(self) -> str:
+        """Format « collapsed stacks » (flamegraph.pl, speedscope...)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SlowRequestRecorder:
+    """Échantillonneur partagé et anneau des traces lentes"""
+
+    def __init__(self, threshold: float = SLOW_REQUEST_THRESHOLD):
+        self.threshold = threshold
+        self.traces: Deque[SlowTrace] = deque(maxlen=RING_SIZE)
+        self._active: Dict[str, RequestCapture] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+
+    def begin(self, capture_id: str, request_id: str, route: str) -> RequestCapture:
+        """Démarre la capture ; `capture_id` (serveur) indexe, `request_id` (client) est un champ"""
+        capture = RequestCapture(capture_id, request_id, route)
+        with self._lock:
+            self._active[capture_id] = capture
+            if self._loop_thread_id is None:
+                self._loop_thread_id = threading.get_ident()
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop, name="slow-sampler", daemon=True)
+                self._sampler.start()
+        self._wakeup.set()
+        current_capture.set(capture)
+        return capture
+
+    def end(self, capture: RequestCapture) -> Optional[SlowTrace]:
+        capture.duration = time.perf_counter() - capture.start
+        with self._lock:
+            self._active.pop(capture.capture_id, None)
+            if not self._active:
+                self._wakeup.clear()
+        current_capture.set(None)
+        if capture.duration < self.threshold:
+            return None
+
+        trace = SlowTrace(capture)
+        with self._lock:
+            self.traces.append(trace)
+        SLOW_REQUESTS.inc(route=capture.route)
+        logger.warning("Requête lente", extra=fields(
+            trace_id=trace.trace_id,
+            route=capture.route,
+            duration_ms=round(capture.duration * 1000, 1),
+            samples=len(capture.samples),
+            **capture.file_info
+        ))
+        return trace
+
+    def _sample_loop(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(SAMPLE_INTERVAL)
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                activity = thread_activity.get(thread_id)
+                capture = active.get(activity[2]) if activity else None
+                # Hors étape chronométrée : attribuable seulement s'il n'y a qu'une requête
+                if capture is None and thread_id == self._loop_thread_id and len(active) == 1:
+                    capture = next(iter(active.values()))
+                if capture is not None:
+                    capture.samples.append(_collapse(frame))
+
+    def list_traces(self) -> List[Dict]:
+        with self._lock:
+            return [trace.summary() for trace in reversed(self.traces)]
+
+    def get_trace(self, trace_id: str) -> Optional[SlowTrace]:
+        with self._lock:
+            for trace in self.traces:
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+
+def annotate(**info):
+    """Ajoute des métadonnées fichier (hash, taille, format, pages) à la capture"""
+    capture = current_capture.get()
+    if capture is not None:
+        capture.file_info.update(info)
+
+
+slow_recorder = SlowRequestRecorder()
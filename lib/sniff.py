@@ -0,0 +1,102 @@
+"""
+Détection du format d'un document par ses premiers octets
+
+Le nom de fichier ne dit pas la vérité : un `.doc` est souvent un vieux
+binaire OLE que python-docx ne sait pas lire, un PDF renommé en `.txt`
+était analysé comme du texte, et un format inconnu produisait un texte de
+remplacement analysé malgré tout. Le format est donc déduit du contenu
+(signatures, répertoire central d'une archive zip) avant tout parsing :
+l'extracteur est choisi d'après lui, et les formats non pris en charge ou
+vides sont rejetés d'emblée.
+
+Le format annoncé par l'extension n'est plus qu'une étiquette de métriques
+(`truthtalent_documents_sniffed_total`) pour repérer les fichiers mal nommés.
+"""
+import zipfile
+from io import BytesIO
+from typing import Optional
+
+from lib import metrics
+
+# Formats que le pipeline sait extraire
+SUPPORTED = ("pdf", "docx", "rtf", "txt")
+# Extensions reconnues (format annoncé par le nom de fichier)
+EXTENSIONS = ("pdf", "docx", "doc", "txt", "rtf")
+
+# Le préfixe %PDF- peut être précédé de quelques octets parasites (spécification PDF)
+PDF_SEARCH_BYTES = 1024
+TEXT_SAMPLE_BYTES = 8192
+# Part maximale de caractères de contrôle dans un texte brut
+MAX_CONTROL_RATIO = 0.05
+
+SNIFFED = metrics.counter(
+    "truthtalent_documents_sniffed_total",
+    "Documents reçus par format détecté et format annoncé par l'extension",
+    ["detected", "declared"],
+)
+REJECTED = metrics.counter(
+    "truthtalent_documents_rejected_total",
+    "Documents rejetés avant extraction, par format détecté",
+    ["format"],
+)
+
+_SIGNATURES = (
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "doc"),  # OLE2 : Word 97-2003
+    (b"{\\rtf", "rtf"),
+    (b"\x89PNG\r\n\x1a\n", "image"),
+    (b"\xff\xd8\xff", "image"),
+    (b"GIF8", "image"),
+    (b"II*\x00", "image"),
+    (b"MM\x00*", "image"),
+)
+# Octets de contrôle admis dans un texte : tabulation, sauts de ligne et de page
+_TEXT_CONTROLS = frozenset(b"\t\n\r\f")
+
+
+def declared_format(filename: str) -> str:
+    """Format annoncé par l'extension du fichier"""
+    filename_lower = (filename or "").lower()
+    for extension in EXTENSIONS:
+        if filename_lower.endswith("." + extension):
+            return extension
+    return "other"
+
+
+def _zip_format(content: bytes) -> str:
+    try:
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            names = set(archive.namelist())
+    except (zipfile.BadZipFile, ValueError):
+        return "unknown"
+    return "docx" if "word/document.xml" in names else "zip"
+
+
+def _looks_like_text(sample: bytes) -> bool:
+    if b"\x00" in sample:
+        return False
+    controls = sum(1 for byte in sample if byte < 32 and byte not in _TEXT_CONTROLS)
+    return controls <= len(sample) * MAX_CONTROL_RATIO
+
+
+def detect(content: bytes) -> str:
+    """Format du contenu : pdf, docx, rtf, txt, doc, image, zip, unknown ou empty"""
+    if not content.strip():
+        return "empty"
+    if b"%PDF-" in content[:PDF_SEARCH_BYTES]:
+        return "pdf"
+    if content.startswith(b"PK\x03\x04"):
+        return _zip_format(content)
+    head = content[:64].lstrip()
+    for signature, doc_format in _SIGNATURES:
+        if head.startswith(signature) or content.startswith(signature):
+            return doc_format
+    if _looks_like_text(content[:TEXT_SAMPLE_BYTES]):
+        return "txt"
+    return "unknown"
+
+
+def sniff(content: bytes, filename: Optional[str] = None) -> str:
+    """Format détecté, compté avec le format annoncé par le nom de fichier"""
+    doc_format = detect(content)
+    SNIFFED.inc(detected=doc_format, declared=declared_format(filename))
+    return doc_format
@@ -0,0 +1,68 @@
+"""
+Warm-up au démarrage : le premier vrai upload ne doit pas être le plus lent
+
+Les CV synthétiques (PDF, DOCX, TXT) traversent tout le pipeline pour
+charger les imports différés, compiler les motifs et initialiser PyPDF2 ;
+le client Supabase est créé et sa connexion TLS ouverte. /ready répond 503
+tant que ce n'est pas terminé.
+"""
+import os
+import time
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from lib import metrics, samples
+from lib.logs import logger, fields
+
+WARMUP_ENABLED = os.getenv("TT_WARMUP", "1") != "0"
+
+
+class WarmupState:
+    """État de préparation exposé par /ready"""
+
+    def __init__(self):
+        self.ready = False
+        self.duration_ms: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "warmup_ms": self.duration_ms,
+            "steps_ms": self.steps,
+            "error": self.error,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _run_pipeline(extractor, supabase_manager) -> Dict[str, float]:
+    steps = {}
+    with metrics.muted():
+        for filename, build in samples.SAMPLES.items():
+            start = time.perf_counter()
+            text = extractor.extract_text(build(), filename)
+            extractor.analyze_cv(text, filename)
+            steps[filename] = round((time.perf_counter() - start) * 1000, 1)
+
+        start = time.perf_counter()
+        if supabase_manager.warm():
+            steps["supabase"] = round((time.perf_counter() - start) * 1000, 1)
+    return steps
+
+
+async def run_warmup(extractor, supabase_manager, state: WarmupState = warmup_state):
+    """Exécute le warm-up hors de la boucle puis marque l'instance prête"""
+    start = time.perf_counter()
+    try:
+        state.steps = await run_in_threadpool(_run_pipeline, extractor, supabase_manager)
+    except Exception as e:
+        # Un échec de warm-up ne doit pas empêcher de servir
+        state.error = str(e)
+        logger.exception("Erreur warm-up")
+    state.duration_ms = round((time.perf_counter() - start) * 1000, 1)
+    state.ready = True
+    logger.info("Warm-up terminé", extra=fields(duration_ms=state.duration_ms, steps=state.steps))